@@ -2,28 +2,74 @@
 This file contains the global definitions of all variables used in the main program.
 Filename: config.py
 Author: Matthew Yu
-Last Modified: 3/08/20
+Last Modified: 10/18/26
 Usage:
     import config
     config.emergency_stop = False (stop_button.py)
 """
-TICKS_PER_CM = 51.98 # see encoders.py, based on a 50mm. radius wheel and 16 ticks per revolution.
+TICKS_PER_CM = 51.98 # see encoders.py, based on a 50mm. radius wheel and 16 ticks per revolution. Multiply by ENC_RESOLUTION.
 TICKS_SCALE = .5
 TICKS_OFFSET = 10.6
 
 
 MOTOR_PWM_FREQ=250
 MOTOR_PWM_DUTY=80.0
+MOTOR_TICK_TIMEOUT=10.0     # seconds a drive_*_t command waits on the encoders before giving up.
+
+# PWM generated by the pigpio daemon (see pwm_backend.py, selected with R5_PWM=pigpio)
+PWM_HARDWARE=True           # use the hardware PWM channels on the GPIOs that have one, DMA PWM everywhere else.
+PWM_RANGE=1000              # steps of a DMA PWM duty cycle.
+
+# per wheel speed control (see speed_control.py)
+SPEED_LOOP_HZ=50            # rate of the control loop.
+SPEED_MAX_TICKS=2700.0      # rising edges/s of a wheel at 100% duty (~100 rpm); used as the feedforward term.
+SPEED_KP=0.02               # duty %/(ticks/s)
+SPEED_KI=0.5                # duty %/ticks
+SPEED_KD=0.0                # duty %/(ticks/s^2)
+SPEED_I_LIMIT=20.0          # max duty % the integral term may contribute (anti-windup).
+
+# encoder decoding (see encoders.py)
+ENC_QUADRATURE=False        # decode both edges of both channels of each encoder: 4x the ticks and signed counts.
+ENC_RESOLUTION=4 if ENC_QUADRATURE else 1   # ticks counted per rising edge of channel A.
+
+# encoder speed estimation (see encoders.py)
+ENC_EDGE_HISTORY=32         # edge timestamps kept per wheel.
+ENC_VEL_WINDOW=8            # edges used by encoders.velocity(); more is smoother but slower to react.
+ENC_VEL_FILTER="mean"       # how the periods between edges are combined: "mean", "median" or "last".
+ENC_STALE_TIMEOUT=0.1       # seconds without an edge before a wheel is reported as stopped.
+
+# base geometry and odometry (see odometry.py)
+WHEEL_BASE_CM=20.0          # distance between the front and back axles. TODO: measure on the final base.
+TRACK_WIDTH_CM=24.0         # distance between the left and right wheels. TODO: measure on the final base.
+ODOM_HZ=100                 # rate the odometry samples the encoders.
+ODOM_HISTORY=1024           # number of timestamped poses kept for pose_at().
+
+# velocity profiles of encoder moves (see motion_profile.py)
+PROFILE_HZ=100              # rate the duty cycle schedule is stepped at.
+PROFILE_SHAPE="s_curve"     # "trapezoid" (linear ramps) or "s_curve" (smoothstep ramps, no jerk at either end).
+PROFILE_CRUISE_DUTY=100.0   # duty % between the ramps.
+PROFILE_MIN_DUTY=20.0       # duty % the ramps start and end at. TODO: measure the lowest that still turns the wheels.
+PROFILE_ACCEL_TIME=0.15     # seconds from PROFILE_MIN_DUTY up to the cruise duty.
+PROFILE_DECEL_TIME=0.25     # seconds from the cruise duty down to PROFILE_MIN_DUTY.
+PROFILE_CREEP_TICKS=30      # avg ticks covered at PROFILE_MIN_DUTY before the target.
+
+# rotations by angle (see motor_controller.rotate_deg)
+ROTATE_BUCKET_DEG=15        # width of the angle buckets rotation calibrations are cached in.
+
+# route scripts (see route.py)
+ROUTE_SETTLE_TIME=0.3       # most seconds to wait for the wheels to stop coasting after braking between segments.
+
+# simulated GPIO backend (see sim_gpio.py, selected with R5_GPIO=sim)
+SIM_MAX_TICKS=SPEED_MAX_TICKS           # rising edges/s of a simulated wheel at 100% duty.
+SIM_WHEEL_GAINS=(1.0, 1.0, 1.0, 1.0)    # speed of each (FR, FL, BL, BR) wheel relative to SIM_MAX_TICKS.
+SIM_MOTOR_TAU=0.05                      # time constant (s) of the simulated motors.
+SIM_RATE_HZ=1000                        # rate the motor model is stepped at.
+SIM_LOG_SIZE=100000                     # pin writes kept by the simulator.
 
 FRONT_RIGHT=1
 FRONT_LEFT=2
 BACK_LEFT=3
 BACK_RIGHT=4
 
-ENC_FR_count = 0
-ENC_FL_count = 0
-ENC_BL_count = 0
-ENC_BR_count = 0
-
 emergency_stop = False      # determines whether the robot is in operation or halted.
 lock = False
@@ -2,7 +2,7 @@
 This file contains the interface for reading the encoders on the 37D Metal Gearmotors.
 Filename: encoders.py
 Author: Matthew Yu
-Last Modified: 2/26/20
+Last Modified: 10/18/26
 Notes:
     * Motor Datasheet: https://www.pololu.com/file/0J1736/pololu-37d-metal-gearmotors-rev-1-2.pdf
     * A possible solution to read ticks is to interrupt on high and increment a counter.
@@ -10,6 +10,28 @@ Notes:
         setup()
         ...
         shutdown()
+    * Tick counts live in an EncoderState: preallocated lists indexed through a channel -> slot lookup table.
+      The counts only ever go up and are only written by the RPi.GPIO callback thread. reset() records a base
+      to subtract instead of clearing them, so reads and snapshot_and_reset() need no lock and no tick is lost.
+    * Each rising edge also stores its time.monotonic() timestamp into a small ring buffer per wheel
+      (config.ENC_EDGE_HISTORY). velocity(wheel) estimates the speed from the periods between the last
+      config.ENC_VEL_WINDOW edges, which is far less noisy at low speed than counting ticks over a time window.
+      edge_trace(wheel) returns the stored timestamps so a run can be replayed through velocity_from_edges().
+    * Quadrature mode (config.ENC_QUADRATURE) watches both edges of both the A and B channels of each wheel,
+      which gives the 64 ticks per motor revolution mentioned below (config.ENC_RESOLUTION = 4). The direction
+      of each step comes from QUAD_TABLE, indexed by the previous and current AB state of the wheel. The
+      channel that fired toggles its stored level and only the other channel is read, since by the time a late
+      callback runs its own pin may have moved on (at top speed the edges of a wheel are ~93 us apart, about
+      RPi.GPIO's callback delay). If the other channel changed too, its edge most likely came after this one
+      and its callback is still queued: both steps are counted in the direction of this one and that callback
+      is skipped when it arrives. If it never arrives, or its pin has moved on by then, an edge was missed; it
+      is counted in errors and a wrong guess is reversed.
+      counts stay unsigned (distance travelled) so the drive commands work the same in both modes, and the
+      signed position of each wheel is available through read_signed(). A leading B counts up.
+    * wait_for_ticks(target, timeout) blocks on a condition variable instead of polling. The event handler
+      notifies it once the average tick count of all four wheels crosses the target, and interrupt() (called by
+      the emergency stop button) wakes it early. wait_for_wheels(targets) does the same for a target per wheel
+      and wakes as soon as any one wheel reaches its own.
 
     Say we have a 3in. radius wheel - the circumference is 18.85in.
     Consider if we only get 16 ticks per revolution (only rise/fall of one encoder).
@@ -38,13 +60,11 @@ Notes:
 """
 import sys
 sys.path.append("..") # Adds higher directory to python modules path.
-import time
+from time import monotonic
+import threading
 import pins
 import config
-try:
-    import RPi.GPIO as GPIO
-except RuntimeError:
-    print("Error importing RPi.GPIO! Try using sudo privileges.")
+from gpio_backend import GPIO # RPi.GPIO, or sim_gpio when R5_GPIO=sim (see gpio_backend.py)
 
 GPIO.setmode(GPIO.BCM) # pin values correspond to GPIO pin number on board
 GPIO.setwarnings(False) # disable warnings from other drivers configuring other pins
@@ -56,6 +76,218 @@ chan_list = [
     pins.ENC_BL,
     pins.ENC_BR
 ]
+# B channels, only touched in quadrature mode. Ordered like chan_list.
+chan_list_b = [
+    pins.ENC_FR_B,
+    pins.ENC_FL_B,
+    pins.ENC_BL_B,
+    pins.ENC_BR_B
+]
+
+# step of a quadrature encoder, indexed by (previous AB state << 2) | current AB state, with A as the high bit.
+# A leading B (00 -> 10 -> 11 -> 01 -> 00) counts up. Both bits changing at once means an edge was missed
+# and is not counted.
+QUAD_TABLE = (
+#   00  01  10  11   <- current
+     0, -1,  1,  0, # 00 previous
+     1,  0,  0, -1, # 01
+    -1,  0,  0,  1, # 10
+     0,  1, -1,  0  # 11
+)
+
+# tick counts and edge timestamps of a set of encoder channels.
+# b_channels are the matching B channels of a quadrature encoder, used by quad_tick.
+class EncoderState:
+    def __init__(self, channels, b_channels=None):
+        # slots[channel] is the index of channel in counts and edges.
+        self.slots = [None] * (max(channels + (b_channels or [])) + 1)
+        for slot, channel in enumerate(channels):
+            self.slots[channel] = slot
+        self.counts = [0] * len(channels)       # ticks since setup; never reset
+        self.positions = [0] * len(channels)    # signed ticks since setup (quadrature mode only)
+        self.levels = [0] * len(channels)       # AB state of each slot (quadrature mode only)
+        self.errors = [0] * len(channels)       # missed edges detected (quadrature mode only)
+        self.pending = [None] * len(channels)   # channel whose callback was counted ahead of time, per slot
+        self.guesses = [0] * len(channels)      # step counted ahead of time for the pending channel
+        # pairs[slot] is the (A, B) channel pair of slot.
+        self.pairs = []
+        if b_channels is not None:
+            self.pairs = list(zip(channels, b_channels))
+            for slot, channel in enumerate(b_channels):
+                self.slots[channel] = slot
+        # time.monotonic() of the last edges of each channel. The edge of tick n is at edges[slot][n % size].
+        self.size = config.ENC_EDGE_HISTORY
+        self.edges = [[0.0] * self.size for _ in channels]
+        self.base = (0,) * len(channels)        # counts at the last reset
+        self.signed_base = (0,) * len(channels) # positions at the last reset
+        self.cond = threading.Condition()       # wakes threads sleeping in wait_for_ticks()
+        self.target = None                      # sum of counts that wakes the waiter, None if nobody waits
+        self.wheel_targets = None               # count of each slot that wakes the waiter (None per slot ignored)
+        self.tick = self.handler()
+        self.quad_tick = None
+
+    # returns the callback that counts a tick on a channel. It runs on the RPi.GPIO callback thread for every
+    # edge, so the lists it touches are bound to locals up front (they are never replaced).
+    def handler(self):
+        slots = self.slots
+        counts = self.counts
+        edges = self.edges
+        size = self.size
+        def tick(channel):
+            now = monotonic()
+            try:
+                slot = slots[channel]
+            except IndexError:
+                slot = None
+            if slot is None:
+                print("Invalid channel: " + str(channel))
+                return
+            count = counts[slot]
+            edges[slot][count % size] = now
+            counts[slot] = count + 1
+            # only take the lock once the target has been crossed.
+            if self.target is not None and sum(counts) >= self.target:
+                with self.cond:
+                    self.cond.notify_all()
+            wheel_targets = self.wheel_targets
+            if wheel_targets is not None and wheel_targets[slot] is not None and count + 1 >= wheel_targets[slot]:
+                with self.cond:
+                    self.cond.notify_all()
+        return tick
+
+    # returns the callback that decodes an edge on an A or B channel of a quadrature encoder.
+    # read(channel) returns the level of channel (GPIO.input). See the notes at the top for how late and
+    # dropped callbacks are told apart.
+    def quadrature_handler(self, read):
+        slots = self.slots
+        pairs = self.pairs
+        levels = self.levels
+        counts = self.counts
+        positions = self.positions
+        errors = self.errors
+        pending = self.pending
+        guesses = self.guesses
+        edges = self.edges
+        size = self.size
+        table = QUAD_TABLE
+        def quad_tick(channel):
+            now = monotonic()
+            slot = slots[channel]
+            a, b = pairs[slot]
+            if channel == a:
+                fired, other, other_bit = 0b10, b, 0b01
+            else:
+                fired, other, other_bit = 0b01, a, 0b10
+            previous = levels[slot]
+            if pending[slot] == channel:
+                pending[slot] = None
+                # the callback of an edge counted ahead of time, unless this pin has moved on since.
+                if read(channel) == bool(previous & fired):
+                    return
+                # it has: this edge came first and the one counted was dropped; it went the other way.
+                errors[slot] += 1
+                positions[slot] -= 2 * guesses[slot]
+            elif pending[slot] is not None:
+                # the callback counted ahead of time never came: that edge was dropped.
+                pending[slot] = None
+                errors[slot] += 1
+            current = previous ^ fired
+            if read(other):
+                current |= other_bit
+            else:
+                current &= ~other_bit
+            levels[slot] = current
+            if current ^ previous == fired:
+                step = table[(previous << 2) | current]
+            else:
+                # the other channel changed too; count its edge now and skip its callback.
+                step = 2 * table[(previous << 2) | (previous ^ fired)]
+                pending[slot] = other
+                guesses[slot] = step
+            positions[slot] += step
+            count = counts[slot]
+            edges[slot][count % size] = now
+            if step != 1 and step != -1:
+                count += 1
+                edges[slot][count % size] = now
+            counts[slot] = count + 1
+            # only take the lock once the target has been crossed.
+            if self.target is not None and sum(counts) >= self.target:
+                with self.cond:
+                    self.cond.notify_all()
+            wheel_targets = self.wheel_targets
+            if wheel_targets is not None and wheel_targets[slot] is not None and count + 1 >= wheel_targets[slot]:
+                with self.cond:
+                    self.cond.notify_all()
+        self.quad_tick = quad_tick
+        return quad_tick
+
+    # returns the ticks of each channel since the last reset.
+    def snapshot(self):
+        counts = self.counts[:] # a single copy, atomic under the GIL
+        return tuple(count - base for count, base in zip(counts, self.base))
+
+    # returns the ticks of each channel since the last reset and resets all channels at the same instant.
+    def snapshot_and_reset(self):
+        counts = self.counts[:]
+        self.signed_base = tuple(self.positions)
+        base, self.base = self.base, tuple(counts)
+        return tuple(count - old for count, old in zip(counts, base))
+
+    # resets a single slot.
+    def reset(self, slot):
+        base = list(self.base)
+        base[slot] = self.counts[slot]
+        self.base = tuple(base)
+        signed_base = list(self.signed_base)
+        signed_base[slot] = self.positions[slot]
+        self.signed_base = tuple(signed_base)
+
+    # returns the signed ticks of a slot since the last reset (quadrature mode only).
+    def signed(self, slot):
+        return self.positions[slot] - self.signed_base[slot]
+
+    # returns the sum of the ticks of all channels since their last reset.
+    def total(self):
+        return sum(self.counts) - sum(self.base)
+
+    # returns the time.monotonic() of the last edge of a slot, or None if it never ticked.
+    def last_edge(self, slot):
+        count = self.counts[slot]
+        if count == 0:
+            return None
+        return self.edges[slot][(count - 1) % self.size]
+
+    # returns up to n of the latest edge timestamps of a slot, oldest first.
+    def edge_trace(self, slot, n=None):
+        count = self.counts[slot]
+        ring = self.edges[slot][:]
+        n = min(count, self.size if n is None else min(n, self.size))
+        return [ring[i % self.size] for i in range(count - n, count)]
+
+# returns the speed in ticks/s given edge timestamps (oldest first) at time now.
+# filter picks how the periods between edges are combined: "mean", "median" or "last".
+# returns 0 if there are fewer than two edges or the last edge is older than stale seconds.
+def velocity_from_edges(edges, now, filter="mean", stale=0.1):
+    if len(edges) < 2 or now - edges[-1] > stale:
+        return 0.0
+    if filter == "median":
+        periods = sorted(b - a for a, b in zip(edges, edges[1:]))
+        period = periods[len(periods) // 2]
+    elif filter == "last":
+        period = edges[-1] - edges[-2]
+    else:
+        period = (edges[-1] - edges[0]) / (len(edges) - 1)
+    # a wheel that is slowing down is already late for its next edge; don't report more speed than that allows.
+    period = max(period, now - edges[-1])
+    if period <= 0:
+        return 0.0
+    return 1.0 / period
+
+# state of the (FR, FL, BL, BR) encoders.
+state = EncoderState(chan_list, chan_list_b)
+# set by interrupt() to wake the waiter before the target is reached.
+interrupted = False
 
 """
 GENERAL_PURPOSE_COMMANDS - used for state changes
@@ -63,6 +295,17 @@ GENERAL_PURPOSE_COMMANDS - used for state changes
 # sets up the GPIO pins used for the motor encoders.
 def setup():
     print("Setup Encoders.")
+    if config.ENC_QUADRATURE:
+        GPIO.setup(chan_list + chan_list_b, GPIO.IN, pull_up_down=GPIO.PUD_UP) # set all touched pins to input mode
+        handler = state.quadrature_handler(GPIO.input)
+        # start decoding from the current AB state of each wheel.
+        for slot in range(len(chan_list)):
+            state.levels[slot] = (GPIO.input(chan_list[slot]) << 1) | GPIO.input(chan_list_b[slot])
+        # declare a handler interrupt on both edges of both channels
+        for channel in chan_list + chan_list_b:
+            GPIO.add_event_detect(channel, GPIO.BOTH, callback=handler)
+        return
+
     GPIO.setup(chan_list, GPIO.IN, pull_up_down=GPIO.PUD_UP) # set all touched pins to input mode
 
     # declare a handler interrupt on input pin
@@ -71,48 +314,121 @@ def setup():
 # cleans all channels touched by motor controller
 def shutdown():
     print("Shutdown Encoders.")
-    GPIO.cleanup(chan_list)
+    if config.ENC_QUADRATURE:
+        GPIO.cleanup(chan_list + chan_list_b)
+    else:
+        GPIO.cleanup(chan_list)
 
 # increments a tick on the rising edge of an encoder pin.
-def encoderEventHandler(channel):
-    if channel is pins.ENC_FR:
-        config.ENC_FR_count += 1
-    elif channel is pins.ENC_FL:
-        config.ENC_FL_count += 1
-    elif channel is pins.ENC_BL:
-        config.ENC_BL_count += 1
-    elif channel is pins.ENC_BR:
-        config.ENC_BR_count += 1
-    else:
-        print("Invalid channel: " + str(channel))
-        print("Choose a value between [1, 4].")
+encoderEventHandler = state.tick
 
 # read returns the ticks given the encoder id.
 # use: when you want to know ticks after moving (and therefore to calculate distance).
 def read(enc_val):
-    if enc_val is config.FRONT_RIGHT:
-        return config.ENC_FR_count
-    elif enc_val is config.FRONT_LEFT:
-        return config.ENC_FL_count
-    elif enc_val is config.BACK_LEFT:
-        return config.ENC_BL_count
-    elif enc_val is config.BACK_RIGHT:
-        return config.ENC_BR_count
-    else:
+    if enc_val not in range(1, 5):
         print("Invalid read enc_val: " + str(enc_val))
         print("Choose a value between [1, 4].")
+        return None
+    return state.counts[enc_val - 1] - state.base[enc_val - 1]
 
 # reset takes the given encoder id and resets its ticks.
 # use: when changing direction and ENCx_count is no longer useful.
 def reset(enc_val):
-    if enc_val is config.FRONT_RIGHT:
-        config.ENC_FR_count = 0
-    elif enc_val is config.FRONT_LEFT:
-        config.ENC_FL_count = 0
-    elif enc_val is config.BACK_LEFT:
-        config.ENC_BL_count = 0
-    elif enc_val is config.BACK_RIGHT:
-        config.ENC_BR_count = 0
-    else:
+    if enc_val not in range(1, 5):
         print("Invalid reset enc_val: " + str(enc_val))
         print("Choose a value between [1, 4].")
+        return
+    state.reset(enc_val - 1)
+
+# read_signed returns the signed ticks given the encoder id since the last reset (quadrature mode only).
+# use: when the direction a wheel actually turned matters.
+def read_signed(enc_val):
+    if enc_val not in range(1, 5):
+        print("Invalid read enc_val: " + str(enc_val))
+        print("Choose a value between [1, 4].")
+        return None
+    return state.signed(enc_val - 1)
+
+# read_total returns the ticks given the encoder id since setup, ignoring reset().
+# use: when the ticks are needed across movements (odometry).
+def read_total(enc_val):
+    if enc_val not in range(1, 5):
+        print("Invalid read enc_val: " + str(enc_val))
+        print("Choose a value between [1, 4].")
+        return None
+    return state.counts[enc_val - 1]
+
+# returns the (FR, FL, BL, BR) ticks since the last reset.
+def snapshot():
+    return state.snapshot()
+
+# returns the (FR, FL, BL, BR) ticks since the last reset and resets all four encoders at once.
+def snapshot_and_reset():
+    return state.snapshot_and_reset()
+
+# velocity returns the speed in ticks/s given the encoder id, estimated from the periods between its last
+# config.ENC_VEL_WINDOW edges. Falls back to 0 once no edge was seen for config.ENC_STALE_TIMEOUT seconds.
+def velocity(enc_val):
+    if enc_val not in range(1, 5):
+        print("Invalid velocity enc_val: " + str(enc_val))
+        print("Choose a value between [1, 4].")
+        return None
+    return velocity_from_edges(
+        state.edge_trace(enc_val - 1, config.ENC_VEL_WINDOW),
+        monotonic(),
+        config.ENC_VEL_FILTER,
+        config.ENC_STALE_TIMEOUT
+    )
+
+# edge_trace returns the stored edge timestamps given the encoder id, oldest first.
+# use: to record a run and feed it to velocity_from_edges() offline.
+def edge_trace(enc_val):
+    return state.edge_trace(enc_val - 1)
+
+# returns the sum of the ticks of all four encoders.
+def getTotalTicks():
+    return state.total()
+
+# blocks until the average ticks of all four encoders reaches target.
+# returns True if the target was reached, False on timeout (in seconds), interrupt() or emergency stop.
+# cancel is an optional threading.Event; set it and call interrupt() to wake this waiter only.
+def wait_for_ticks(target, timeout=None, cancel=None):
+    global interrupted
+    with state.cond:
+        interrupted = False
+        target_sum = sum(state.base) + target * 4
+        state.target = target_sum
+        state.cond.wait_for(
+            lambda: interrupted or config.emergency_stop or (cancel is not None and cancel.is_set())
+                or sum(state.counts) >= target_sum,
+            timeout
+        )
+        state.target = None
+    return sum(state.counts) >= target_sum
+
+# blocks until any wheel reaches its own target. targets are the (FR, FL, BL, BR) ticks since the last reset,
+# None for a wheel that isn't waited on.
+# returns the slots (0 = FR ... 3 = BR) of every waited wheel at or past its target; empty on timeout (in
+# seconds), interrupt() or emergency stop. cancel works as in wait_for_ticks().
+def wait_for_wheels(targets, timeout=None, cancel=None):
+    global interrupted
+    with state.cond:
+        interrupted = False
+        wheel_targets = [None if target is None else base + target for target, base in zip(targets, state.base)]
+        reached = lambda: [slot for slot, target in enumerate(wheel_targets)
+                           if target is not None and state.counts[slot] >= target]
+        state.wheel_targets = wheel_targets
+        state.cond.wait_for(
+            lambda: interrupted or config.emergency_stop or (cancel is not None and cancel.is_set()) or reached(),
+            timeout
+        )
+        state.wheel_targets = None
+    return reached()
+
+# wakes any thread sleeping in wait_for_ticks() or wait_for_wheels() without waiting for the target.
+# use: when the emergency stop is pressed or the current movement is cancelled.
+def interrupt():
+    global interrupted
+    with state.cond:
+        interrupted = True
+        state.cond.notify_all()
@@ -0,0 +1,60 @@
+"""
+This file benchmarks the encoder callback and checks that snapshot_and_reset() never loses a tick.
+Filename: test_encoder_callback.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim).
+    * The legacy handler is the old if/elif chain over the ENCx_count globals of config.py, kept here only to
+      compare against.
+"""
+import os
+import sys
+sys.path.append("..")
+
+import threading
+import timeit
+import types
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import pins
+import encoders
+
+# the callback before EncoderState, counting into module globals.
+legacy = types.SimpleNamespace(ENC_FR_count=0, ENC_FL_count=0, ENC_BL_count=0, ENC_BR_count=0)
+def legacyEventHandler(channel):
+    if channel is pins.ENC_FR:
+        legacy.ENC_FR_count += 1
+    elif channel is pins.ENC_FL:
+        legacy.ENC_FL_count += 1
+    elif channel is pins.ENC_BL:
+        legacy.ENC_BL_count += 1
+    elif channel is pins.ENC_BR:
+        legacy.ENC_BR_count += 1
+    else:
+        print("Invalid channel: " + str(channel))
+
+EDGES = 200000
+for name, handler in [("legacy if/elif", legacyEventHandler), ("EncoderState.tick", encoders.encoderEventHandler)]:
+    for channel, label in [(pins.ENC_FR, "FR"), (pins.ENC_BR, "BR")]:
+        best = min(timeit.repeat(lambda: handler(channel), number=EDGES, repeat=5))
+        print("{:>18} ({}): {:6.3f} us/edge".format(name, label, best / EDGES * 1e6))
+
+# a callback thread ticks while the main thread snapshots and resets; every tick must be seen exactly once.
+PER_WHEEL = 100000
+def ticker():
+    for _ in range(PER_WHEEL):
+        for channel in encoders.chan_list:
+            encoders.encoderEventHandler(channel)
+
+encoders.snapshot_and_reset()
+thread = threading.Thread(target=ticker)
+thread.start()
+seen = [0, 0, 0, 0]
+while thread.is_alive():
+    for i, ticks in enumerate(encoders.snapshot_and_reset()):
+        seen[i] += ticks
+thread.join()
+for i, ticks in enumerate(encoders.snapshot_and_reset()):
+    seen[i] += ticks
+print("ticks seen through snapshot_and_reset: " + str(seen) + " (expected " + str(PER_WHEEL) + " each)")
@@ -0,0 +1,85 @@
+"""
+This file compares encoder speed estimates from edge timestamps against counting ticks in a time window.
+Filename: test_encoder_velocity.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim).
+    * A synthetic edge trace (a wheel at a constant speed with some jitter on every period) is replayed through
+      velocity_from_edges() at the rate of the speed control loop, the same way a recorded edge_trace() can be.
+    * The live check at the end fires encoderEventHandler from a thread and reads velocity() directly.
+"""
+import os
+import sys
+sys.path.append("..")
+
+import random
+import threading
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+
+SAMPLE_HZ = config.SPEED_LOOP_HZ
+JITTER = 0.05       # relative jitter of each period
+DURATION = 5.0
+
+# returns the edge times of a wheel spinning at speed ticks/s for DURATION seconds.
+def synthetic_trace(speed):
+    random.seed(0)
+    t = 0.0
+    edges = []
+    while t < DURATION:
+        t += random.gauss(1.0 / speed, JITTER / speed)
+        edges.append(t)
+    return edges
+
+# returns the mean and worst absolute error of both estimators, sampled at SAMPLE_HZ.
+def compare(speed, filter):
+    edges = synthetic_trace(speed)
+    period = 1.0 / SAMPLE_HZ
+    window_errors = []
+    edge_errors = []
+    first = 0   # index of the first edge after the previous sample
+    last = 0    # index of the first edge after the current sample
+    now = period
+    while now < DURATION:
+        while last < len(edges) and edges[last] <= now:
+            last += 1
+        window_errors.append(abs((last - first) / period - speed))
+        recent = edges[max(0, last - config.ENC_VEL_WINDOW):last]
+        edge_errors.append(abs(encoders.velocity_from_edges(recent, now, filter, config.ENC_STALE_TIMEOUT) - speed))
+        first = last
+        now += period
+    # skip the first samples while the window fills up.
+    window_errors = window_errors[5:]
+    edge_errors = edge_errors[5:]
+    return (sum(window_errors) / len(window_errors), max(window_errors),
+            sum(edge_errors) / len(edge_errors), max(edge_errors))
+
+for speed in [100.0, 300.0, 1000.0, 2500.0]:
+    for filter in ["mean", "median", "last"]:
+        window_mean, window_max, edge_mean, edge_max = compare(speed, filter)
+        print("{:6.0f} ticks/s: window error {:6.1f} (max {:6.1f}), edges ({:>6}) error {:6.1f} (max {:6.1f})".format(
+            speed, window_mean, window_max, filter, edge_mean, edge_max))
+
+# a stopped wheel falls back to 0 once its last edge is older than the stale timeout.
+edges = synthetic_trace(300.0)[:50]
+for delay in [0.0, 0.05, config.ENC_STALE_TIMEOUT + 0.01]:
+    print("{:.2f}s after the last edge: {:6.1f} ticks/s".format(
+        delay, encoders.velocity_from_edges(edges[-8:], edges[-1] + delay, "mean", config.ENC_STALE_TIMEOUT)))
+
+# live: 200 edges/s on the front right wheel.
+def ticker():
+    for _ in range(60):
+        encoders.encoderEventHandler(encoders.chan_list[0])
+        time.sleep(1.0 / 200)
+thread = threading.Thread(target=ticker)
+thread.start()
+thread.join()
+print("live velocity(1): {:.1f} ticks/s (expected a bit under 200, sleep overshoots)".format(
+    encoders.velocity(config.FRONT_RIGHT)))
+time.sleep(config.ENC_STALE_TIMEOUT)
+print("live velocity(1) after stopping: " + str(encoders.velocity(config.FRONT_RIGHT)))
+print("stored edge trace: " + str(len(encoders.edge_trace(config.FRONT_RIGHT))) + " edges")
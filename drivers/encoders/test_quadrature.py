@@ -0,0 +1,110 @@
+"""
+This file checks the quadrature decoder and benchmarks the highest edge rate it can keep up with.
+Filename: test_quadrature.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim) and the pin levels come from a simulated
+      edge stream instead of GPIO.input.
+    * The benchmark only times the decoder itself. RPi.GPIO adds its own dispatch cost per callback, and the pi
+      is several times slower than a dev box, so run this on the pi before turning quadrature mode on.
+"""
+import os
+import sys
+sys.path.append("..")
+
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+
+# AB states of a wheel turning forward, A leading B.
+FORWARD = [0b00, 0b10, 0b11, 0b01]
+
+# returns the (channel, level) edges of wheel slot turning by steps (negative for backward).
+def edge_stream(slot, steps, start=0):
+    a = encoders.chan_list[slot]
+    b = encoders.chan_list_b[slot]
+    edges = []
+    index = start
+    direction = 1 if steps > 0 else -1
+    for _ in range(abs(steps)):
+        previous = FORWARD[index % 4]
+        index += direction
+        current = FORWARD[index % 4]
+        if (previous ^ current) & 0b10:
+            edges.append((a, current >> 1))
+        else:
+            edges.append((b, current & 1))
+    return edges, index
+
+levels = dict.fromkeys(encoders.chan_list + encoders.chan_list_b, 0)
+state = encoders.EncoderState(encoders.chan_list, encoders.chan_list_b)
+handler = state.quadrature_handler(levels.__getitem__)
+
+# replays edges through the decoder, setting each pin level before its callback like the hardware would.
+def replay(edges):
+    for channel, level in edges:
+        levels[channel] = level
+        handler(channel)
+
+# correctness: forward then backward on every wheel.
+for slot in range(4):
+    forward, index = edge_stream(slot, 1000)
+    backward, index = edge_stream(slot, -400, index)
+    replay(forward + backward)
+print("signed positions: " + str(state.positions) + " (expected 600 each)")
+print("counts:           " + str(state.counts) + " (expected 1400 each)")
+
+# a late callback: both edges happen before the first callback runs. Nothing was missed.
+a, b = encoders.chan_list[0], encoders.chan_list_b[0]
+levels[a] = 1       # 00 -> 10
+levels[b] = 1       # 10 -> 11
+handler(a)
+handler(b)
+print("late callbacks on FR: errors " + str(state.errors[0]) + " (expected 0), position " +
+      str(state.positions[0]) + " (expected 602)")
+
+# a dropped callback is flagged once the next edge shows it, and the position is kept.
+levels[a] = 0
+handler(a)          # 11 -> 01
+levels[b] = 0       # 01 -> 00, callback dropped
+levels[a] = 1
+handler(a)          # 00 -> 10, seen as 01 -> 10
+levels[b] = 1
+handler(b)          # 10 -> 11
+print("missed edges detected on FR: " + str(state.errors[0]) + " (expected 1), position " +
+      str(state.positions[0]) + " (expected 606)")
+
+# the same backward, with the dropped edge before the one whose callback runs.
+levels[b] = 0
+handler(b)          # 11 -> 10
+levels[a] = 0       # 10 -> 00, callback dropped
+levels[b] = 1
+handler(b)          # 00 -> 01, guessed as 10 -> 11 -> 01 (forward)
+levels[a] = 1
+handler(a)          # 01 -> 11: the pin moved on, the guess is reversed
+print("missed edges detected on FR: " + str(state.errors[0]) + " (expected 2), position " +
+      str(state.positions[0]) + " (expected 602)")
+
+# benchmark: interleave the edges of all four wheels like the callback thread would see them.
+streams = [edge_stream(slot, 50000)[0] for slot in range(4)]
+edges = [edge for group in zip(*streams) for edge in group]
+start = time.perf_counter()
+replay(edges)
+elapsed = time.perf_counter() - start
+per_edge = elapsed / len(edges)
+needed = config.SPEED_MAX_TICKS * 4 * 4 # 4 edges per rising edge of A, 4 wheels
+print("decoder: {:.2f} us/edge -> keeps up with {:,.0f} edges/s".format(per_edge * 1e6, 1 / per_edge))
+print("top speed needs {:,.0f} edges/s across all four wheels ({:.0f}% of the decoder's budget)".format(
+    needed, 100 * needed * per_edge))
+
+# the rising edge only callback for comparison.
+single = encoders.EncoderState(encoders.chan_list)
+rising = [encoders.chan_list[slot] for slot in range(4)] * 50000
+start = time.perf_counter()
+for channel in rising:
+    single.tick(channel)
+per_edge = (time.perf_counter() - start) / len(rising)
+print("rising edge only: {:.2f} us/edge -> keeps up with {:,.0f} edges/s".format(per_edge * 1e6, 1 / per_edge))
@@ -0,0 +1,27 @@
+"""
+This file picks the GPIO library used by all drivers.
+Filename: gpio_backend.py
+Last Modified: 10/18/26
+Usage:
+    from gpio_backend import GPIO
+    GPIO.setmode(GPIO.BCM)
+
+    R5_GPIO=sim python3 test_motor_system_3.py  # run without a pi (see sim_gpio.py)
+Notes:
+    * The R5_GPIO environment variable selects the backend:
+        rpi (default) - RPi.GPIO, only available on the pi.
+        sim           - sim_gpio, which records pin writes and PWM duty cycles and synthesizes encoder edges
+                        from a motor model, so the drivers can be imported, tested and profiled anywhere.
+    * PWM channels are created through pwm_backend.py, which uses GPIO.PWM from here unless R5_PWM=pigpio.
+"""
+import os
+
+BACKEND = os.environ.get("R5_GPIO", "rpi")
+
+if BACKEND == "sim":
+    import sim_gpio as GPIO
+else:
+    try:
+        import RPi.GPIO as GPIO
+    except RuntimeError:
+        print("Error importing RPi.GPIO! Try using sudo privileges.")
@@ -0,0 +1,153 @@
+"""
+This file contains a background executor for the encoder based drive commands of motor_controller.py.
+Filename: motion_executor.py
+Last Modified: 10/18/26
+Notes:
+    * The DRIVE_COMMANDS_T of motor_controller.py block the caller until the move is done. The commands here
+      queue the move for a worker thread and return a MotionFuture right away, so the main loop can keep
+      capturing frames from the camera while the base moves.
+    * Moves run one at a time in the order they were submitted.
+    * future.cancel() removes a queued move, or brakes a running move through motor_controller.stop_t().
+    * future.result() is a MotionResult with the (FR, FL, BL, BR) ticks counted during the move.
+    * Use asyncio.wrap_future(future) to await a move from a coroutine.
+    * Proposed operation:
+        motor_controller.setup(freq)
+        encoders.setup()
+        start()
+        future = drive_forward_t(d)
+        ...
+        future.result()
+        shutdown()
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+import threading
+import queue
+from collections import namedtuple
+from concurrent.futures import Future
+import config
+import encoders
+import motor_controller
+
+# result of a finished move. reached is False if the move was cancelled, timed out or emergency stopped.
+MotionResult = namedtuple("MotionResult", ["direction", "distance", "ticks", "reached"])
+
+# a queued or running move.
+class MotionFuture(Future):
+    def __init__(self, direction, distance):
+        super().__init__()
+        self.direction = direction
+        self.distance = distance
+        self.abort = threading.Event() # wakes the worker out of encoders.wait_for_ticks()
+
+    # cancels a queued move, or stops a running move early. The running move still completes with a
+    # MotionResult holding the ticks counted up to the stop.
+    def cancel(self):
+        if super().cancel():
+            return True
+        if self.running():
+            self.abort.set()
+            encoders.interrupt()
+            return True
+        return False
+
+# moves waiting for the worker thread. None tells the worker to exit.
+moves = queue.Queue()
+# the move currently being executed by the worker thread.
+current = None
+worker = None
+
+"""
+GENERAL_PURPOSE_COMMANDS - used for state changes
+"""
+# starts the worker thread. The motor controller and encoders need to be set up first.
+def start():
+    global worker
+    print("Start Motion Executor.")
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+
+# cancels all moves and stops the worker thread.
+def shutdown():
+    print("Shutdown Motion Executor.")
+    cancel_all()
+    moves.put(None)
+    worker.join()
+
+# runs queued moves one at a time until shutdown() is called.
+def run():
+    global current
+    while True:
+        future = moves.get()
+        if future is None:
+            break
+        # don't start a move while the emergency stop is engaged.
+        if config.emergency_stop:
+            future.cancel()
+        if not future.set_running_or_notify_cancel():
+            continue
+        current = future
+        try:
+            ticks = motor_controller.drive_t(future.direction, future.distance, future.abort)
+            reached = sum(ticks) / 4 >= motor_controller.getTargetTicks(future.distance, future.direction)
+            future.set_result(MotionResult(future.direction, future.distance, ticks, reached))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            current = None
+
+# queues a move in direction (a key of motor_controller.DIRECTIONS) for d cm.
+def submit(direction, d):
+    if direction not in motor_controller.DIRECTIONS:
+        raise ValueError("Invalid direction: " + str(direction))
+    future = MotionFuture(direction, d)
+    moves.put(future)
+    return future
+
+# cancels all queued moves and the running move.
+def cancel_all():
+    while True:
+        try:
+            future = moves.get_nowait()
+        except queue.Empty:
+            break
+        if future is None: # keep the shutdown request
+            moves.put(None)
+            break
+        future.cancel()
+    running = current
+    if running is not None:
+        running.cancel()
+
+"""
+DRIVE_COMMANDS_T - queue a move based on encoder ticks, returning a MotionFuture
+"""
+def drive_forward_t(d):
+    return submit("forward", d)
+
+def drive_backward_t(d):
+    return submit("backward", d)
+
+def drive_right_t(d):
+    return submit("right", d)
+
+def drive_left_t(d):
+    return submit("left", d)
+
+def drive_forward_left_t(d):
+    return submit("forward_left", d)
+
+def drive_forward_right_t(d):
+    return submit("forward_right", d)
+
+def drive_backward_left_t(d):
+    return submit("backward_left", d)
+
+def drive_backward_right_t(d):
+    return submit("backward_right", d)
+
+def drive_rotate_left_t(d):
+    return submit("rotate_left", d)
+
+def drive_rotate_right_t(d):
+    return submit("rotate_right", d)
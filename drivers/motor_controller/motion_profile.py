@@ -0,0 +1,119 @@
+"""
+This file contains velocity profiled versions of the encoder based drive commands of motor_controller.py.
+Filename: motion_profile.py
+Last Modified: 10/18/26
+Notes:
+    * motor_controller.drive_t() starts the wheels at the full set_speed() duty and brakes to GND at the target,
+      so the wheels slip at the start and the base coasts past the target. drive_t() here ramps the duty cycle
+      up, cruises and ramps it back down so the base arrives at config.PROFILE_MIN_DUTY and stops on the mark.
+    * plan() precomputes the whole schedule of a move (it is cached per target):
+        accel - duty cycle for each step of config.PROFILE_HZ since the start, from PROFILE_MIN_DUTY up to the
+                cruise duty over config.PROFILE_ACCEL_TIME.
+        decel - duty cycle for each avg tick left to the target. It is the speed of a ramp from the cruise duty
+                down to PROFILE_MIN_DUTY over config.PROFILE_DECEL_TIME, tabulated against the distance that ramp
+                still covers, plus config.PROFILE_CREEP_TICKS at PROFILE_MIN_DUTY.
+      Each step writes min(accel, decel), so short moves get a triangular profile on their own.
+    * The ramps are linear ("trapezoid") or smoothstep ("s_curve", config.PROFILE_SHAPE).
+    * Between steps the thread sleeps in encoders.wait_for_ticks(), so it still brakes on the edge that reaches
+      the target rather than at the next step.
+    * Speeds are avg ticks/s over the four wheels, the unit getTargetTicks() and wait_for_ticks() count in; a
+      diagonal only turns two wheels, so it covers half the avg ticks per second at the same duty cycle.
+    * Proposed operation:
+        motor_controller.setup(freq)
+        encoders.setup()
+        drive_t("forward", d)
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+import math
+import time
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+import config
+import encoders
+import motor_controller
+
+# precomputed schedule of a move, see plan().
+Profile = namedtuple("Profile", ["target", "accel", "decel", "cruise"])
+
+# returns n points of a ramp rising from 0 (exclusive) to 1 (inclusive).
+def ramp(n, shape):
+    x = np.arange(1, n + 1) / n
+    if shape == "trapezoid":
+        return x
+    if shape == "s_curve":
+        return x * x * (3 - 2 * x)
+    raise ValueError("Unknown profile shape: " + str(shape))
+
+# returns the schedule of a move of target avg ticks.
+# fraction is the share of the wheels turning (0.5 for diagonals), cruise the duty % between the ramps.
+@lru_cache(maxsize=256)
+def plan(target, fraction=1.0, cruise=config.PROFILE_CRUISE_DUTY, shape=config.PROFILE_SHAPE):
+    low = min(config.PROFILE_MIN_DUTY, cruise)
+    dt = 1.0 / config.PROFILE_HZ
+
+    steps = max(1, math.ceil(config.PROFILE_ACCEL_TIME * config.PROFILE_HZ))
+    accel = low + (cruise - low) * ramp(steps, shape)
+
+    # duty of each step of the ramp down, and the avg ticks still to go when that step starts.
+    steps = max(1, math.ceil(config.PROFILE_DECEL_TIME * config.PROFILE_HZ))
+    duties = cruise - (cruise - low) * ramp(steps, shape)
+    ticks_per_s = fraction * config.SPEED_MAX_TICKS * config.ENC_RESOLUTION / 100.0
+    to_go = np.cumsum((duties * ticks_per_s * dt)[::-1])[::-1] + config.PROFILE_CREEP_TICKS
+    # tabulate against every whole tick left; interp holds the ends (low inside the creep, cruise beyond).
+    remaining = np.arange(min(target, int(to_go[0])) + 1)
+    decel = np.interp(remaining, np.r_[0.0, to_go[::-1]], np.r_[low, duties[::-1]])
+    decel[remaining <= config.PROFILE_CREEP_TICKS] = low
+    return Profile(target, accel, decel, cruise)
+
+# steps the duty cycle of a running move along profile until the target is reached.
+# returns True if the target was reached, False on cancel, emergency stop or timeout.
+def run(profile, cancel=None):
+    period = 1.0 / config.PROFILE_HZ
+    deadline = time.monotonic() + config.MOTOR_TICK_TIMEOUT
+    last_decel = len(profile.decel) - 1
+    duty = None
+    step = 0
+    while time.monotonic() < deadline:
+        remaining = profile.target - encoders.getTotalTicks() / 4
+        if remaining <= 0:
+            return True
+        new_duty = min(
+            profile.accel[step] if step < len(profile.accel) else profile.cruise,
+            profile.decel[min(int(remaining), last_decel)]
+        )
+        if new_duty != duty:
+            duty = new_duty
+            motor_controller.set_speed(float(duty))
+        step += 1
+        # sleep until the next step, or brake as soon as the target is reached.
+        if encoders.wait_for_ticks(profile.target, period, cancel):
+            return True
+        if config.emergency_stop or (cancel is not None and cancel.is_set()):
+            return False
+    return False
+
+"""
+DRIVE_COMMANDS_P - move based on encoder ticks along a velocity profile
+Notes:
+ * same interface as DRIVE_COMMANDS_T in motor_controller.py: these methods clear the encoder counts, are
+   BLOCKING and return the (FR, FL, BL, BR) ticks counted during the move.
+ * they leave the duty cycle at config.PROFILE_MIN_DUTY; call set_speed() before using the timed commands.
+"""
+# Base moves in direction until the ticks for d cm have passed, along a velocity profile.
+# cancel is an optional threading.Event that stops the movement early (see encoders.wait_for_ticks).
+def drive_t(direction, d, cancel=None, cruise=config.PROFILE_CRUISE_DUTY, shape=config.PROFILE_SHAPE):
+    return drive_ticks(direction, motor_controller.getTargetTicks(d, direction, "profile"), cancel, cruise, shape)
+
+# Base moves in direction until the avg ticks of all motors reach target, along a velocity profile.
+def drive_ticks(direction, target, cancel=None, cruise=config.PROFILE_CRUISE_DUTY, shape=config.PROFILE_SHAPE):
+    config.lock = True
+    fraction = np.count_nonzero(motor_controller.DIRECTIONS[direction]) / 4
+    profile = plan(target, fraction, cruise, shape)
+    motor_controller.set_speed(float(profile.accel[0]))
+    motor_controller.apply(direction)
+    run(profile, cancel)
+    ticks = motor_controller.stop_t()
+    config.lock = False
+    return ticks
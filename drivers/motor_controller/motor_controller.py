@@ -2,10 +2,12 @@
 This file contains the interface for driving the VNH5019A-E motor driver.
 Filename: motor_controller.py
 Author: Matthew Yu
-Last Modified: 2/26/20
+Last Modified: 10/18/26
 Notes:
     * How a Mecanum Drive Works: https://seamonsters-2605.github.io/archive/mecanum/
     * Driving a PWM pin in RPi.GPIO: https://sourceforge.net/p/raspberry-gpio-python/wiki/PWM/
+      The PWM channels come from pwm_backend.py: RPi.GPIO's software PWM by default, or hardware/DMA timed PWM
+      through pigpio with R5_PWM=pigpio.
     * Motor Driver data sheet and logic table: https://www.pololu.com/file/0J504/vnh5019.pdf
     * RPI4 R5 Moving Base Pinout: https://docs.google.com/spreadsheets/d/1HRyUoHULSqokP9kBjE0gk1rphJi5dLCR_PKfli7fx-g/edit#gid=1188077649
     * Proposed operation:
@@ -15,6 +17,16 @@ Notes:
         ...
         shutdown()
 
+    * Every drive command is a row in DIRECTIONS. The INA/INB pin states for each row are built once at import
+      time into PIN_STATES and applied with a single GPIO.output call; adding a direction is a one-row change.
+    * drive_vector(vx, vy, omega) moves along any direction at any speed. Each wheel gets its own direction on
+      INA/INB and its own duty cycle on the matching channel of pwm_list.
+    * getTargetTicks(d, direction) converts cm into the target ticks of a move with the per direction fits in
+      CALIBRATION_FILE, written by odometry_calibration.py and loaded at import. Directions and drive methods
+      without a fit fall back on TICKS_SCALE/TICKS_OFFSET.
+    * rotate_deg(angle) turns in place by an angle rather than cm. Each wheel has its own tick target and is
+      braked on its own count, see ROTATE_COMMANDS.
+
     See the following table for INA|INB configurations:
     INA | INB | Function
      1  |  1  | Brake to Vcc
@@ -24,14 +36,17 @@ Notes:
 """
 import sys
 sys.path.append("..") # Adds higher directory to python modules path.
+import json
+import math
+import os
 import time
+from types import MappingProxyType
+import numpy as np
 import pins
 import config
 import encoders
-try:
-    import RPi.GPIO as GPIO
-except RuntimeError:
-    print("Error importing RPi.GPIO! Try using sudo privileges.")
+import pwm_backend
+from gpio_backend import GPIO # RPi.GPIO, or sim_gpio when R5_GPIO=sim (see gpio_backend.py)
 
 GPIO.setmode(GPIO.BCM) # pin values correspond to GPIO pin number on board
 GPIO.setwarnings(False) # disable warnings from other drivers configuring other pins
@@ -47,15 +62,17 @@ chan_list = [
     pins.INA_BR,    # Motor Driver 4 (Back Right)
     pins.INB_BR
 ]
-# other channels touched, but these are PWM channels
+# other channels touched, but these are PWM channels. Ordered like chan_list (FR, FL, BL, BR).
 pwm_list = [
     pins.PWM0_FR,
-    pins.PWM0_BL,
     pins.PWM1_FL,
+    pins.PWM0_BL,
     pins.PWM1_BR
 ]
 # pwm instances to drive motor controllers
 pwms = []
+# rotation of the (FR, FL, BL, BR) wheels commanded last: 1 = CW, -1 = CCW, 0 = brake (see DIRECTIONS).
+wheel_directions = (0, 0, 0, 0)
 
 """
 GENERAL_PURPOSE_COMMANDS - used for state changes
@@ -66,7 +83,7 @@ def setup(freq):
     GPIO.setup(chan_list, GPIO.OUT) # set all touched pins to output mode
     GPIO.setup(pwm_list, GPIO.OUT)  # set all touched pins to output mode
     for pwm_chan in pwm_list:
-        pwms.append(GPIO.PWM(pwm_chan, freq)) # set motor frequency
+        pwms.append(pwm_backend.PWM(pwm_chan, freq)) # set motor frequency
     for pwm in pwms:
         pwm.start(0.0) # set default duty cycle to 0.0
 
@@ -83,465 +100,347 @@ def set_speed(duty):
     for pwm in pwms:
         pwm.ChangeDutyCycle(duty)
 
+"""
+DIRECTION_TABLE - wheel rotation for each drive command
+Notes:
+ * each row lists the rotation of the (FR, FL, BL, BR) wheels: 1 = CW, -1 = CCW, 0 = brake to GND.
+ * the left side goes CW and the right side goes CCW to drive forward.
+"""
+DIRECTIONS = MappingProxyType({
+    "forward":          (-1,  1,  1, -1),
+    "backward":         ( 1, -1, -1,  1),
+    "right":            ( 1,  1, -1, -1),
+    "left":             (-1, -1,  1,  1),
+    "forward_left":     (-1,  0,  1,  0),
+    "forward_right":    ( 0,  1,  0, -1),
+    "backward_left":    ( 0, -1,  0,  1),
+    "backward_right":   ( 1,  0, -1,  0),
+    "rotate_left":      (-1, -1, -1, -1),
+    "rotate_right":     ( 1,  1,  1,  1),
+})
+
+# (INA, INB) for each wheel rotation, see the truth table above.
+WHEEL_PIN_STATES = {
+     1: (GPIO.HIGH, GPIO.LOW),
+    -1: (GPIO.LOW, GPIO.HIGH),
+     0: (GPIO.LOW, GPIO.LOW),
+}
+
+# converts a row of DIRECTIONS into pin states ordered like chan_list.
+def getPinStates(wheels):
+    states = ()
+    for wheel in wheels:
+        states += WHEEL_PIN_STATES[wheel]
+    return states
+
+# pin states for each direction, ordered like chan_list. Built once at import time.
+PIN_STATES = MappingProxyType({
+    direction: getPinStates(wheels) for direction, wheels in DIRECTIONS.items()
+})
+# brake to GND on every motor.
+STOP_STATES = getPinStates((0, 0, 0, 0))
+
+# sets the INA/INB pins of all four motor drivers for the given direction in one write.
+def apply(direction):
+    global wheel_directions
+    GPIO.output(chan_list, PIN_STATES[direction])
+    wheel_directions = DIRECTIONS[direction]
+
 """
 DRIVE_COMMANDS - move based on input time
 """
-# Base moves forward until s seconds have passed.
-def drive_forward(s):
-    # left side goes clockwise
-    # right side goes counter clockwise
-    on = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    off = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
+# Base moves in direction until s seconds have passed.
+def drive(direction, s):
+    apply(direction)
     time.sleep(s)
     stop()
 
+# Base moves forward until s seconds have passed.
+def drive_forward(s):
+    drive("forward", s)
+
 # Base moves backward until s seconds have passed.
 def drive_backward(s):
-    # left side goes counter clockwise
-    # right side goes clockwise
-    off = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    on = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("backward", s)
 
 # Base moves to the right until s seconds have passed.
 def drive_right(s):
-    on = [
-        pins.INA_FR, # front side
-        pins.INA_FL,
-        pins.INB_BL, # back side
-        pins.INB_BR
-    ]
-    off = [
-        pins.INB_FR, # front side
-        pins.INB_FL,
-        pins.INA_BL, # back side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("right", s)
 
 # Base moves to the left until s seconds have passed.
 def drive_left(s):
-    off = [
-        pins.INA_FR, # front side
-        pins.INA_FL,
-        pins.INB_BL, # back side
-        pins.INB_BR
-    ]
-    on = [
-        pins.INB_FR, # front side
-        pins.INB_FL,
-        pins.INA_BL, # back side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("left", s)
 
 # Base moves forward left until s seconds have passed.
 def drive_forward_left(s):
-    on = [
-        pins.INB_FR,
-        pins.INA_BL
-    ]
-    off = [
-        pins.INA_FR,
-        pins.INA_FL,
-        pins.INB_FL,
-        pins.INB_BL,
-        pins.INA_BR,
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("forward_left", s)
 
 # Base moves forward right until s seconds have passed.
 def drive_forward_right(s):
-    on = [
-        pins.INA_FL,
-        pins.INB_BR
-    ]
-    off = [
-        pins.INA_FR,
-        pins.INB_FR,
-        pins.INB_FL,
-        pins.INA_BL,
-        pins.INB_BL,
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("forward_right", s)
 
 # Base moves backward left until s seconds have passed.
 def drive_backward_left(s):
-    on = [
-        pins.INB_FL,
-        pins.INA_BR
-    ]
-    off = [
-        pins.INA_FR,
-        pins.INB_FR,
-        pins.INA_FL,
-        pins.INA_BL,
-        pins.INB_BL,
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("backward_left", s)
 
 # Base moves backward right until s seconds have passed.
 def drive_backward_right(s):
-    on = [
-        pins.INA_FR,
-        pins.INB_BL
-    ]
-    off = [
-        pins.INB_FR,
-        pins.INA_FL,
-        pins.INB_FL,
-        pins.INA_BL,
-        pins.INA_BR,
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("backward_right", s)
 
 # Base rotates left until s seconds have passed.
 def drive_rotate_left(s):
-    # all wheels go CCW
-    on = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    off = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("rotate_left", s)
 
 # Base rotates right until s seconds have passed.
 def drive_rotate_right(s):
-    # all wheels go CW
-    on = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    off = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    time.sleep(s)
-    stop()
+    drive("rotate_right", s)
 
 # stops movement of motors by braking to GND
 def stop():
-    GPIO.output(chan_list, GPIO.LOW)
+    global wheel_directions
+    GPIO.output(chan_list, STOP_STATES)
+    wheel_directions = (0, 0, 0, 0)
 
 """
 DRIVE_COMMANDS_T - move based on encoder ticks
 Notes:
  * these methods will clear ENCx_count for you
  * BIG assumption here that encoder ticks are consistent for each motor and are synchronous across all motors - verify this!
- * these methods are BLOCKING! Consider a multiprocessing approach: start a subprocess for each movement.
+ * these methods are BLOCKING! See motion_executor.py to run them in the background.
+ * the calling thread sleeps in encoders.wait_for_ticks() rather than spinning, and gives up after
+   config.MOTOR_TICK_TIMEOUT seconds or when the emergency stop is pressed.
 """
+# Base moves in direction until the ticks for d cm have passed.
+# cancel is an optional threading.Event that stops the movement early (see encoders.wait_for_ticks).
+# returns the (FR, FL, BL, BR) ticks counted during the movement.
+def drive_t(direction, d, cancel=None):
+    return drive_ticks(direction, getTargetTicks(d, direction), cancel)
+
+# Base moves in direction until the avg ticks of all motors reach target.
+# returns the (FR, FL, BL, BR) ticks counted during the movement.
+def drive_ticks(direction, target, cancel=None):
+    config.lock = True
+    apply(direction)
+    # sleep until the encoder handler signals the avg ticks of all motors reached the expected tick count
+    encoders.wait_for_ticks(target, config.MOTOR_TICK_TIMEOUT, cancel)
+    ticks = stop_t()
+    config.lock = False
+    return ticks
+
 # All wheels go forward until d ticks have passed
 # d in ticks,
 def drive_forward_t(d):
-    config.lock = True
-    # left side goes clockwise
-    # right side goes counter clockwise
-    on = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    off = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-
-    stop_t()
-    config.lock = False
+    return drive_t("forward", d)
 
 # All wheels go backward until d ticks have passed.
 def drive_backward_t(d):
-    # left side goes counter clockwise
-    # right side goes clockwise
-    off = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    on = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("backward", d)
 
 # Base moves to the right until d ticks have passed.
 def drive_right_t(d):
-    on = [
-        pins.INA_FR, # front side
-        pins.INA_FL,
-        pins.INB_BL, # back side
-        pins.INB_BR
-    ]
-    off = [
-        pins.INB_FR, # front side
-        pins.INB_FL,
-        pins.INA_BL, # back side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("right", d)
 
 # Base moves to the left until d ticks have passed.
 def drive_left_t(d):
-    off = [
-        pins.INA_FR, # front side
-        pins.INA_FL,
-        pins.INB_BL, # back side
-        pins.INB_BR
-    ]
-    on = [
-        pins.INB_FR, # front side
-        pins.INB_FL,
-        pins.INA_BL, # back side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("left", d)
 
 # Base moves forward left until d ticks have passed.
 def drive_forward_left_t(d):
-    on = [
-        pins.INB_FR,
-        pins.INA_BL
-    ]
-    off = [
-        pins.INA_FR,
-        pins.INA_FL,
-        pins.INB_FL,
-        pins.INB_BL,
-        pins.INA_BR,
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("forward_left", d)
 
 # Base moves forward right until d ticks have passed.
 def drive_forward_right_t(d):
-    on = [
-        pins.INA_FL,
-        pins.INB_BR
-    ]
-    off = [
-        pins.INA_FR,
-        pins.INB_FR,
-        pins.INB_FL,
-        pins.INA_BL,
-        pins.INB_BL,
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("forward_right", d)
 
 # Base moves backward left until d ticks have passed.
 def drive_backward_left_t(d):
-    on = [
-        pins.INB_FL,
-        pins.INA_BR
-    ]
-    off = [
-        pins.INA_FR,
-        pins.INB_FR,
-        pins.INA_FL,
-        pins.INA_BL,
-        pins.INB_BL,
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("backward_left", d)
 
 # Base moves backward right until d ticks have passed.
 def drive_backward_right_t(d):
-    on = [
-        pins.INA_FR,
-        pins.INB_BL
-    ]
-    off = [
-        pins.INB_FR,
-        pins.INA_FL,
-        pins.INB_FL,
-        pins.INA_BL,
-        pins.INA_BR,
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("backward_right", d)
 
 # Base rotates left until d ticks have passed.
 def drive_rotate_left_t(d):
-    # all wheels go CCW
-    on = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    off = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("rotate_left", d)
 
 # Base rotates right until d ticks have passed.
 def drive_rotate_right_t(d):
-    # all wheels go CW
-    on = [
-        pins.INA_FL, # left side
-        pins.INA_BL,
-        pins.INA_FR, # right side
-        pins.INA_BR
-    ]
-    off = [
-        pins.INB_FL, # left side
-        pins.INB_BL,
-        pins.INB_FR, # right side
-        pins.INB_BR
-    ]
-    GPIO.output(on, GPIO.HIGH)
-    GPIO.output(off, GPIO.LOW)
-    target = getTargetTicks(d)
-    # poll until the avg ticks of all motors reaches expected tick count
-    while(getAvgTicks() < target):
-        pass
-    stop_t()
+    return drive_t("rotate_right", d)
+
+# brakes a single wheel to GND, slot 0 = FR ... 3 = BR (ordered like pwm_list), and leaves the others running.
+def brake_wheel(slot):
+    global wheel_directions
+    GPIO.output(chan_list[2 * slot:2 * slot + 2], WHEEL_PIN_STATES[0])
+    wheels = list(wheel_directions)
+    wheels[slot] = 0
+    wheel_directions = tuple(wheels)
 
 # stops movement of motors by braking to GND
+# returns the (FR, FL, BL, BR) ticks counted before the reset.
 def stop_t():
-    for i in range(1, 5):
-        encoders.reset(i)
-    GPIO.output(chan_list, GPIO.LOW)
+    global wheel_directions
+    GPIO.output(chan_list, STOP_STATES)
+    wheel_directions = (0, 0, 0, 0)
+    return encoders.snapshot_and_reset()
+
+"""
+DRIVE_COMMANDS_V - move along a continuous (vx, vy, omega) vector
+Notes:
+ * vx is forward, vy is to the left and omega is counterclockwise, each in [-1, 1] of the full duty cycle.
+ * the wheel speeds of a vector are the sum of the forward, left and rotate_left rows of DIRECTIONS weighted by
+   vx, vy and omega (mecanum inverse kinematics). If any wheel would exceed 1 all four are scaled down together
+   so the direction of travel is kept.
+ * these methods are non-blocking (except drive_vectors) and leave the motors running; call stop() when done.
+"""
+# maps (vx, vy, omega) to the speed of the (FR, FL, BL, BR) wheels.
+KINEMATICS = np.array([
+    DIRECTIONS["forward"],
+    DIRECTIONS["left"],
+    DIRECTIONS["rotate_left"]
+], dtype=float).T
+
+# returns the normalized (FR, FL, BL, BR) wheel speeds in [-1, 1] for a single vector.
+def getWheelSpeeds(vx, vy, omega):
+    speeds = KINEMATICS.dot((vx, vy, omega))
+    peak = np.abs(speeds).max()
+    if peak > 1:
+        speeds /= peak
+    return speeds
+
+# returns the normalized wheel speeds for an (N, 3) array of (vx, vy, omega) rows as an (N, 4) array.
+def getWheelSpeedsBatch(vectors):
+    speeds = np.asarray(vectors, dtype=float).dot(KINEMATICS.T)
+    peak = np.abs(speeds).max(axis=1, keepdims=True)
+    return speeds / np.maximum(peak, 1.0)
+
+# sets the direction and duty cycle of each wheel from normalized (FR, FL, BL, BR) wheel speeds.
+# duty is the duty cycle of a wheel at speed 1.
+def set_wheel_speeds(speeds, duty=config.MOTOR_PWM_DUTY):
+    global wheel_directions
+    wheels = tuple(np.sign(speeds).astype(int).tolist())
+    GPIO.output(chan_list, getPinStates(wheels))
+    wheel_directions = wheels
+    for pwm, speed in zip(pwms, speeds):
+        pwm.ChangeDutyCycle(float(abs(speed) * duty))
+
+# Base moves along (vx, vy, omega) until another command is given.
+def drive_vector(vx, vy, omega, duty=config.MOTOR_PWM_DUTY):
+    set_wheel_speeds(getWheelSpeeds(vx, vy, omega), duty)
+
+# Base follows an (N, 3) array of (vx, vy, omega) rows, holding each for dt seconds, then stops.
+# all wheel speeds are computed up front so the loop only writes to the pins.
+def drive_vectors(vectors, dt, duty=config.MOTOR_PWM_DUTY):
+    next_time = time.monotonic()
+    for speeds in getWheelSpeedsBatch(vectors):
+        set_wheel_speeds(speeds, duty)
+        next_time += dt
+        time.sleep(max(0.0, next_time - time.monotonic()))
+    stop()
 
 # assuming we only move in cardinal and extracardinal ways
 def getAvgTicks():
-    return (config.ENC_FR_count + config.ENC_FL_count + config.ENC_BL_count + config.ENC_BR_count) / 4
+    return encoders.getTotalTicks() / 4
+
+"""
+ODOMETRY_CALIBRATION - cm to ticks for each direction
+Notes:
+ * CALIBRATION_FILE holds a least squares fit of target = scale * cm + offset for each drive method and direction
+   (see odometry_calibration.py). scale is in rising edges per cm, offset in rising edges; it is negative since
+   the base coasts past the target after braking.
+ * the file carries CALIBRATION_VERSION. A file of another version is ignored rather than misread.
+ * the "rotations" of the file are the per wheel calibration of rotate_deg(), see ROTATE_COMMANDS.
+"""
+CALIBRATION_VERSION = 1
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "odometry_calibration.json")
+# method -> direction -> (scale, offset), see load_calibration().
+calibration = {}
+# duty -> angle bucket -> ((FR, FL, BL, BR) ticks per degree, (FR, FL, BL, BR) ticks coasted), see ROTATE_COMMANDS.
+rotations = {}
+
+# reads the fits in path into calibration and rotations. A missing file leaves everything uncalibrated.
+# returns the methods and directions loaded.
+def load_calibration(path=CALIBRATION_FILE):
+    global calibration, rotations
+    calibration = {}
+    rotations = {}
+    if not os.path.exists(path):
+        return calibration
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != CALIBRATION_VERSION:
+        print("Ignoring odometry calibration " + path + ": version " + str(data.get("version")) +
+              ", expected " + str(CALIBRATION_VERSION))
+        return calibration
+    for method, fits in data.get("methods", {}).items():
+        calibration[method] = {
+            direction: (fit["scale"], fit["offset"]) for direction, fit in fits.items() if direction in DIRECTIONS
+        }
+    for duty, buckets in data.get("rotations", {}).items():
+        rotations[float(duty)] = {
+            int(bucket): (tuple(fit["ticks_per_deg"]), tuple(fit["coast"])) for bucket, fit in buckets.items()
+        }
+    return calibration
+
+load_calibration()
+
+# d - distance in cm. direction - a key of DIRECTIONS, method - the drive command that will move it.
+# uses the fit in calibration if there is one, else TICKS_SCALE/TICKS_OFFSET.
+def getTargetTicks(d, direction=None, method="drive_t"):
+    fit = calibration.get(method, {}).get(direction)
+    if fit is not None:
+        return int(round(fit[0] * d + fit[1])) * config.ENC_RESOLUTION
+    return int((d*10-config.TICKS_OFFSET)/config.TICKS_SCALE) * config.ENC_RESOLUTION
 
-def getAvgTicksRotate(mode):
-    if(mode is 0): # rotate right, TODO: x and x motors are stationary
-        pass
-    elif(mode is 1):
-        pass
+"""
+ROTATE_COMMANDS - turn in place by an angle
+Notes:
+ * angles are in degrees, positive is counterclockwise (rotate_left) like odometry.py.
+ * every wheel of a rotation rolls along the same circle through the four wheels, so it turns
+   radians / RADIANS_PER_CM cm: TICKS_PER_DEG rising edges per degree from the geometry alone.
+ * the wheels don't coast or slip alike. odometry_calibration.py measures, per duty cycle and per angle bucket of
+   config.ROTATE_BUCKET_DEG, the ticks per degree each wheel actually turned and the ticks it coasted after its
+   brake. They are cached in CALIBRATION_FILE and loaded into rotations with the rest of the calibration.
+   A rotation uses the nearest calibrated bucket of its duty, or the geometry if that duty was never calibrated.
+ * rotate_deg() sleeps in encoders.wait_for_wheels() and brakes each wheel as it reaches its own target, rather
+   than all four on their average like drive_t().
+ * rotate_deg() leaves the duty cycle at its duty; call set_speed() before using the other drive commands.
+"""
+# radians the base turns for each cm a wheel travels while rotating.
+RADIANS_PER_CM = 2.0 / (config.WHEEL_BASE_CM + config.TRACK_WIDTH_CM)
+# rising edges of each wheel per degree of rotation.
+TICKS_PER_DEG = config.TICKS_PER_CM * math.radians(1.0) / RADIANS_PER_CM
+
+# returns the angle bucket (in degrees) of an angle.
+def getAngleBucket(angle):
+    return int(round(abs(angle) / config.ROTATE_BUCKET_DEG)) * config.ROTATE_BUCKET_DEG
+
+# returns the (FR, FL, BL, BR) tick targets of a rotation of angle degrees at duty.
+def getRotateTicks(angle, duty=config.MOTOR_PWM_DUTY):
+    buckets = rotations.get(float(duty))
+    if buckets:
+        bucket = getAngleBucket(angle)
+        per_deg, coast = buckets[min(buckets, key=lambda b: abs(b - bucket))]
     else:
-        print("Invalid rotation mode: " + str(mode))
+        per_deg, coast = (TICKS_PER_DEG,) * 4, (0.0,) * 4
+    return tuple(max(0, int(round(p * abs(angle) - c))) * config.ENC_RESOLUTION for p, c in zip(per_deg, coast))
 
-# d - distance in cm
-def getTargetTicks(d):
-    return int((d*10-config.TICKS_OFFSET)/config.TICKS_SCALE)
+# Base rotates in place by angle degrees (counterclockwise if positive) at duty, which stays set afterwards.
+# cancel is an optional threading.Event that stops the rotation early (see encoders.wait_for_wheels).
+# returns the (FR, FL, BL, BR) ticks counted during the rotation.
+def rotate_deg(angle, duty=config.MOTOR_PWM_DUTY, cancel=None):
+    config.lock = True
+    waiting = list(getRotateTicks(angle, duty))
+    set_speed(duty)
+    apply("rotate_left" if angle > 0 else "rotate_right")
+    deadline = time.monotonic() + config.MOTOR_TICK_TIMEOUT
+    while any(target is not None for target in waiting):
+        reached = encoders.wait_for_wheels(waiting, max(0.0, deadline - time.monotonic()), cancel)
+        if not reached:
+            break
+        for slot in reached:
+            brake_wheel(slot)
+            waiting[slot] = None
+    ticks = stop_t()
+    config.lock = False
+    return ticks
@@ -0,0 +1,192 @@
+"""
+This file contains the harness that calibrates the cm to ticks conversion of getTargetTicks() in motor_controller.py.
+Filename: odometry_calibration.py
+Last Modified: 10/18/26
+Notes:
+    * Mecanum wheels slip differently in every direction: strafing and the diagonals cover less ground per avg tick
+      than driving forward, and the rotations are measured as the arc the wheels travel. Each direction gets its
+      own fit instead of the one TICKS_SCALE/TICKS_OFFSET pair.
+    * run_trials() drives each commanded distance in one direction repeats times. After every run the wheels are
+      left to stop coasting and measure(direction, d, ticks) is asked how many cm the base actually moved:
+        ask()         - prompts for a tape measure reading; degrees for the rotations, converted to wheel arc cm.
+        sim_measure() - reads the motor model of sim_gpio.py (R5_GPIO=sim) through odometry.FORWARD_KINEMATICS.
+    * fit() solves target = scale * cm + offset over every run with least squares. scale is rising edges per cm
+      (compare it with config.TICKS_PER_CM), offset is in rising edges and takes in the ticks coasted after the
+      brake. Commanding the fitted target for d cm makes the first move land on d, without correction passes.
+    * The targets of a run come from the current calibration, so calibrating again refines the last fit.
+    * save() writes the fits to motor_controller.CALIBRATION_FILE under the drive method they were measured with
+      ("drive_t" or motion_profile's "profile"), since each brakes from a different speed. Fits of other methods
+      and directions already in the file are kept.
+    * calibrate_rotations() does the same for motor_controller.rotate_deg(): it turns each angle, measures the
+      degrees turned and averages, per duty and angle bucket, the ticks per degree and the ticks coasted of each
+      wheel. save_rotations() merges them into the file.
+    * Proposed operation:
+        encoders.setup()
+        motor_controller.setup(freq)
+        save(calibrate(DIRECTIONS, DISTANCES, ask), "drive_t")
+        save_rotations(calibrate_rotations(ANGLES, ask))
+        motor_controller.load_calibration()
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+sys.path.append("../odometry/")
+import json
+import math
+import os
+import time
+import numpy as np
+import config
+import motor_controller
+import motion_profile
+import odometry
+import route
+
+# every direction, including the diagonals and rotations.
+DIRECTIONS = tuple(motor_controller.DIRECTIONS)
+# cm commanded in each direction; spread out so the scale and the offset can be told apart.
+DISTANCES = (10, 20, 40, 60)
+# runs of each distance or angle.
+REPEATS = 2
+# degrees turned to calibrate rotate_deg(), each in its own config.ROTATE_BUCKET_DEG bucket.
+ANGLES = (15, 45, 90, 180)
+
+# drive commands that take a target in ticks, by method name.
+DRIVES = {
+    "drive_t": motor_controller.drive_ticks,
+    "profile": motion_profile.drive_ticks,
+}
+
+# one run of run_trials(). Ticks are rising edges (divided by config.ENC_RESOLUTION).
+TRIAL_DTYPE = np.dtype([
+    ("distance", "f4"),     # cm commanded
+    ("target", "f4"),       # avg ticks commanded
+    ("counted", "f4"),      # avg ticks counted, coasting included
+    ("measured", "f4"),     # cm the base moved
+])
+
+# prompts for the distance the base moved. Rotations are asked in degrees and returned as wheel arc cm.
+def ask(direction, d, ticks):
+    if direction.startswith("rotate"):
+        degrees = float(input("{} {}: degrees turned? ".format(direction, d)))
+        return math.radians(abs(degrees)) / odometry.RADIANS_PER_CM
+    return abs(float(input("{} {} cm: cm moved? ".format(direction, d))))
+
+# returns a measure that reads how far the simulated base moved since its last call from sim_gpio's motor model.
+def sim_measure():
+    import sim_gpio
+    last = np.array(sim_gpio.model.positions)
+    def measure(direction, d, ticks):
+        nonlocal last
+        positions = np.array(sim_gpio.model.positions)
+        x, y, arc = odometry.FORWARD_KINEMATICS.dot((positions - last) / config.TICKS_PER_CM)
+        last = positions
+        return abs(arc) if direction.startswith("rotate") else math.hypot(x, y)
+    return measure
+
+# drives every distance in direction repeats times with method at duty and returns a TRIAL_DTYPE record array.
+# duty is ignored by "profile", which steps its own duty cycle.
+def run_trials(direction, distances, measure, method="drive_t", repeats=REPEATS, duty=config.MOTOR_PWM_DUTY):
+    trials = np.zeros(len(distances) * repeats, dtype=TRIAL_DTYPE)
+    route.settle()
+    for i, d in enumerate(np.repeat(distances, repeats)):
+        target = motor_controller.getTargetTicks(float(d), direction, method)
+        motor_controller.set_speed(duty)
+        ticks = DRIVES[method](direction, target)
+        coast = route.settle()
+        counted = (sum(ticks) + sum(coast)) / 4
+        trials[i] = (d, target / config.ENC_RESOLUTION, counted / config.ENC_RESOLUTION,
+                     measure(direction, float(d), counted))
+    return trials
+
+# fits target = scale * measured + offset over trials with least squares.
+# returns a dict of the scale, offset, the rms error in cm and the number of runs.
+def fit(trials):
+    if len(np.unique(trials["measured"])) < 2:
+        raise ValueError("At least two different distances are needed to fit a scale and an offset")
+    a = np.column_stack((trials["measured"], np.ones(len(trials))))
+    (scale, offset), _, _, _ = np.linalg.lstsq(a, trials["target"].astype(float), rcond=None)
+    if scale <= 0:
+        raise ValueError("Fitted a scale of " + str(scale) + " ticks/cm; did the base move?")
+    error = (trials["target"] - offset) / scale - trials["measured"]
+    return {
+        "scale": float(scale),
+        "offset": float(offset),
+        "rms_cm": float(np.sqrt(np.mean(error ** 2))),
+        "runs": len(trials),
+    }
+
+# runs and fits every direction. returns direction -> fit().
+def calibrate(directions, distances, measure, method="drive_t", repeats=REPEATS, duty=config.MOTOR_PWM_DUTY):
+    fits = {}
+    for direction in directions:
+        trials = run_trials(direction, distances, measure, method, repeats, duty)
+        fits[direction] = fit(trials)
+        if method == "drive_t":
+            fits[direction]["duty"] = duty
+        print("{:>14}: {:6.2f} ticks/cm, offset {:7.1f} ticks, rms {:.2f} cm".format(
+            direction, fits[direction]["scale"], fits[direction]["offset"], fits[direction]["rms_cm"]))
+    return fits
+
+# turns every angle repeats times at each duty with rotate_deg() and averages the runs of each angle bucket.
+# returns duty -> bucket -> dict of the (FR, FL, BL, BR) rising edges per degree and rising edges coasted past
+# the target, the rms error of the runs in degrees and the number of runs.
+def calibrate_rotations(angles, measure, duties=(config.MOTOR_PWM_DUTY,), repeats=REPEATS):
+    table = {}
+    route.settle()
+    for duty in duties:
+        runs = {}
+        for angle in np.repeat(angles, repeats):
+            angle = float(angle)
+            target = np.array(motor_controller.getRotateTicks(angle, duty)) / config.ENC_RESOLUTION
+            ticks = motor_controller.rotate_deg(angle, duty)
+            counted = (np.array(ticks) + route.settle()) / config.ENC_RESOLUTION
+            arc = measure("rotate_left" if angle > 0 else "rotate_right", angle, counted.mean())
+            turned = math.degrees(arc * motor_controller.RADIANS_PER_CM)
+            runs.setdefault(motor_controller.getAngleBucket(angle), []).append(
+                (counted / turned, counted - target, turned - abs(angle)))
+        table[duty] = {}
+        for bucket, results in sorted(runs.items()):
+            per_deg, coast, error = zip(*results)
+            table[duty][bucket] = {
+                "ticks_per_deg": np.mean(per_deg, axis=0).tolist(),
+                "coast": np.mean(coast, axis=0).tolist(),
+                "rms_deg": float(np.sqrt(np.mean(np.square(error)))),
+                "runs": len(results),
+            }
+            print("{:5.1f}% {:>4} deg: ticks/deg {}, coast {}, rms {:.2f} deg".format(
+                duty, bucket, np.round(table[duty][bucket]["ticks_per_deg"], 2).tolist(),
+                np.round(table[duty][bucket]["coast"], 1).tolist(), table[duty][bucket]["rms_deg"]))
+    return table
+
+# returns the contents of the calibration file at path, or an empty calibration if it is missing or of
+# another version.
+def read(path=motor_controller.CALIBRATION_FILE):
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    if data.get("version") != motor_controller.CALIBRATION_VERSION:
+        data = {"version": motor_controller.CALIBRATION_VERSION, "methods": {}}
+    return data
+
+# writes data to the calibration file at path.
+def write(data, path=motor_controller.CALIBRATION_FILE):
+    data["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    # write next to the old file and swap, so a crash can't leave half a calibration behind.
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+# merges the fits of method into the calibration file at path.
+def save(fits, method="drive_t", path=motor_controller.CALIBRATION_FILE):
+    data = read(path)
+    data["methods"].setdefault(method, {}).update(fits)
+    write(data, path)
+
+# merges a table of calibrate_rotations() into the calibration file at path.
+def save_rotations(table, path=motor_controller.CALIBRATION_FILE):
+    data = read(path)
+    rotations = data.setdefault("rotations", {})
+    for duty, buckets in table.items():
+        rotations.setdefault(str(float(duty)), {}).update({str(bucket): fit for bucket, fit in buckets.items()})
+    write(data, path)
@@ -0,0 +1,176 @@
+"""
+This file contains a route engine that compiles a whole sequence of encoder based moves and runs it as a batch.
+Filename: route.py
+Last Modified: 10/18/26
+Notes:
+    * A route is a list of segments, each a (direction, distance, speed) triple or a dict with those keys:
+        direction - a key of motor_controller.DIRECTIONS
+        distance  - cm, > 0
+        speed     - duty cycle % (0, 100], optional (config.MOTOR_PWM_DUTY)
+      It can be given as a python list or loaded from a JSON or YAML (needs PyYAML) file holding that list:
+        [["forward", 30], ["forward_left", 20, 60], {"direction": "rotate_right", "distance": 10}]
+    * compile_route() validates every segment up front, before the base moves, and packs the route into a numpy
+      record array (SEGMENT_DTYPE) with the target ticks of every segment precomputed. The base only brakes and
+      coasts once at the end of a chain of blended segments, so only the last segment of a chain keeps the
+      offset of getTargetTicks() for its direction; the segments before it leave theirs out.
+    * run() blends consecutive segments where no wheel has to reverse (see blendable()): the pins and the duty
+      cycle are switched on the fly at the segment's cumulative tick count, without braking or resetting the
+      encoders. Everywhere else the base brakes, waits for the wheels to stop coasting (config.ROUTE_SETTLE_TIME)
+      so the coasting ticks don't count towards the next segment, and starts over.
+    * run() returns a record array (RESULT_DTYPE) with the time and the tick error of every segment. The error is
+      the avg ticks counted past the segment's end when it handed over (blended) or braked.
+    * Proposed operation:
+        motor_controller.setup(freq)
+        encoders.setup()
+        results = run(compile_route(load("route.json")))
+        print(report(results))
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+import json
+import numbers
+import time
+import numpy as np
+import config
+import encoders
+import motor_controller
+
+try:
+    import yaml
+except ImportError:
+    yaml = None # YAML routes are optional, JSON and python lists always work.
+
+# direction names by index; a compiled route stores the index.
+DIRECTION_NAMES = tuple(motor_controller.DIRECTIONS)
+# rows of DIRECTIONS by index, to check blending.
+WHEELS = np.array([motor_controller.DIRECTIONS[name] for name in DIRECTION_NAMES])
+
+# one segment of a compiled route.
+SEGMENT_DTYPE = np.dtype([
+    ("direction", "u1"),    # index into DIRECTION_NAMES
+    ("distance", "f4"),     # cm
+    ("speed", "f4"),        # duty cycle %
+    ("ticks", "i4"),        # avg ticks of the segment, getTargetTicks(distance, direction) less its offset
+                            # unless the segment is the last of a blend
+    ("blend", "?"),         # continues from the previous segment without braking
+])
+
+# what happened to a segment during run().
+RESULT_DTYPE = np.dtype([
+    ("direction", "u1"),
+    ("distance", "f4"),
+    ("start", "f8"),        # seconds since the start of the route
+    ("seconds", "f8"),      # time spent on the segment
+    ("ticks", "f4"),        # avg ticks counted during the segment
+    ("error", "f4"),        # avg ticks past the segment's end
+    ("blended", "?"),
+    ("reached", "?"),
+])
+
+# returns the segments in a JSON (.json) or YAML (.yaml, .yml) route file.
+def load(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("PyYAML is needed to load " + path)
+            return yaml.safe_load(f)
+        return json.load(f)
+
+# returns True if the base can switch from one row of DIRECTIONS to the other without a wheel reversing.
+def blendable(previous, following):
+    return bool(np.all(WHEELS[previous] * WHEELS[following] >= 0))
+
+# validates a route (see the notes above) and returns it as a SEGMENT_DTYPE record array.
+# raises ValueError naming the first bad segment.
+def compile_route(segments):
+    route = np.zeros(len(segments), dtype=SEGMENT_DTYPE)
+    distances = []  # as given; route stores them as float32
+    for i, segment in enumerate(segments):
+        if isinstance(segment, dict):
+            unknown = set(segment) - {"direction", "distance", "speed"}
+            if unknown:
+                raise ValueError("Segment " + str(i) + ": unknown keys " + str(sorted(unknown)))
+            segment = (segment.get("direction"), segment.get("distance"), segment.get("speed"))
+        if not 2 <= len(segment) <= 3:
+            raise ValueError("Segment " + str(i) + ": expected (direction, distance[, speed])")
+        direction, distance = segment[0], segment[1]
+        speed = segment[2] if len(segment) == 3 and segment[2] is not None else config.MOTOR_PWM_DUTY
+        if direction not in motor_controller.DIRECTIONS:
+            raise ValueError("Segment " + str(i) + ": invalid direction " + str(direction))
+        if isinstance(distance, bool) or not isinstance(distance, numbers.Real) or not distance > 0:
+            raise ValueError("Segment " + str(i) + ": distance must be a number > 0, got " + str(distance))
+        if isinstance(speed, bool) or not isinstance(speed, numbers.Real) or not 0 < speed <= 100:
+            raise ValueError("Segment " + str(i) + ": speed must be in (0, 100], got " + str(speed))
+        index = DIRECTION_NAMES.index(direction)
+        blend = i > 0 and blendable(route[i - 1]["direction"], index)
+        route[i] = (index, distance, speed, 0, blend)
+        distances.append(distance)
+    # the base only coasts once, after the last segment of a blend; drop the offset of the segments before it.
+    for i, distance in enumerate(distances):
+        direction = DIRECTION_NAMES[route[i]["direction"]]
+        ticks = motor_controller.getTargetTicks(distance, direction)
+        if i + 1 < len(route) and route[i + 1]["blend"]:
+            ticks -= motor_controller.getTargetTicks(0, direction)
+        if ticks <= 0:
+            raise ValueError("Segment " + str(i) + ": " + str(distance) + " cm is shorter than one tick")
+        route[i]["ticks"] = ticks
+    return route
+
+# waits until every wheel has stopped turning, for at most config.ROUTE_SETTLE_TIME seconds.
+# returns the (FR, FL, BL, BR) ticks counted while the wheels coasted.
+def settle():
+    deadline = time.monotonic() + config.ROUTE_SETTLE_TIME
+    while time.monotonic() < deadline:
+        if not any(encoders.velocity(i) for i in range(1, 5)):
+            break
+        time.sleep(0.01)
+    return encoders.snapshot_and_reset()
+
+# runs a compiled route. cancel is an optional threading.Event that stops the route early.
+# returns a RESULT_DTYPE record array; segments that didn't run are left out.
+def run(route, cancel=None):
+    config.lock = True
+    results = np.zeros(len(route), dtype=RESULT_DTYPE)
+    start = time.perf_counter()
+    end = 0     # cumulative avg ticks since the last brake at the end of the current segment
+    done = 0
+    encoders.snapshot_and_reset()
+    try:
+        for i, segment in enumerate(route):
+            if not segment["blend"]:
+                if i > 0:
+                    motor_controller.stop_t()
+                    settle()
+                end = 0
+            segment_start = time.perf_counter()
+            counted = encoders.getTotalTicks() / 4
+            end += int(segment["ticks"])
+
+            motor_controller.set_speed(float(segment["speed"]))
+            motor_controller.apply(DIRECTION_NAMES[segment["direction"]])
+            reached = encoders.wait_for_ticks(end, config.MOTOR_TICK_TIMEOUT, cancel)
+
+            now = time.perf_counter()
+            total = encoders.getTotalTicks() / 4
+            results[i] = (segment["direction"], segment["distance"], segment_start - start, now - segment_start,
+                          total - counted, total - end, segment["blend"], reached)
+            done = i + 1
+            if not reached:
+                break
+    finally:
+        motor_controller.stop_t()
+        config.lock = False
+    return results[:done]
+
+# returns a printable table of the results of run().
+def report(results):
+    lines = ["{:>3} {:>14} {:>6} {:>7} {:>7} {:>6} {:>5}".format(
+        "#", "direction", "cm", "start", "seconds", "error", "blend")]
+    for i, r in enumerate(results):
+        lines.append("{:>3} {:>14} {:6.1f} {:7.3f} {:7.3f} {:6.0f} {:>5}".format(
+            i, DIRECTION_NAMES[r["direction"]], r["distance"], r["start"], r["seconds"], r["error"],
+            "yes" if r["blended"] else "" if r["reached"] else "FAIL"))
+    if len(results):
+        last = results[-1]
+        lines.append("total {:.3f}s".format(last["start"] + last["seconds"]))
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+"""
+This file contains a closed loop speed controller for the four wheels of the base.
+Filename: speed_control.py
+Last Modified: 10/18/26
+Notes:
+    * The drive commands of motor_controller.py write the same duty cycle to every wheel, and the wheels don't
+      spin at the same speed for the same duty cycle, so the base curves. This loop reads the speed of each
+      wheel at a fixed rate (config.SPEED_LOOP_HZ) from encoders.velocity(), which is estimated from the time
+      between encoder edges, and trims each wheel's duty cycle with a PID so every wheel tracks the commanded
+      speed.
+    * Speeds are in rising edges of channel A per second (16 per motor revolution) in both encoder modes.
+    * The duty cycle of a wheel is a feedforward term (target / config.SPEED_MAX_TICKS) plus the PID output.
+    * Anti-windup: the integral term is clamped to +-config.SPEED_I_LIMIT and stops integrating while the
+      duty cycle is saturated in the direction of the error.
+    * A wheel motor_controller has braked (wheel_directions of 0, like between two drive_t calls) gets 0% duty
+      and its PID is held: the integral keeps the trim of the last move instead of winding up against a wheel
+      that can't turn, so the next move doesn't start with a duty cycle kick.
+    * Directions are still set by motor_controller (apply(), drive_t(), ...). While the loop is running, use
+      set_target() instead of motor_controller.set_speed().
+    * control_step() is independent of the hardware; test_speed_control.py drives it with a simulated plant.
+    * Proposed operation:
+        motor_controller.setup(freq)
+        encoders.setup()
+        start()
+        set_target(ticks_per_s)
+        motor_controller.drive_forward_t(d)
+        ...
+        stop()
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+import threading
+import time
+import config
+import encoders
+import motor_controller
+
+# a PID controller with a clamped output and a clamped, conditionally integrated integral term.
+class PID:
+    def __init__(self, kp, ki, kd, i_limit, out_min, out_max):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.i_limit = i_limit
+        self.out_min = out_min
+        self.out_max = out_max
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_error = None
+
+    # returns the controller output for the error over the last dt seconds. bias is added to the output
+    # before clamping (feedforward).
+    def update(self, error, dt, bias=0.0):
+        derivative = 0.0
+        if self.last_error is not None and dt > 0:
+            derivative = (error - self.last_error) / dt
+        self.last_error = error
+
+        integral = self.integral + self.ki * error * dt
+        integral = min(max(integral, -self.i_limit), self.i_limit)
+        output = bias + self.kp * error + integral + self.kd * derivative
+        # only keep integrating if that doesn't push a saturated output further past its limit.
+        if (output > self.out_max and error > 0) or (output < self.out_min and error < 0):
+            integral = self.integral
+            output = bias + self.kp * error + integral + self.kd * derivative
+        self.integral = integral
+        return min(max(output, self.out_min), self.out_max)
+
+# one controller per wheel, ordered (FR, FL, BL, BR) like motor_controller.pwms.
+pids = [
+    PID(config.SPEED_KP, config.SPEED_KI, config.SPEED_KD, config.SPEED_I_LIMIT, 0.0, 100.0)
+    for _ in range(4)
+]
+# commanded speed of each wheel in ticks/s.
+targets = [0.0, 0.0, 0.0, 0.0]
+# last duty cycle written to each wheel.
+duties = [0.0, 0.0, 0.0, 0.0]
+# last measured speed of each wheel in ticks/s.
+speeds = [0.0, 0.0, 0.0, 0.0]
+
+running = threading.Event()
+loop_thread = None
+
+"""
+GENERAL_PURPOSE_COMMANDS - used for state changes
+"""
+# starts the control loop. The motor controller and encoders need to be set up first.
+def start():
+    global loop_thread
+    print("Start Speed Control.")
+    for pid in pids:
+        pid.reset()
+    running.set()
+    loop_thread = threading.Thread(target=run, daemon=True)
+    loop_thread.start()
+
+# stops the control loop and sets every wheel to 0% duty.
+def stop():
+    print("Stop Speed Control.")
+    running.clear()
+    loop_thread.join()
+    for i, pwm in enumerate(motor_controller.pwms):
+        duties[i] = 0.0
+        pwm.ChangeDutyCycle(0.0)
+
+# sets the commanded speed of all wheels (ticks/s).
+def set_target(speed):
+    set_targets((speed, speed, speed, speed))
+
+# sets the commanded speed of each (FR, FL, BL, BR) wheel (ticks/s).
+def set_targets(wheel_speeds):
+    for i, speed in enumerate(wheel_speeds):
+        if speed == 0 and targets[i] != 0:
+            pids[i].reset()
+        targets[i] = float(speed)
+
+"""
+CONTROL_LOOP
+"""
+# returns the new duty cycle of each wheel given the measured (FR, FL, BL, BR) speeds over the last dt seconds.
+def control_step(measured, dt):
+    for i in range(4):
+        speeds[i] = measured[i]
+        if targets[i] == 0:
+            duties[i] = 0.0
+            continue
+        if motor_controller.wheel_directions[i] == 0:
+            # braked: hold the integral and drop the last error so the restart has no derivative kick.
+            pids[i].last_error = None
+            duties[i] = 0.0
+            continue
+        bias = 100.0 * targets[i] / config.SPEED_MAX_TICKS
+        duties[i] = pids[i].update(targets[i] - measured[i], dt, bias)
+    return duties
+
+# runs control_step() at config.SPEED_LOOP_HZ until stop() is called.
+def run():
+    period = 1.0 / config.SPEED_LOOP_HZ
+    last_time = time.monotonic()
+    next_time = last_time + period
+    while running.is_set():
+        time.sleep(max(0.0, next_time - time.monotonic()))
+        next_time += period
+
+        now = time.monotonic()
+        dt = now - last_time
+        last_time = now
+        # in rising edges of channel A per second, whatever the encoder mode.
+        measured = [encoders.velocity(i) / config.ENC_RESOLUTION for i in range(1, 5)]
+
+        for pwm, duty in zip(motor_controller.pwms, control_step(measured, dt)):
+            pwm.ChangeDutyCycle(duty)
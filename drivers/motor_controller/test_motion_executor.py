@@ -0,0 +1,64 @@
+"""
+This file tests the background executor for the encoder based drive commands.
+Filename: test_motion_executor.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: R5_GPIO defaults to sim below, so the motor model in sim_gpio.py turns the motor driver
+      pins into encoder edges. Run it with R5_GPIO=rpi on the base.
+    * Proposed operation:
+        start()
+        drive_forward_t(d)
+        ...
+        shutdown()
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import encoders
+import motor_controller
+import motion_executor as mx
+import config
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+motor_controller.set_speed(config.MOTOR_PWM_DUTY)
+mx.start()
+
+try:
+    # queue a few moves and keep the main thread busy while they run.
+    futures = [mx.drive_forward_t(10), mx.drive_backward_t(10), mx.drive_right_t(10)]
+    while not futures[-1].done():
+        print("Main loop is free, ticks so far: " + str(encoders.getTotalTicks()))
+        time.sleep(.25)
+    for future in futures:
+        print(future.result()) # should show reached=True and the ticks of each wheel
+
+    # cancel a move partway through; the base should brake and report fewer ticks. 200 cm takes close to 2 s
+    # at config.MOTOR_PWM_DUTY, well past the cancel.
+    future = mx.drive_left_t(200)
+    time.sleep(.3)
+    future.cancel()
+    result = future.result()
+    print(result)
+    print("Cancelled move reached its target: " + str(result.reached) + " (expected False)")
+
+    # a queued move that is cancelled never runs.
+    first = mx.drive_forward_t(10)
+    second = mx.drive_backward_t(10)
+    second.cancel()
+    print(first.result())
+    print("Second move cancelled: " + str(second.cancelled()))
+
+    mx.shutdown()
+    motor_controller.shutdown()
+    encoders.shutdown()
+except KeyboardInterrupt:
+    mx.shutdown()
+    motor_controller.shutdown()
+    encoders.shutdown()
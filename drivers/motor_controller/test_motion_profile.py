@@ -0,0 +1,71 @@
+"""
+This file compares the velocity profiled drive_t of motion_profile.py against motor_controller.drive_t.
+Filename: test_motion_profile.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim), so the wheels are the first order
+      motor model of sim_gpio.py. It has no wheel slip, so only the time and the overshoot can be compared.
+    * The overshoot is the avg ticks past the target once the wheels have stopped coasting, which is what
+      TICKS_SCALE/TICKS_OFFSET in getTargetTicks() have been hiding. Once forward is calibrated for a method
+      (odometry_calibration.py), its overshoot is measured against the calibrated target instead.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+import motor_controller
+import motion_profile
+
+# moves a distance with drive and returns the time it took and the avg ticks past the target once stopped.
+def trial(drive, d, method):
+    encoders.snapshot_and_reset()
+    start = time.perf_counter()
+    ticks = drive("forward", d)
+    elapsed = time.perf_counter() - start
+    time.sleep(.3) # let the motors spin down
+    coast = encoders.snapshot_and_reset()
+    stopped = (sum(ticks) + sum(coast)) / 4
+    return elapsed, stopped - motor_controller.getTargetTicks(d, "forward", method)
+
+def constant(duty):
+    def drive(direction, d):
+        motor_controller.set_speed(duty)
+        return motor_controller.drive_t(direction, d)
+    return drive
+
+def profiled(shape):
+    def drive(direction, d):
+        return motion_profile.drive_t(direction, d, shape=shape)
+    return drive
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+
+methods = [
+    ("drive_t 80%", constant(80.0), "drive_t"),
+    ("drive_t 100%", constant(100.0), "drive_t"),
+    ("trapezoid 100%", profiled("trapezoid"), "profile"),
+    ("s_curve 100%", profiled("s_curve"), "profile"),
+]
+for d in [10, 30, 60]:
+    for name, drive, method in methods:
+        elapsed, overshoot = trial(drive, d, method)
+        print("{:>3} cm {:>14}: {:5.3f}s, overshoot {:6.1f} ticks".format(d, name, elapsed, overshoot))
+
+# the schedule of a move is computed once.
+times = []
+for _ in range(2):
+    start = time.perf_counter()
+    motion_profile.plan(1000, 1.0, 100.0, "s_curve")
+    times.append((time.perf_counter() - start) * 1000)
+print("plan: {:.3f} ms, cached: {:.4f} ms".format(*times))
+
+motor_controller.shutdown()
+encoders.shutdown()
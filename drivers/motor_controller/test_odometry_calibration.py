@@ -0,0 +1,66 @@
+"""
+This file calibrates every direction with odometry_calibration.py and checks the first moves with the fits.
+Filename: test_odometry_calibration.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: R5_GPIO defaults to sim below and the distances are read from the motor model of sim_gpio.py,
+      which has no wheel slip, so every scale should come out near config.TICKS_PER_CM times the avg ticks per
+      cm of the direction. The fits are saved to a temporary file, not motor_controller.CALIBRATION_FILE.
+    * To calibrate the base, run it with R5_GPIO=rpi: you will be asked for a tape measure reading after every
+      run and the fits are saved to CALIBRATION_FILE.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+
+import json
+import tempfile
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+import motor_controller
+import odometry_calibration
+
+sim = os.environ.get("R5_GPIO") == "sim"
+measure = odometry_calibration.sim_measure() if sim else odometry_calibration.ask
+path = os.path.join(tempfile.mkdtemp(), "odometry_calibration.json") if sim else motor_controller.CALIBRATION_FILE
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+
+# error of the first move of each distance before and after calibrating.
+def first_moves(directions, method):
+    errors = {}
+    for direction in directions:
+        trials = odometry_calibration.run_trials(direction, [15, 45], measure, method, repeats=1)
+        errors[direction] = [round(float(e), 1) for e in trials["measured"] - trials["distance"]]
+    return errors
+
+before = first_moves(["forward", "right", "forward_left", "rotate_left"], "drive_t")
+fits = odometry_calibration.calibrate(odometry_calibration.DIRECTIONS, [10, 25, 40], measure, repeats=1)
+odometry_calibration.save(fits, "drive_t", path)
+odometry_calibration.save(odometry_calibration.calibrate(["forward"], [10, 25, 40], measure, "profile", 1),
+                          "profile", path)
+motor_controller.load_calibration(path)
+after = first_moves(["forward", "right", "forward_left", "rotate_left"], "drive_t")
+for direction in before:
+    print("{:>14} cm off at 15, 45 cm: before {}, after {}".format(direction, before[direction], after[direction]))
+print("profile forward cm off at 15, 45 cm: " + str(first_moves(["forward"], "profile")["forward"]))
+
+# a file of another version is ignored.
+with open(path) as f:
+    data = json.load(f)
+data["version"] += 1
+with open(path, "w") as f:
+    json.dump(data, f)
+print("loaded from a version " + str(data["version"]) + " file: " + str(motor_controller.load_calibration(path)))
+if sim:
+    os.remove(path)
+else:
+    motor_controller.load_calibration()
+
+motor_controller.shutdown()
+encoders.shutdown()
@@ -0,0 +1,65 @@
+"""
+This file compares rotate_deg() before and after calibrating it, and against a rotation stopped on the avg ticks.
+Filename: test_rotate.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: R5_GPIO defaults to sim below and the angle turned is read from the motor model of sim_gpio.py.
+      The simulated wheels are given different speeds (SIM_WHEEL_GAINS) so they don't reach their counts together.
+    * The calibration is saved to a temporary file, not motor_controller.CALIBRATION_FILE.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+
+import math
+import tempfile
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+import motor_controller
+import odometry_calibration
+import route
+
+config.SIM_WHEEL_GAINS = (1.0, 0.9, 1.05, 0.95)
+measure = odometry_calibration.sim_measure()
+path = os.path.join(tempfile.mkdtemp(), "odometry_calibration.json")
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+
+# turns angle with rotate and returns the degrees off and the ticks of each wheel past its share of the turn.
+def trial(rotate, angle):
+    route.settle()
+    ticks = rotate(angle)
+    counted = [t + c for t, c in zip(ticks, route.settle())]
+    direction = "rotate_left" if angle > 0 else "rotate_right"
+    turned = math.degrees(measure(direction, angle, sum(counted) / 4) * motor_controller.RADIANS_PER_CM)
+    ideal = motor_controller.TICKS_PER_DEG * abs(angle) * config.ENC_RESOLUTION
+    return round(turned - abs(angle), 2), [round(c - ideal) for c in counted]
+
+# the old way: drive_t on the avg ticks of the arc in cm.
+def average(angle):
+    d = math.radians(abs(angle)) / motor_controller.RADIANS_PER_CM
+    target = int(round(d * config.TICKS_PER_CM)) * config.ENC_RESOLUTION
+    motor_controller.set_speed(config.MOTOR_PWM_DUTY)
+    return motor_controller.drive_ticks("rotate_left" if angle > 0 else "rotate_right", target)
+
+angles = [90, 45, -90, 180]
+for angle in angles:
+    print("{:>4} deg avg ticks:        off {} deg, wheels {}".format(angle, *trial(average, angle)))
+    print("{:>4} deg rotate_deg:       off {} deg, wheels {}".format(angle, *trial(motor_controller.rotate_deg, angle)))
+
+odometry_calibration.save_rotations(odometry_calibration.calibrate_rotations([30, 90, 180], measure, repeats=1), path)
+motor_controller.load_calibration(path)
+for angle in angles:
+    print("{:>4} deg calibrated:       off {} deg, wheels {}".format(angle, *trial(motor_controller.rotate_deg, angle)))
+print("target ticks of 45 deg (bucket {}): {}".format(
+    motor_controller.getAngleBucket(45), motor_controller.getRotateTicks(45)))
+print("uncalibrated duty 50%: " + str(motor_controller.getRotateTicks(45, 50.0)))
+os.remove(path)
+
+motor_controller.shutdown()
+encoders.shutdown()
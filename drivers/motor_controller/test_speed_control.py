@@ -0,0 +1,113 @@
+"""
+This file tests the per wheel speed controller against a simulated plant.
+Filename: test_speed_control.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim) and the loop is stepped in simulated time.
+    * Each wheel is a first order motor whose speed at a given duty cycle is off by a few percent, like the
+      real wheels. The open loop run (feedforward only, like set_speed) is compared against control_step().
+    * The tick spread is the difference between the most and least ticks counted by any wheel; the base curves
+      when it grows.
+    * The wheels are driven forward by setting motor_controller.wheel_directions, without moving the pins; the
+      braked check clears it like stop_t() does between two moves.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import motor_controller
+import speed_control as sc
+
+FORWARD = motor_controller.DIRECTIONS["forward"]
+motor_controller.wheel_directions = FORWARD # the loop holds braked wheels, see the braked check below
+
+WHEEL_GAINS = [1.0, 0.92, 1.06, 0.97] # speed at a given duty, relative to config.SPEED_MAX_TICKS
+TAU = 0.08                            # motor time constant (s)
+SUBSTEPS = 20                         # plant steps per control period
+DURATION = 3.0                        # simulated seconds
+
+# first order model of the four wheels; counts whole ticks like the encoders.
+class Plant:
+    def __init__(self):
+        self.speed = [0.0] * 4
+        self.position = [0.0] * 4
+
+    # advances the plant by dt seconds at the given duty cycles, returns the ticks counted per wheel.
+    def step(self, duties, dt):
+        before = [int(p) for p in self.position]
+        h = dt / SUBSTEPS
+        for _ in range(SUBSTEPS):
+            for i in range(4):
+                steady = WHEEL_GAINS[i] * duties[i] / 100.0 * config.SPEED_MAX_TICKS
+                self.speed[i] += (steady - self.speed[i]) * h / TAU
+                self.position[i] += self.speed[i] * h
+        return [int(self.position[i]) - before[i] for i in range(4)]
+
+# returns the mean absolute speed error over the last second and the final tick spread.
+def simulate(closed_loop, target):
+    plant = Plant()
+    dt = 1.0 / config.SPEED_LOOP_HZ
+    for pid in sc.pids:
+        pid.reset()
+    sc.set_target(target)
+    duties = [100.0 * target / config.SPEED_MAX_TICKS] * 4
+    errors = []
+    steps = int(DURATION / dt)
+    for step in range(steps):
+        ticks = plant.step(duties, dt)
+        if closed_loop:
+            duties = list(sc.control_step([t / dt for t in ticks], dt))
+        if step >= steps - config.SPEED_LOOP_HZ:
+            errors.append(sum(abs(target - s) for s in plant.speed) / 4)
+    spread = max(plant.position) - min(plant.position)
+    return sum(errors) / len(errors), spread
+
+for target in [500.0, 1000.0, 2000.0]:
+    for name, closed_loop in [("open loop", False), ("pid", True)]:
+        error, spread = simulate(closed_loop, target)
+        print("{:>5.0f} ticks/s {:>9}: speed error {:6.1f} ticks/s, tick spread {:6.0f} ticks".format(
+            target, name, error, spread))
+
+# anti-windup: ask for more than the slowest wheel can do, then drop back to a reachable speed.
+plant = Plant()
+dt = 1.0 / config.SPEED_LOOP_HZ
+for pid in sc.pids:
+    pid.reset()
+sc.set_target(config.SPEED_MAX_TICKS)
+duties = [100.0] * 4
+for _ in range(int(2.0 / dt)):
+    duties = list(sc.control_step([t / dt for t in plant.step(duties, dt)], dt))
+print("saturated integral terms: " + str([round(pid.integral, 1) for pid in sc.pids]) +
+      " (limit " + str(config.SPEED_I_LIMIT) + ")")
+sc.set_target(1000.0)
+for _ in range(int(1.0 / dt)):
+    duties = list(sc.control_step([t / dt for t in plant.step(duties, dt)], dt))
+print("settled to " + str([round(s) for s in plant.speed]) + " ticks/s after dropping to 1000 ticks/s")
+
+# a brake between two moves: the loop keeps running at the same target while the wheels are held.
+plant = Plant()
+for pid in sc.pids:
+    pid.reset()
+sc.set_target(1000.0)
+duties = [100.0 * 1000.0 / config.SPEED_MAX_TICKS] * 4
+for _ in range(int(2.0 / dt)):
+    duties = list(sc.control_step([t / dt for t in plant.step(duties, dt)], dt))
+moving = [round(pid.integral, 1) for pid in sc.pids]
+steady = [round(d, 1) for d in duties]
+motor_controller.wheel_directions = (0, 0, 0, 0)
+for _ in range(int(1.0 / dt)):
+    duties = list(sc.control_step([t / dt for t in plant.step(duties, dt)], dt))
+print("integral terms moving " + str(moving) + ", after 1 s braked " +
+      str([round(pid.integral, 1) for pid in sc.pids]) + " (expected the same)")
+print("duty while braked: " + str(duties) + " (expected 0.0 each)")
+motor_controller.wheel_directions = FORWARD
+duties = list(sc.control_step([t / dt for t in plant.step(duties, dt)], dt))
+print("duty at the restart " + str([round(d, 1) for d in duties]) + " (expected the steady " + str(steady) +
+      " plus " + str(round(config.SPEED_KP * 1000.0, 1)) + " from the stopped wheels' error)")
+for _ in range(int(1.0 / dt)):
+    duties = list(sc.control_step([t / dt for t in plant.step(duties, dt)], dt))
+print("settled to " + str([round(s) for s in plant.speed]) + " ticks/s 1 s after the restart")
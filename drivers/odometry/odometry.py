@@ -0,0 +1,173 @@
+"""
+This file contains the wheel odometry of the mecanum base.
+Filename: odometry.py
+Last Modified: 10/18/26
+Notes:
+    * How a Mecanum Drive Works: https://seamonsters-2605.github.io/archive/mecanum/
+    * The encoders only count ticks, not direction. The direction of each wheel comes from the last command sent
+      by motor_controller (motor_controller.wheel_directions); ticks counted while a wheel is braked (coasting)
+      are given the direction it last spun in.
+    * update() reads the tick deltas of each wheel with encoders.read_total(), which isn't cleared by
+      motor_controller.stop_t(), and integrates the mecanum forward kinematics into an (x, y, theta) pose.
+      x is forward, y is to the left (both in cm) and theta is counterclockwise (radians, not wrapped) from
+      the pose at setup().
+    * Every pose is stored with its time.monotonic() timestamp in a PoseHistory ring buffer of
+      config.ODOM_HISTORY rows, so camera frames can be stamped with where the base was when they were taken.
+    * Proposed operation:
+        encoders.setup()
+        motor_controller.setup(freq)
+        setup()
+        start()
+        ...
+        get_pose()
+        pose_at(frame_time)
+        ...
+        stop()
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+sys.path.append("../encoders/")
+sys.path.append("../motor_controller/")
+import math
+import threading
+import time
+import numpy as np
+import config
+import encoders
+import motor_controller
+
+# maps the cm travelled by the (FR, FL, BL, BR) wheels onto (forward, left, counterclockwise) motion of the base.
+# this is the pseudo-inverse of motor_controller.KINEMATICS, whose columns are orthogonal with a norm^2 of 4.
+FORWARD_KINEMATICS = motor_controller.KINEMATICS.T / 4
+# ticks counted per cm a wheel travels, in the current encoder mode.
+TICKS_PER_CM = config.TICKS_PER_CM * config.ENC_RESOLUTION
+# radians the base turns for each cm a wheel travels while rotating.
+RADIANS_PER_CM = motor_controller.RADIANS_PER_CM
+
+# fixed size ring buffer of timestamped poses. Rows of (t, x, y, theta) live in one preallocated array.
+class PoseHistory:
+    def __init__(self, size):
+        self.size = size
+        self.poses = np.zeros((size, 4))
+        self.head = 0   # next row to write
+        self.count = 0  # rows written, up to size
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def append(self, t, x, y, theta):
+        self.poses[self.head] = (t, x, y, theta)
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    # returns the newest (t, x, y, theta), or None if empty.
+    def latest(self):
+        if self.count == 0:
+            return None
+        return tuple(self.poses[(self.head - 1) % self.size])
+
+    # returns the (t, x, y, theta) at time t, linearly interpolated between the two closest poses.
+    # times before the oldest or after the newest pose return that pose. None if empty.
+    def at(self, t):
+        if self.count == 0:
+            return None
+        oldest = (self.head - self.count) % self.size
+        # binary search for the first pose at or after t.
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.poses[(oldest + mid) % self.size, 0] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return tuple(self.poses[oldest])
+        if lo == self.count:
+            return self.latest()
+        before = self.poses[(oldest + lo - 1) % self.size]
+        after = self.poses[(oldest + lo) % self.size]
+        span = after[0] - before[0]
+        ratio = (t - before[0]) / span if span > 0 else 1.0
+        return (t,) + tuple(before[1:] + (after[1:] - before[1:]) * ratio)
+
+# returns the (x, y, theta) pose after moving the (FR, FL, BL, BR) wheels by wheel_cm from (x, y, theta).
+def integrate(x, y, theta, wheel_cm):
+    forward, left, turn = FORWARD_KINEMATICS.dot(wheel_cm)
+    dtheta = turn * RADIANS_PER_CM
+    # rotate the body motion into the world frame at the average heading over the step.
+    heading = theta + dtheta / 2
+    cos = math.cos(heading)
+    sin = math.sin(heading)
+    return (
+        x + forward * cos - left * sin,
+        y + forward * sin + left * cos,
+        theta + dtheta
+    )
+
+pose = (0.0, 0.0, 0.0)
+history = PoseHistory(config.ODOM_HISTORY)
+# encoders.read_total() of each wheel at the last update.
+last_ticks = [0, 0, 0, 0]
+# last non zero direction of each wheel, used for ticks counted while coasting.
+last_directions = [0, 0, 0, 0]
+
+running = threading.Event()
+loop_thread = None
+
+"""
+GENERAL_PURPOSE_COMMANDS - used for state changes
+"""
+# sets the pose to (x, y, theta) and clears the history. The encoders need to be set up first.
+def setup(x=0.0, y=0.0, theta=0.0):
+    global pose
+    print("Setup Odometry.")
+    for i in range(4):
+        last_ticks[i] = encoders.read_total(i + 1)
+    pose = (x, y, theta)
+    history.clear()
+    history.append(time.monotonic(), x, y, theta)
+
+# starts sampling the encoders at config.ODOM_HZ.
+def start():
+    global loop_thread
+    running.set()
+    loop_thread = threading.Thread(target=run, daemon=True)
+    loop_thread.start()
+
+# stops sampling the encoders.
+def stop():
+    running.clear()
+    loop_thread.join()
+
+# runs update() at config.ODOM_HZ until stop() is called.
+def run():
+    period = 1.0 / config.ODOM_HZ
+    next_time = time.monotonic()
+    while running.is_set():
+        update()
+        next_time += period
+        time.sleep(max(0.0, next_time - time.monotonic()))
+
+# integrates the ticks counted since the last update into the pose and stores it in the history.
+def update():
+    global pose
+    directions = motor_controller.wheel_directions
+    wheel_cm = [0.0, 0.0, 0.0, 0.0]
+    for i in range(4):
+        ticks = encoders.read_total(i + 1)
+        if directions[i] != 0:
+            last_directions[i] = directions[i]
+        wheel_cm[i] = last_directions[i] * (ticks - last_ticks[i]) / TICKS_PER_CM
+        last_ticks[i] = ticks
+    pose = integrate(pose[0], pose[1], pose[2], wheel_cm)
+    history.append(time.monotonic(), pose[0], pose[1], pose[2])
+
+# returns the latest (x, y, theta).
+def get_pose():
+    return pose
+
+# returns the (x, y, theta) at time t (time.monotonic()), interpolated from the history.
+def pose_at(t):
+    return history.at(t)[1:]
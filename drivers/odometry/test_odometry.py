@@ -0,0 +1,78 @@
+"""
+This file tests the wheel odometry with simulated encoder ticks.
+Filename: test_odometry.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim) and ticks are added to the encoder counts
+      directly while motor_controller.wheel_directions is set to the row of each move.
+    * Proposed operation:
+        setup()
+        update()
+        ...
+        get_pose()
+        pose_at(t)
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+sys.path.append("../motor_controller/")
+
+import math
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+import motor_controller
+import odometry
+
+# spins every wheel of direction by cm in steps, updating the odometry after each step.
+def move(direction, cm, steps=50):
+    motor_controller.wheel_directions = motor_controller.DIRECTIONS[direction]
+    total = int(round(cm * config.TICKS_PER_CM))
+    for step in range(steps):
+        ticks = total * (step + 1) // steps - total * step // steps
+        for i, channel in enumerate(encoders.chan_list):
+            if motor_controller.wheel_directions[i] != 0:
+                for _ in range(ticks):
+                    encoders.encoderEventHandler(channel)
+        odometry.update()
+    # stop_t() clears the counts; read_total() should not lose them.
+    for i in range(1, 5):
+        encoders.reset(i)
+    motor_controller.wheel_directions = (0, 0, 0, 0)
+
+def show(label, expected):
+    x, y, theta = odometry.get_pose()
+    print("{:>24}: x {:7.2f} y {:7.2f} theta {:7.2f} deg (expected {})".format(
+        label, x, y, math.degrees(theta), expected))
+
+odometry.setup()
+move("forward", 100)
+show("forward 100 cm", "x 100, y 0, theta 0")
+move("left", 50)
+show("left 50 cm", "x 100, y 50, theta 0")
+quarter = math.pi / 2 / odometry.RADIANS_PER_CM
+move("rotate_left", quarter)
+show("rotate left 90 deg", "x 100, y 50, theta 90")
+move("forward", 100)
+show("forward 100 cm", "x 100, y 150, theta 90")
+# on a diagonal only two wheels spin, so 50 cm of wheel travel is 25 cm back and 25 cm right.
+move("backward_right", 50)
+show("backward right 50 cm", "x 125, y 125, theta 90")
+
+# history queries: the newest pose is O(1), older poses are interpolated.
+history = odometry.history
+print("history holds " + str(history.count) + " of " + str(history.size) + " poses")
+t_old, t_new = history.at(0)[0], history.latest()[0]
+middle = (t_old + t_new) / 2
+print("pose at the middle of the run: " + str([round(float(v), 2) for v in odometry.pose_at(middle)]))
+print("pose before the oldest sample: " + str([round(float(v), 2) for v in odometry.pose_at(t_old - 1)]))
+
+# a small buffer wraps around and keeps the newest poses.
+small = odometry.PoseHistory(4)
+for t in range(10):
+    small.append(float(t), float(t), 0.0, 0.0)
+print("wrapped buffer at t=7.25: x " + str(float(small.at(7.25)[1])) + " (expected 7.25), oldest t " +
+      str(float(small.at(0)[0])) + " (expected 6.0)")
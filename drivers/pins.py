@@ -3,7 +3,7 @@ This file contains the global definitions of all used pins on the RPI4.
 All pins are labeled by GPIO number. 
 Filename: pins.py
 Author: Matthew Yu
-Last Modified: 03/08/20
+Last Modified: 10/18/26
 Usage: 
     import pins
     import RPi.GPIO as GPIO
@@ -40,10 +40,14 @@ PWM1_BR = 19     # Motor Driver  (4)
 """
 Encoder pins
 """
-ENC_FR = 9
+ENC_FR = 9      # channel A
 ENC_FL = 11
 ENC_BL = 5
 ENC_BR = 6
+ENC_FR_B = 10   # channel B, only used in quadrature mode. TODO: verify against the final wiring.
+ENC_FL_B = 8
+ENC_BL_B = 7
+ENC_BR_B = 4
 
 
 """
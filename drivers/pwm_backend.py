@@ -0,0 +1,109 @@
+"""
+This file picks how the drivers generate PWM signals.
+Filename: pwm_backend.py
+Last Modified: 10/18/26
+Usage:
+    import pwm_backend
+    GPIO.setup(pins.PWM0_FR, GPIO.OUT)
+    pwm = pwm_backend.PWM(pins.PWM0_FR, freq)   # same API as RPi.GPIO.PWM
+    pwm.start(duty)
+    pwm.ChangeDutyCycle(duty)
+    pwm.stop()
+
+    R5_PWM=pigpio python3 test_motor_system_3.py  # needs the pigpio daemon: sudo pigpiod
+Notes:
+    * pigpio: http://abyz.me.uk/rpi/pigpio/python.html
+    * The R5_PWM environment variable selects the backend:
+        gpio (default) - GPIO.PWM of gpio_backend.py. On the pi that is RPi.GPIO's software PWM, timed by a
+                         python thread per channel: it jitters under CPU load and costs cycles on every edge.
+        pigpio         - the pigpio daemon. Pins of a hardware PWM channel get true hardware PWM from the PWM
+                         peripheral (config.PWM_HARDWARE); every other pin gets PWM timed by DMA. Neither uses
+                         the CPU once a duty cycle is set.
+    * With R5_GPIO=sim the pigpio backend talks to sim_pigpio.py instead of the daemon, which drives the same
+      simulated pins as sim_gpio.py, so the motor model follows it.
+    * The pi has two hardware PWM channels: GPIO 12 and 18 both output PWM0, 13 and 19 both output PWM1, so two
+      pins on one channel can't have different duty cycles. The first pin set up on a channel keeps it until the
+      program exits and the others fall back on DMA. With the motor driver pins that is PWM0_FR and PWM1_FL in
+      hardware, PWM0_BL and PWM1_BR on DMA.
+    * DMA PWM only runs at a fixed set of frequencies (8000 Hz down to 10 Hz with the default 5 us sample rate)
+      and pigpio picks the closest. The pulse width of the requested frequency is kept where it fits, so the
+      servo positions don't move if its frequency is rounded.
+"""
+import os
+import config
+import gpio_backend
+
+BACKEND = os.environ.get("R5_PWM", "gpio")
+
+if BACKEND == "pigpio":
+    if gpio_backend.BACKEND == "sim":
+        import sim_pigpio as pigpio
+    else:
+        import pigpio
+
+# hardware PWM channel of each GPIO that can output one.
+HARDWARE_CHANNELS = {12: 0, 18: 0, 13: 1, 19: 1}
+
+pi = None       # connection to the pigpio daemon, opened by the first PWM.
+hardware = {}   # hardware PWM channel -> GPIO outputting it
+
+# returns the connection to the pigpio daemon, opening it on first use.
+def connect():
+    global pi
+    if pi is None:
+        pi = pigpio.pi()
+        if not pi.connected:
+            pi = None
+            raise RuntimeError("Can't connect to the pigpio daemon. Try starting it with sudo pigpiod.")
+    return pi
+
+# PWM on a GPIO through the pigpio daemon, with the API of RPi.GPIO.PWM.
+class PigpioPWM:
+    def __init__(self, channel, frequency):
+        self.pi = connect()
+        self.channel = channel
+        self.frequency = frequency
+        self.duty = 0.0
+        self.hardware = False
+        slot = HARDWARE_CHANNELS.get(channel)
+        if config.PWM_HARDWARE and slot is not None and hardware.get(slot, channel) == channel:
+            hardware[slot] = channel
+            self.hardware = True
+        else:
+            self.pi.set_PWM_range(channel, config.PWM_RANGE)
+        self.ChangeFrequency(frequency)
+
+    def start(self, duty):
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        if duty < 0.0 or duty > 100.0:
+            raise ValueError("dutycycle must have a value from 0.0 to 100.0")
+        self.duty = duty
+        if self.hardware:
+            # duty cycle in millionths.
+            self.pi.hardware_PWM(self.channel, self.frequency, int(duty * 10000))
+        else:
+            # same pulse width at the frequency pigpio picked.
+            duty = min(100.0, duty * self.actual / self.frequency)
+            self.pi.set_PWM_dutycycle(self.channel, int(round(duty * config.PWM_RANGE / 100.0)))
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+        if self.hardware:
+            self.actual = frequency
+        else:
+            self.actual = self.pi.set_PWM_frequency(self.channel, frequency)
+        self.ChangeDutyCycle(self.duty)
+
+    def stop(self):
+        if self.hardware:
+            self.pi.hardware_PWM(self.channel, 0, 0)
+        else:
+            self.pi.set_PWM_dutycycle(self.channel, 0)
+
+# returns a PWM on channel at frequency (Hz) from the selected backend. The channel must be set up as an output.
+def PWM(channel, frequency):
+    if BACKEND == "pigpio":
+        return PigpioPWM(channel, frequency)
+    return gpio_backend.GPIO.PWM(channel, frequency)
@@ -2,7 +2,7 @@
 This file contains the interface for driving the HD-1501MG servo that controls the bin.
 Filename: servo.py
 Author: Matthew Yu
-Last Modified: 2/21/20
+Last Modified: 10/18/26
 Notes: 
     * pins need to be adjusted for the final robot configuration
     * the servo should be able to move to two positions:
@@ -13,15 +13,15 @@ Notes:
         * http://bc-robotics.com/datasheets/HD-1501MG.pdf
         * https://raspi.tv/2013/rpi-gpio-0-5-2a-now-has-software-pwm-how-to-use-it
     * assumptions made: that the servo needs a continuous signal to maintain position.
+    * the PWM comes from pwm_backend.py. With R5_PWM=pigpio it is DMA timed (GPIO 25 has no hardware PWM), and
+      since pigpio runs it at 500 Hz the duty cycles below are rescaled to keep the pulse widths of 454 Hz.
 
 """
 import sys
 sys.path.append("..") # Adds higher directory to python modules path.
 import pins as p
-try:
-    import RPi.GPIO as GPIO
-except RuntimeError:
-    print("Error importing RPi.GPIO! Try using sudo privileges.")
+import pwm_backend
+from gpio_backend import GPIO # RPi.GPIO, or sim_gpio when R5_GPIO=sim (see gpio_backend.py)
 
 """
 I want the servo to start at the minimum position (800us=.8ms) and go to the maximum position (2200us=2.2ms).
@@ -40,12 +40,13 @@ FREQ_SERVO = 454 #Hz
 GPIO.setmode(GPIO.BCM) # pin values correspond to GPIO pin number on board
 GPIO.setwarnings(False) # disable warnings from other drivers configuring other pins
 
-pwm = None # initialize software PWM object.
+pwm = None # initialize PWM object (software or pigpio, see pwm_backend.py).
 
 def setup():
+    global pwm
     print("Setup of the HD-1501MG Servo.")
-    GPIO.setup(p.SERVO,  GPIO.OUT) # Set pin 9 to be an input pin (switch)
-    pwm = GPIO.PWM(p.SERVO, FREQ_SERVO)
+    GPIO.setup(p.SERV0,  GPIO.OUT) # Set pin 9 to be an input pin (switch)
+    pwm = pwm_backend.PWM(p.SERV0, FREQ_SERVO)
     pwm.start(100.0) 
 
 def shutdown():
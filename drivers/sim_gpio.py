@@ -0,0 +1,214 @@
+"""
+This file contains a simulated stand-in for RPi.GPIO, used when R5_GPIO=sim (see gpio_backend.py).
+Filename: sim_gpio.py
+Last Modified: 10/18/26
+Notes:
+    * Implements the part of the RPi.GPIO API used by the drivers: setmode, setwarnings, setup, output, input,
+      cleanup, add_event_detect, add_event_callback, remove_event_detect and PWM.
+    * Every output() and PWM duty cycle change is recorded in writes as (time.monotonic(), channel, value).
+      pwm_duty holds the current duty cycle of every started PWM channel.
+    * model steps a first order model of the four drive motors at config.SIM_RATE_HZ. The speed of each motor
+      follows its INA/INB direction and its PWM duty cycle (config.SIM_MAX_TICKS at 100%), and the model
+      toggles both encoder channels (A leading B when turning CW) and calls the registered event callbacks
+      from its own thread, like the RPi.GPIO callback thread does.
+    * Edges are generated in bursts once per model step, so edge timestamps are only as fine as the step.
+"""
+import sys
+sys.path.append("..") # Adds higher directory to python modules path.
+import math
+import threading
+import time
+from collections import deque
+import pins
+import config
+
+# same values as RPi.GPIO
+BOARD = 10
+BCM = 11
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+RPI_INFO = {"TYPE": "Simulated"}
+
+mode = None
+directions = {}     # channel -> IN or OUT
+levels = {}         # channel -> LOW or HIGH
+detects = {}        # channel -> (edge, list of callbacks)
+pwm_duty = {}       # channel -> duty cycle of a started PWM
+writes = deque(maxlen=config.SIM_LOG_SIZE)
+
+# returns a list of channels from a channel or a list/tuple of channels.
+def to_list(channel):
+    if isinstance(channel, (list, tuple)):
+        return list(channel)
+    return [channel]
+
+def setmode(new_mode):
+    global mode
+    mode = new_mode
+
+def getmode():
+    return mode
+
+def setwarnings(flag):
+    pass
+
+def setup(channel, direction, pull_up_down=PUD_OFF, initial=None):
+    for c in to_list(channel):
+        directions[c] = direction
+        if c in model.encoder_levels:
+            levels[c] = model.encoder_levels[c]
+        elif direction == OUT:
+            levels[c] = HIGH if initial else LOW
+        else:
+            levels[c] = HIGH if pull_up_down == PUD_UP else LOW
+
+def output(channel, value):
+    channels = to_list(channel)
+    if isinstance(value, (list, tuple)):
+        values = list(value)
+        if len(values) != len(channels):
+            raise RuntimeError("Number of channels != number of values")
+    else:
+        values = [value] * len(channels)
+    now = time.monotonic()
+    for c, v in zip(channels, values):
+        if directions.get(c) != OUT:
+            raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+        levels[c] = HIGH if v else LOW
+        writes.append((now, c, levels[c]))
+
+def input(channel):
+    if channel not in directions:
+        raise RuntimeError("You must setup() the GPIO channel first")
+    return levels[channel]
+
+def cleanup(channel=None):
+    channels = list(directions) if channel is None else to_list(channel)
+    for c in channels:
+        directions.pop(c, None)
+        detects.pop(c, None)
+        pwm_duty.pop(c, None)
+
+def add_event_detect(channel, edge, callback=None, bouncetime=None):
+    if channel in detects:
+        raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+    detects[channel] = (edge, [callback] if callback is not None else [])
+    model.start()
+
+def add_event_callback(channel, callback):
+    detects[channel][1].append(callback)
+
+def remove_event_detect(channel):
+    detects.pop(channel, None)
+
+# calls the callbacks registered on channel if level is an edge they watch.
+def fire(channel, level):
+    detect = detects.get(channel)
+    if detect is None:
+        return
+    edge, callbacks = detect
+    if edge == BOTH or (edge == RISING and level) or (edge == FALLING and not level):
+        for callback in callbacks:
+            callback(channel)
+
+# software PWM on a channel.
+class PWM:
+    def __init__(self, channel, frequency):
+        if directions.get(channel) != OUT:
+            raise RuntimeError("You must setup() the GPIO channel as an output first")
+        self.channel = channel
+        self.frequency = frequency
+        self.duty = 0.0
+
+    def start(self, duty):
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        if duty < 0.0 or duty > 100.0:
+            raise ValueError("dutycycle must have a value from 0.0 to 100.0")
+        self.duty = duty
+        pwm_duty[self.channel] = duty
+        writes.append((time.monotonic(), self.channel, duty))
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        pwm_duty.pop(self.channel, None)
+
+"""
+MOTOR_MODEL - synthesizes encoder edges from the motor driver pins
+"""
+# AB states of an encoder turning CW, A leading B.
+SEQUENCE = (0b00, 0b10, 0b11, 0b01)
+
+# (INA, INB, PWM, encoder A, encoder B) of each motor, ordered (FR, FL, BL, BR).
+MOTORS = [
+    (pins.INA_FR, pins.INB_FR, pins.PWM0_FR, pins.ENC_FR, pins.ENC_FR_B),
+    (pins.INA_FL, pins.INB_FL, pins.PWM1_FL, pins.ENC_FL, pins.ENC_FL_B),
+    (pins.INA_BL, pins.INB_BL, pins.PWM0_BL, pins.ENC_BL, pins.ENC_BL_B),
+    (pins.INA_BR, pins.INB_BR, pins.PWM1_BR, pins.ENC_BR, pins.ENC_BR_B)
+]
+
+class MotorModel:
+    def __init__(self, motors):
+        self.motors = motors
+        self.speeds = [0.0] * len(motors)       # rising edges of A per second, positive when CW
+        self.positions = [0.0] * len(motors)    # encoder cycles turned since start, positive when CW
+        self.encoder_levels = {}
+        for motor in motors:
+            self.encoder_levels[motor[3]] = LOW
+            self.encoder_levels[motor[4]] = LOW
+        self.thread = None
+
+    # starts stepping the model in a background thread, if it isn't already running.
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        period = 1.0 / config.SIM_RATE_HZ
+        last = time.monotonic()
+        while True:
+            time.sleep(period)
+            now = time.monotonic()
+            self.step(now - last)
+            last = now
+
+    # advances every motor by dt seconds and fires the encoder edges it crossed.
+    def step(self, dt):
+        for i, (ina, inb, pwm, enc_a, enc_b) in enumerate(self.motors):
+            a = levels.get(ina, LOW)
+            b = levels.get(inb, LOW)
+            direction = 1 if (a, b) == (HIGH, LOW) else -1 if (a, b) == (LOW, HIGH) else 0
+            steady = direction * config.SIM_WHEEL_GAINS[i] * pwm_duty.get(pwm, 0.0) / 100.0 * config.SIM_MAX_TICKS
+            self.speeds[i] += (steady - self.speeds[i]) * min(1.0, dt / config.SIM_MOTOR_TAU)
+
+            # every quarter cycle is an edge on A or B.
+            old = math.floor(self.positions[i] * 4)
+            self.positions[i] += self.speeds[i] * dt
+            new = math.floor(self.positions[i] * 4)
+            step = 1 if new > old else -1
+            for q in range(old, new, step):
+                previous = SEQUENCE[q % 4]
+                current = SEQUENCE[(q + step) % 4]
+                if (previous ^ current) & 0b10:
+                    channel, level = enc_a, current >> 1
+                else:
+                    channel, level = enc_b, current & 1
+                self.encoder_levels[channel] = level
+                if channel in directions:
+                    levels[channel] = level
+                fire(channel, level)
+
+model = MotorModel(MOTORS)
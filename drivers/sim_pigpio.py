@@ -0,0 +1,79 @@
+"""
+This file contains a simulated stand-in for the pigpio daemon, used when R5_GPIO=sim and R5_PWM=pigpio
+(see pwm_backend.py).
+Filename: sim_pigpio.py
+Last Modified: 10/18/26
+Notes:
+    * Implements the part of the pigpio API used by pwm_backend.py: pi(), connected, set_PWM_range,
+      set_PWM_frequency, set_PWM_dutycycle, hardware_PWM, get_PWM_dutycycle, get_PWM_frequency and stop.
+    * Duty cycles are written into sim_gpio.pwm_duty and sim_gpio.writes as a % like sim_gpio.PWM does, so the
+      motor model follows them the same way.
+    * set_PWM_frequency rounds to the DMA frequencies of the default 5 us sample rate, like the daemon.
+    * hardware_PWM only works on the GPIOs of a hardware PWM channel, and every GPIO started on a channel outputs
+      the last settings of that channel, like the two pins of PWM0 (12, 18) and of PWM1 (13, 19) on the pi.
+"""
+import time
+import sim_gpio
+
+# frequencies DMA PWM can run at with a 5 us sample rate.
+FREQUENCIES = (8000, 4000, 2000, 1600, 1000, 800, 500, 400, 320, 250, 200, 160, 100, 80, 50, 40, 20, 10)
+# hardware PWM channel of each GPIO that can output one.
+HARDWARE_CHANNELS = {12: 0, 18: 0, 13: 1, 19: 1}
+
+# raised by the daemon on bad arguments.
+class error(Exception):
+    pass
+
+class pi:
+    def __init__(self, host="localhost", port=8888):
+        self.connected = True
+        self.ranges = {}        # GPIO -> range of set_PWM_dutycycle
+        self.frequencies = {}   # GPIO -> frequency (Hz)
+        self.dutycycles = {}    # GPIO -> dutycycle in its range
+        self.channels = {}      # hardware PWM channel -> set of GPIOs outputting it
+
+    def set_PWM_range(self, gpio, range_):
+        if not 25 <= range_ <= 40000:
+            raise error("GPIO has a bad dutycycle range")
+        self.ranges[gpio] = range_
+        return range_
+
+    # returns the frequency set, the closest one DMA PWM can run at.
+    def set_PWM_frequency(self, gpio, frequency):
+        self.frequencies[gpio] = min(FREQUENCIES, key=lambda f: abs(f - frequency))
+        return self.frequencies[gpio]
+
+    def set_PWM_dutycycle(self, gpio, dutycycle):
+        range_ = self.ranges.get(gpio, 255)
+        if not 0 <= dutycycle <= range_:
+            raise error("dutycycle not 0-range")
+        self.dutycycles[gpio] = dutycycle
+        self.output(gpio, dutycycle * 100.0 / range_)
+
+    # frequency in Hz (0 turns the channel off), dutycycle in millionths.
+    def hardware_PWM(self, gpio, frequency, dutycycle):
+        if gpio not in HARDWARE_CHANNELS:
+            raise error("GPIO has no hardware PWM")
+        if not 0 <= dutycycle <= 1000000:
+            raise error("hardware PWM dutycycle not 0-1M")
+        self.ranges[gpio] = 1000000
+        gpios = self.channels.setdefault(HARDWARE_CHANNELS[gpio], set())
+        gpios.add(gpio)
+        for other in gpios:
+            self.frequencies[other] = frequency
+            self.dutycycles[other] = dutycycle
+            self.output(other, dutycycle / 10000.0 if frequency else 0.0)
+
+    def get_PWM_dutycycle(self, gpio):
+        return self.dutycycles.get(gpio, 0)
+
+    def get_PWM_frequency(self, gpio):
+        return self.frequencies.get(gpio, 0)
+
+    def stop(self):
+        self.connected = False
+
+    # drives the simulated pin at a duty cycle %.
+    def output(self, gpio, duty):
+        sim_gpio.pwm_duty[gpio] = duty
+        sim_gpio.writes.append((time.monotonic(), gpio, duty))
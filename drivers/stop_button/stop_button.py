@@ -2,10 +2,11 @@
 This file contains the interface for driving the emergency stop button, placed on the top of the robot.
 Filename: stop_button.py
 Author: Matthew Yu
-Last Modified: 2/20/20
+Last Modified: 10/18/26
 Notes: 
     * pins need to be adjusted for the final robot configuration
     * the buttonEventHandler should connect to a global variable that our main should be able to see; the main should act upon the variable being True (i.e. emergency_stop=True), stopping all functionality but not actually shutting off.
+    * engaging the stop also wakes any drive_*_t command sleeping in encoders.wait_for_ticks().
     * Potentially, the emergency stop button should also act as a start button. TODO: Consider.
     * possible useful documents: 
         * http://raspberrywebserver.com/gpio/using-interrupt-driven-gpio.html
@@ -15,12 +16,11 @@ Notes:
 """
 import sys
 sys.path.append("..") # Adds higher directory to python modules path.
+sys.path.append("../encoders/")
 import pins as p
 import config as c
-try:
-    import RPi.GPIO as GPIO
-except RuntimeError:
-    print("Error importing RPi.GPIO! Try using sudo privileges.")
+import encoders
+from gpio_backend import GPIO # RPi.GPIO, or sim_gpio when R5_GPIO=sim (see gpio_backend.py)
 
 # TODO: for testing purposes, set button to GPIO 14. 
 # Make sure that the default pull according to the rpi datasheet is pull down low.
@@ -51,4 +51,5 @@ def buttonEventHandler(channel):
         c.emergency_stop = False
     else:
         GPIO.output(PIN_LED, GPIO.HIGH)
-        c.emergency_stop = True 
+        c.emergency_stop = True
+        encoders.interrupt() # wake up any movement waiting on encoder ticks
@@ -0,0 +1,61 @@
+"""
+This file runs the motor controller and the servo on the pigpio PWM backend against the simulated GPIO backend.
+Filename: test_pwm_backend.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: R5_GPIO and R5_PWM default to sim and pigpio below, so pwm_backend.py talks to
+      sim_pigpio.py and the motor model of sim_gpio.py follows its duty cycles. Run it with R5_GPIO=rpi (and
+      sudo pigpiod started) on the base.
+    * Checks which motor pins got a hardware PWM channel, that moves still reach their targets and that the
+      servo keeps its pulse widths at the frequency pigpio rounds it to.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+sys.path.append("../motor_controller/")
+sys.path.append("../servo/")
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+os.environ.setdefault("R5_PWM", "pigpio")
+
+import config
+import pwm_backend
+import encoders
+import motor_controller
+import servo
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+motor_controller.set_speed(config.MOTOR_PWM_DUTY)
+
+for pwm in motor_controller.pwms:
+    print("GPIO {:>2}: {:>8} PWM at {} Hz".format(
+        pwm.channel, "hardware" if pwm.hardware else "DMA", pwm.actual))
+
+ticks = motor_controller.drive_t("forward", 10)
+print("forward 10 cm: ticks {} (target avg {})".format(ticks, motor_controller.getTargetTicks(10, "forward")))
+
+# returns the duty cycle % a pwm outputs, read back from the daemon.
+def output(pwm):
+    return round(pwm_backend.pi.get_PWM_dutycycle(pwm.channel) * 100.0 / (1e6 if pwm.hardware else config.PWM_RANGE), 1)
+
+# each wheel keeps its own duty cycle, hardware and DMA alike.
+motor_controller.drive_vector(1.0, 0.5, 0.0)
+print("drive_vector(1, .5, 0) duties: " + str([output(pwm) for pwm in motor_controller.pwms]))
+motor_controller.stop()
+
+servo.setup()
+servo.extend()
+print("servo at {} Hz for {} Hz: extend {:.3f} ms".format(
+    servo.pwm.actual, servo.FREQ_SERVO,
+    pwm_backend.pi.get_PWM_dutycycle(servo.pwm.channel) / config.PWM_RANGE / servo.pwm.actual * 1000))
+servo.shutdown()
+
+try:
+    pwm_backend.PWM(0, 100).ChangeDutyCycle(120)
+except ValueError as e:
+    print("rejected: " + str(e))
+
+motor_controller.shutdown()
+encoders.shutdown()
@@ -0,0 +1,72 @@
+"""
+This file runs a route through route.py and compares it against the same moves as separate drive_t calls.
+Filename: test_route.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: R5_GPIO defaults to sim below, so the motor model in sim_gpio.py turns the motor driver
+      pins into encoder edges. Run it with R5_GPIO=rpi on the base.
+    * The route is route_example.json. Segments that only add or drop wheels from the previous one are blended.
+    * The separate calls are run like test_motor_system.py does, one blocking drive_t per segment, with the
+      same settle time between them so that both runs count the same ticks.
+    * The offsets check loads made up fits from a temporary file, not motor_controller.CALIBRATION_FILE, and
+      loads CALIBRATION_FILE back after.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+sys.path.append("../motor_controller/")
+
+import tempfile
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+import motor_controller
+import odometry_calibration
+import route
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+
+compiled = route.compile_route(route.load("route_example.json"))
+print(str(len(compiled)) + " segments, " + str(compiled.nbytes) + " bytes compiled")
+
+results = route.run(compiled)
+print(route.report(results))
+route.settle()
+
+start = time.perf_counter()
+errors = []
+for segment in compiled:
+    motor_controller.set_speed(float(segment["speed"]))
+    ticks = motor_controller.drive_t(route.DIRECTION_NAMES[segment["direction"]], float(segment["distance"]))
+    errors.append(sum(ticks) / 4 - segment["ticks"])
+    route.settle()
+print("separate drive_t calls: {:.3f}s, errors {}".format(time.perf_counter() - start, [round(e) for e in errors]))
+
+# bad routes are rejected before anything moves.
+for bad in [[("forward", -3)], [("sideways", 10)], [("forward", 10, 120)], [{"direction": "left", "dist": 4}]]:
+    try:
+        route.compile_route(bad)
+        print("accepted " + str(bad))
+    except ValueError as e:
+        print("rejected: " + str(e))
+
+# a blend only coasts at its end, so only its last segment keeps an offset: forward_left's, not forward's.
+path = os.path.join(tempfile.mkdtemp(), "odometry_calibration.json")
+odometry_calibration.save({"forward": {"scale": 52.0, "offset": -95.0},
+                           "forward_left": {"scale": 73.5, "offset": -52.0}}, "drive_t", path)
+motor_controller.load_calibration(path)
+ticks = route.compile_route([("forward", 30), ("forward_left", 20), ("backward", 10)])["ticks"]
+print("blended forward 30 cm, forward_left 20 cm: ticks {} (expected {})".format(
+    ticks[:2].tolist(), [1560 * config.ENC_RESOLUTION, 1418 * config.ENC_RESOLUTION]))
+print("then backward 10 cm, not blended: ticks {} (expected {})".format(
+    ticks[2], motor_controller.getTargetTicks(10, "backward")))
+os.remove(path)
+motor_controller.load_calibration()
+
+motor_controller.shutdown()
+encoders.shutdown()
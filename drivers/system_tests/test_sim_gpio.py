@@ -0,0 +1,52 @@
+"""
+This file runs the motor controller and encoders against the simulated GPIO backend.
+Filename: test_sim_gpio.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: R5_GPIO defaults to sim below, so the motor model in sim_gpio.py turns the motor driver pins
+      into encoder edges.
+    * For every move we report the time it took, the ticks counted by each wheel and the CPU time used by the
+      whole process, which is what the performance work on motor_controller and encoders is measured against.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+sys.path.append("../motor_controller/")
+
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import sim_gpio
+import encoders
+import motor_controller
+
+encoders.setup()
+motor_controller.setup(config.MOTOR_PWM_FREQ)
+motor_controller.set_speed(config.MOTOR_PWM_DUTY)
+
+for direction in ["forward", "backward", "right", "left", "forward_left", "rotate_right"]:
+    # ticks counted after the previous move braked; stop_t() resets before the wheels stop coasting.
+    print("{:>14} coast: ticks {}".format("", encoders.snapshot_and_reset()))
+    writes = len(sim_gpio.writes)
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    ticks = motor_controller.drive_t(direction, 10)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    print("{:>14} 10 cm: {:5.3f}s, {:5.3f}s cpu, {:3d} pin writes, ticks {} (target avg {})".format(
+        direction, elapsed, cpu, len(sim_gpio.writes) - writes, ticks, motor_controller.getTargetTicks(10, direction)))
+    time.sleep(.2) # let the motors spin down
+
+# per wheel duty cycles from drive_vector show up on each wheel's PWM channel and in the wheel speeds.
+motor_controller.drive_vector(1.0, 0.5, 0.0)
+time.sleep(.3)
+print("drive_vector(1, .5, 0) duties: " + str([sim_gpio.pwm_duty[c] for c in motor_controller.pwm_list]))
+print("wheel speeds (edges/s): " + str([round(s) for s in sim_gpio.model.speeds]))
+print("encoder velocity (ticks/s): " + str([round(encoders.velocity(i)) for i in range(1, 5)]))
+motor_controller.stop()
+
+motor_controller.shutdown()
+encoders.shutdown()
@@ -0,0 +1,92 @@
+"""
+This file compares the old busy-wait polling loop of the drive_*_t commands against encoders.wait_for_ticks().
+Filename: test_tick_wait.py
+Last Modified: 10/18/26
+Notes:
+    * Runs off the pi: the simulated GPIO backend is used (R5_GPIO=sim) and a thread plays the part of the
+      RPi.GPIO callback thread, firing encoderEventHandler for each wheel at a fixed edge rate.
+    * For each method we report the CPU time burned by the waiting thread and the overshoot, which is the
+      number of ticks past the target seen by the waiter when it wakes up.
+    * The emergency stop and timeout paths are checked at the end.
+"""
+import os
+import sys
+sys.path.append("..")
+sys.path.append("../encoders/")
+
+import threading
+import time
+
+os.environ.setdefault("R5_GPIO", "sim") # run off the pi unless R5_GPIO=rpi is given, see sim_gpio.py
+
+import config
+import encoders
+
+EDGE_RATE = 2000    # edges per second per wheel
+TARGET = 1000       # average ticks to wait for
+TRIALS = 5
+
+def reset():
+    for i in range(1, 5):
+        encoders.reset(i)
+
+# fires edges for all four wheels until running is cleared.
+def edge_source(running):
+    period = 1.0 / EDGE_RATE
+    next_edge = time.perf_counter()
+    while running.is_set():
+        for channel in encoders.chan_list:
+            encoders.encoderEventHandler(channel)
+        next_edge += period
+        delay = next_edge - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+def busy_wait(target):
+    while(encoders.getTotalTicks() / 4 < target):
+        pass
+
+def event_wait(target):
+    encoders.wait_for_ticks(target, 10.0)
+
+def trial(wait):
+    reset()
+    running = threading.Event()
+    running.set()
+    source = threading.Thread(target=edge_source, args=(running,))
+    start_cpu = time.thread_time()
+    start = time.perf_counter()
+    source.start()
+    wait(TARGET)
+    overshoot = encoders.getTotalTicks() / 4 - TARGET
+    elapsed = time.perf_counter() - start
+    cpu = time.thread_time() - start_cpu
+    running.clear()
+    source.join()
+    return cpu, elapsed, overshoot
+
+for name, wait in [("busy wait", busy_wait), ("wait_for_ticks", event_wait)]:
+    results = [trial(wait) for _ in range(TRIALS)]
+    cpu = sum(r[0] for r in results) / TRIALS
+    elapsed = sum(r[1] for r in results) / TRIALS
+    overshoot = sum(r[2] for r in results) / TRIALS
+    print("{:>15}: {:6.3f}s wall, {:6.3f}s cpu ({:5.1f}%), overshoot {:.2f} ticks".format(
+        name, elapsed, cpu, 100 * cpu / elapsed, overshoot))
+
+# the emergency stop wakes the waiter long before the target is reached.
+reset()
+timer = threading.Timer(0.2, encoders.interrupt)
+timer.start()
+start = time.perf_counter()
+print("interrupt returned " + str(encoders.wait_for_ticks(TARGET, 5.0)) +
+      " after {:.3f}s (expected False after ~0.2s)".format(time.perf_counter() - start))
+
+# without any edges, the waiter gives up after the timeout.
+start = time.perf_counter()
+print("timeout returned " + str(encoders.wait_for_ticks(TARGET, 0.2)) +
+      " after {:.3f}s (expected False after ~0.2s)".format(time.perf_counter() - start))
+
+# an engaged emergency stop returns immediately.
+config.emergency_stop = True
+print("emergency stop returned " + str(encoders.wait_for_ticks(TARGET, 5.0)) + " (expected False)")
+config.emergency_stop = False
@@ -14,78 +14,554 @@ img = camera.capture()
 camera.save()  # saves current image
 
 camera.close()
+
+Recording
+---------
+python camera.py 100 png
+-> same, written in the background as 1.png ... 100.png
+python camera.py 100 raw
+-> captures 100 frames into the frame log frames.flog
+
+camera.start_recording("frames", fmt='jpg', quality=90)
+img = camera.capture()
+camera.save()  # copies the frame and returns; see recorder.py
+camera.stop_recording()
+
+Streaming
+---------
+python camera.py 100 stream
+-> captures 100 frames from the background stream and reports drops
+python camera.py 100 stream half
+-> same with one of the PROFILES
+
+camera = Camera()
+camera.start_stream()
+while True:
+    seq, img = camera.latest()  # never waits; seq tells you if frames were missed
+    # or img = camera.capture(), which waits for the next new frame
+
+camera.close()
+
+Profiles
+--------
+camera = Camera('half')         # full image at 320x240
+camera.set_profile('full_gray') # switch at any time, even while streaming
+camera.set_profile(Profile((160, 120), (0.25, 0.25, 0.5, 0.5), 'bgr'))
+
+Metrics
+-------
+camera.metrics.fps              # frames per second over the last frame
+camera.metrics.fps_smoothed     # exponentially smoothed
+camera.metrics.percentiles()    # capture latency (ms) over the last frames
+print(camera.metrics)           # 31.2 fps (30.8 avg) p50 1.2 p90 2.3 p99 4.0 ms
 """
 
+import collections
+import threading
 import time
 
 import cv2
-from picamera import PiCamera
-from picamera.array import PiRGBArray
+import numpy as np
+try:
+    from picamera import PiCamera
+    from picamera.array import raw_resolution
+except ImportError:
+    # off the pi, only ReplayCamera (replay.py) is available
+    PiCamera = None
+
+import exposure
+from recorder import Recorder
+
+
+class FrameMetrics:
+    """Frame rate and latency over a sliding window of frames
+
+    Every record() stores a timestamp and a latency in fixed size ring
+    buffers, so queries never allocate per frame and only ever look at the
+    last `window` frames.
+
+    Parameters
+    ----------
+    window : int
+        number of frames kept
+    alpha : float
+        weight of the newest frame in fps_smoothed
+    """
+
+    def __init__(self, window=120, alpha=0.1):
+        self.window = window
+        self.alpha = alpha
+        self.times = np.zeros(window)
+        self.latencies = np.zeros(window)
+        self.reset()
+
+    def reset(self):
+        """Forget all frames"""
+
+        self.count = 0
+        self.fps = 0.0
+        self.fps_smoothed = 0.0
+
+    def record(self, latency, now=None):
+        """Record a frame
+
+        Parameters
+        ----------
+        latency : float
+            seconds it took to get the frame
+        now : float
+            time.perf_counter() when the frame was returned
+        """
+
+        if now is None:
+            now = time.perf_counter()
+        if self.count:
+            dt = now - float(self.times[(self.count - 1) % self.window])
+            if dt > 0:
+                self.fps = 1.0 / dt
+                if self.count == 1:
+                    self.fps_smoothed = self.fps
+                else:
+                    self.fps_smoothed += self.alpha * (
+                        self.fps - self.fps_smoothed)
+        i = self.count % self.window
+        self.times[i] = now
+        self.latencies[i] = latency
+        self.count += 1
+
+    def window_fps(self):
+        """Mean frames per second over the window"""
+
+        n = min(self.count, self.window)
+        if n < 2:
+            return 0.0
+        newest = self.times[(self.count - 1) % self.window]
+        oldest = self.times[(self.count - n) % self.window]
+        return (n - 1) / float(newest - oldest)
+
+    def percentiles(self, q=(50, 90, 99)):
+        """Latency percentiles over the window
+
+        Returns
+        -------
+        np.array
+            latency in milliseconds at each percentile of q
+        """
+
+        n = min(self.count, self.window)
+        if n == 0:
+            return np.zeros(len(q))
+        return np.percentile(self.latencies[:n], q) * 1000.0
+
+    def summary(self):
+        """Compact summary for logging
+
+        Returns
+        -------
+        dict
+            frames, fps, fps_smoothed, window_fps and p50/p90/p99 latency (ms)
+        """
+
+        p50, p90, p99 = self.percentiles().tolist()
+        return {
+            'frames': self.count,
+            'fps': round(self.fps, 1),
+            'fps_smoothed': round(self.fps_smoothed, 1),
+            'window_fps': round(self.window_fps(), 1),
+            'p50_ms': round(p50, 2),
+            'p90_ms': round(p90, 2),
+            'p99_ms': round(p99, 2),
+        }
+
+    def __str__(self):
+        p50, p90, p99 = self.percentiles()
+        return "{:.1f} fps ({:.1f} avg) p50 {:.1f} p90 {:.1f} p99 {:.1f} ms".format(
+            self.fps, self.fps_smoothed, p50, p90, p99)
+
+
+# resolution: (width, height) of the frames, scaled by the GPU (capture resize)
+# zoom: (x, y, w, h) region of the sensor to capture, as fractions of the frame
+# fmt: 'bgr'; 'gray', the Y plane only; or 'yuv', the whole I420 frame with
+#      the padding of the camera, (height * 3 / 2, width) rows of Y, U then V.
+#      gray and yuv skip the conversion to BGR.
+Profile = collections.namedtuple('Profile', ['resolution', 'zoom', 'fmt'])
+
+FULL = (0.0, 0.0, 1.0, 1.0)
+
+PROFILES = {
+    'full': Profile((640, 480), FULL, 'bgr'),
+    'full_gray': Profile((640, 480), FULL, 'gray'),
+    'half': Profile((320, 240), FULL, 'bgr'),
+}
+
+
+class FrameBuffers:
+    """capture_continuous output that rotates between preallocated frames
+
+    picamera writes each frame into the back buffer and calls flush() once the
+    frame is complete, which publishes it as the latest frame. With three
+    buffers the back buffer is never the latest frame or the frame held by the
+    consumer, so frames are never torn and neither side waits on the other.
+    With two, the frame held by the consumer is reused once a newer frame is
+    published.
+
+    Parameters
+    ----------
+    resolution : (int, int)
+        (width, height) of the frames
+    count : int
+        number of buffers (2 or 3)
+    fmt : str
+        'bgr', 'gray' or 'yuv', see Profile
+    """
+
+    def __init__(self, resolution, count=3, fmt='bgr'):
+        width, height = resolution
+        # the camera pads rows to 32 pixels and frames to 16 rows
+        padded_width, padded_height = raw_resolution(resolution)
+        if fmt == 'bgr':
+            shape = (padded_height, padded_width, 3)
+        elif fmt == 'gray':
+            # the Y plane comes first, the rest of the frame is skipped
+            shape = (padded_height, padded_width)
+        elif fmt == 'yuv':
+            shape = (padded_height * 3 // 2, padded_width)
+        else:
+            raise ValueError("Unknown frame format {}".format(fmt))
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(count)]
+        if fmt == 'yuv':
+            self.frames = self.buffers
+        else:
+            self.frames = [buf[:height, :width] for buf in self.buffers]
+        self.flat = [buf.reshape(-1) for buf in self.buffers]
+
+        self.back = 0         # buffer being written
+        self.offset = 0       # bytes written into the back buffer
+        self.latest = None    # buffer holding the latest complete frame
+        self.reading = None   # buffer held by the consumer
+        self.seq = 0          # sequence number of the latest frame
+        self.timestamp = 0.0  # time.perf_counter() when it completed
+        self.cond = threading.Condition()
+
+    def write(self, data):
+        """Append frame data to the back buffer (called by picamera)"""
+
+        flat = self.flat[self.back]
+        end = min(self.offset + len(data), flat.size)
+        if end > self.offset:
+            flat[self.offset:end] = np.frombuffer(
+                data, dtype=np.uint8, count=end - self.offset)
+        self.offset += len(data)
+        return len(data)
+
+    def flush(self):
+        """Publish the back buffer as the latest frame (called by picamera)"""
+
+        complete = self.offset >= self.flat[self.back].size
+        self.offset = 0
+        if not complete:
+            return
+
+        now = time.perf_counter()
+        with self.cond:
+            self.latest = self.back
+            self.seq += 1
+            self.timestamp = now
+            self.back = self.free()
+            self.cond.notify_all()
+
+    def free(self):
+        """Pick the next back buffer"""
+
+        for i in range(len(self.buffers)):
+            if i != self.latest and i != self.reading:
+                return i
+        return (self.latest + 1) % len(self.buffers)
+
+    def get(self, after=None, timeout=None):
+        """Take the latest complete frame
+
+        Parameters
+        ----------
+        after : int
+            if given, wait until a frame newer than this sequence number
+            is published
+        timeout : float
+            longest wait in seconds
+
+        Returns
+        -------
+        (int, float, np.array)
+            sequence number, time.perf_counter() timestamp and frame.
+            The frame is (0, 0.0, None) before the first frame completes,
+            and stays valid until the next get().
+        """
+
+        with self.cond:
+            if after is not None:
+                self.cond.wait_for(lambda: self.seq > after, timeout)
+            if self.latest is None:
+                return 0, 0.0, None
+            self.reading = self.latest
+            return self.seq, self.timestamp, self.frames[self.latest]
 
 
 class Camera:
     """PiCamera interface"""
 
-    def __init__(self):
+    def __init__(self, profile='full', buffers=3):
+        if PiCamera is None:
+            raise RuntimeError("picamera is not installed; use ReplayCamera")
         self.camera = PiCamera()
-        self.camera.rotation = 180
         self.camera.resolution = (640, 480)
         self.camera.rotation = 180
-        self.camera.awb_mode = 'off'
-        self.camera.awb_gains = (1.45, 1.9)
-        self.capture_raw = PiRGBArray(self.camera)
+        # calibrated white balance and exposure, see exposure.py
+        self.serial = exposure.camera_serial(self.camera)
+        exposure.apply(
+            self.camera, exposure.load(self.serial) or exposure.DEFAULT)
+        self.buffer_count = buffers
+        self.streaming = threading.Event()
+        self.stream_thread = None
 
+        self.frame = None
         self.frame_id = 0
-        self.fps = 0
-        self.start_time = time.time()
+        self.dropped = 0
+        self.timestamp = 0.0
+        self.metrics = FrameMetrics()
+        self.recorder = None
+        self.set_profile(profile)
+
+    def set_profile(self, profile):
+        """Switch capture profile without reopening the camera
+
+        The stream, if running, is stopped for the switch and restarted. A
+        raw recording is stopped if the frame shape changes, since a frame log
+        holds frames of one shape.
+
+        Parameters
+        ----------
+        profile : str or Profile
+            name in PROFILES or a Profile
+        """
+
+        if isinstance(profile, str):
+            profile = PROFILES[profile]
+        streaming = self.streaming.is_set()
+        self.stop_stream()
+
+        self.camera.zoom = profile.zoom
+        resize = None
+        if tuple(profile.resolution) != tuple(self.camera.resolution):
+            resize = tuple(profile.resolution)
+        self.capture_args = {
+            'format': 'bgr' if profile.fmt == 'bgr' else 'yuv',
+            'resize': resize,
+            'use_video_port': True,
+        }
+        previous = getattr(self, 'buffers', None)
+        self.buffers = FrameBuffers(
+            profile.resolution, self.buffer_count, profile.fmt)
+        self.buffers.seq = self.frame_id
+        self.profile = profile
+        if (self.recorder is not None and self.recorder.fmt == 'raw'
+                and self.buffers.frames[0].shape != previous.frames[0].shape):
+            print("Stopped recording {}: frame shape changed".format(
+                self.recorder.path))
+            self.stop_recording()
 
-    def capture(self):
+        if streaming:
+            self.start_stream()
+
+    def start_stream(self):
+        """Start capturing continuously in a background thread"""
+
+        if self.streaming.is_set():
+            return
+        self.streaming.set()
+        self.stream_thread = threading.Thread(
+            target=self.stream_loop, daemon=True)
+        self.stream_thread.start()
+
+    def stop_stream(self):
+        """Stop the background capture; returns after the current frame"""
+
+        if not self.streaming.is_set():
+            return
+        self.streaming.clear()
+        self.stream_thread.join()
+        self.stream_thread = None
+        # frames streamed after the last capture() don't count as dropped
+        self.buffers.seq = self.frame_id
+
+    def stream_loop(self):
+        """Body of the stream thread"""
+
+        for _ in self.camera.capture_continuous(
+                self.buffers, **self.capture_args):
+            if not self.streaming.is_set():
+                break
+
+    def latest(self):
+        """Latest complete frame of the stream, without waiting
+
+        Returns
+        -------
+        (int, np.array)
+            sequence number and frame; a gap in sequence numbers between
+            calls means frames were missed. (0, None) before the first frame.
+            The frame stays valid until the next latest() or capture().
+        """
+
+        seq, _, frame = self.buffers.get()
+        return seq, frame
+
+    def capture(self, timeout=1.0):
         """Capture image
 
+        While streaming, waits for the next frame that hasn't been returned
+        yet instead of triggering a capture.
+
+        Parameters
+        ----------
+        timeout : float
+            longest wait for a streamed frame in seconds
+
         Returns
         -------
         np.array
             reference to image array; NOT UNIQUE PER CAPTURE.
         """
 
-        self.capture_raw.truncate(0)
-        self.camera.capture(
-            self.capture_raw, format='bgr', use_video_port=True)
+        start = time.perf_counter()
+        if self.streaming.is_set():
+            seq, timestamp, frame = self.buffers.get(self.frame_id, timeout)
+        else:
+            self.camera.capture(self.buffers, **self.capture_args)
+            seq, timestamp, frame = self.buffers.get()
+        if seq <= self.frame_id:
+            raise RuntimeError("No frame from camera")
+        self.dropped += seq - self.frame_id - 1
+        self.frame_id = seq
+
+        self.frame = frame
+        self.timestamp = timestamp
+        self.metrics.record(time.perf_counter() - start)
+
+        return frame
+
+    @property
+    def fps(self):
+        """Smoothed frames per second returned by capture()"""
+
+        return self.metrics.fps_smoothed
+
+    def calibrate_exposure(self, **kwargs):
+        """Calibrate white balance and exposure against a grey card
+
+        The result is applied and cached for this camera, see exposure.py.
+
+        Parameters
+        ----------
+        **kwargs
+            roi, target, tolerance, iterations and settle of
+            exposure.calibrate()
+
+        Returns
+        -------
+        dict
+            awb_gains, shutter_speed, iso and the remaining error
+        """
+
+        settings = exposure.calibrate(self, **kwargs)
+        exposure.save(self.serial, settings)
+        return settings
 
-        self.frame_id += 1
-        self.fps = (time.time() - self.start_time) / self.frame_id
+    def start_recording(self, path='.', fmt='jpg', **kwargs):
+        """Make save() hand frames to a background Recorder
 
-        return self.capture_raw.array
+        Parameters
+        ----------
+        path : str
+            directory for image formats, frame log file for 'raw'
+        fmt : str
+            'jpg', 'png', 'webp' or 'raw'
+        **kwargs
+            quality, pool, workers and policy of the Recorder
+        """
+
+        self.stop_recording()
+        self.recorder = Recorder(path, fmt, **kwargs)
+
+    def stop_recording(self):
+        """Wait for the recorded frames to be written"""
+
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
 
     def save(self):
         """Save current frame"""
 
+        if self.recorder is not None:
+            self.recorder.submit(self.frame, self.frame_id, self.timestamp)
+            return
+
         print("Saved {}.jpg".format(self.frame_id))
-        cv2.imwrite("{}.jpg".format(self.frame_id), self.capture_raw.array)
+        cv2.imwrite("{}.jpg".format(self.frame_id), self.frame)
 
     def close(self):
         """Close camera"""
 
+        self.stop_stream()
+        self.stop_recording()
         self.camera.close()
 
     def __del__(self):
         """Destructor method to ensure camera closing"""
 
-        self.close()
+        if hasattr(self, 'recorder'):
+            self.close()
 
 
-def capture_test(i=300):
+def capture_test(i=300, fmt=None):
 
     camera = Camera()
+    if fmt == 'raw':
+        camera.start_recording("frames.flog", fmt='raw')
+    elif fmt is not None:
+        camera.start_recording(fmt=fmt)
 
     for _ in range(i):
         camera.capture()
         camera.save()
 
+    print(camera.metrics)
+    if camera.recorder is not None:
+        recorder = camera.recorder
+        camera.stop_recording()
+        print("{} written, {} dropped, {} failed".format(
+            recorder.written, recorder.dropped, recorder.failed))
+    camera.close()
+
+
+def stream_test(i=300, profile='full'):
+
+    camera = Camera(profile)
+    camera.start_stream()
+
+    for _ in range(i):
+        camera.capture()
+
+    print("{} frames, {} dropped: {}".format(i, camera.dropped, camera.metrics))
+
     camera.close()
 
 
 if __name__ == '__main__':
     import sys
-    if len(sys.argv) >= 2:
+    if len(sys.argv) >= 3 and sys.argv[2] == 'stream':
+        stream_test(int(sys.argv[1]), *sys.argv[3:4])
+    elif len(sys.argv) >= 3:
+        capture_test(int(sys.argv[1]), sys.argv[2])
+    elif len(sys.argv) >= 2:
         capture_test(int(sys.argv[1]))
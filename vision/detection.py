@@ -0,0 +1,169 @@
+"""Colour blob detection
+
+Command Line Test
+-----------------
+python detection.py frames.flog red
+-> detects red blobs in every frame of the log and reports ms/frame
+
+Usage
+-----
+camera = Camera()
+detector = BlobDetector(camera.capture().shape, *COLOURS['red'])
+
+blobs = detector.detect(camera.capture())
+for blob in blobs:
+    print(blob['x'], blob['y'], blob['area'])
+
+Every intermediate image is allocated once, in the constructor, and the
+OpenCV calls write into it through their dst arguments, so detect() does no
+per-frame allocation beyond the per-blob statistics.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+# (lower, upper) HSV bounds; OpenCV hue is 0-179. A lower hue above the upper
+# hue wraps around 0, for red. Tuned for the fixed awb_gains of Camera.
+COLOURS = {
+    'red': ((170, 120, 70), (10, 255, 255)),
+    'yellow': ((20, 120, 100), (35, 255, 255)),
+    'green': ((40, 80, 50), (85, 255, 255)),
+    'blue': ((95, 120, 50), (130, 255, 255)),
+}
+
+# centroid, area in pixels and bounding box of a blob
+DETECTION_DTYPE = np.dtype([
+    ('x', 'f4'), ('y', 'f4'), ('area', 'i4'),
+    ('left', 'i4'), ('top', 'i4'), ('width', 'i4'), ('height', 'i4')])
+
+
+class BlobDetector:
+    """Finds blobs of one colour in BGR frames
+
+    Parameters
+    ----------
+    shape : tuple
+        (height, width, 3) of the frames
+    lower, upper : (int, int, int)
+        HSV bounds of the colour, see COLOURS
+    kernel : int
+        size of the opening that removes speckles; 0 to skip it
+    min_area : int
+        smallest blob reported, in pixels
+    max_blobs : int
+        most blobs reported, largest first
+    """
+
+    def __init__(self, shape, lower, upper, kernel=5, min_area=50,
+                 max_blobs=8):
+        height, width = shape[:2]
+        self.lower = np.array(lower, dtype=np.uint8)
+        self.upper = np.array(upper, dtype=np.uint8)
+        self.wraps = self.lower[0] > self.upper[0]
+        if self.wraps:
+            # hue in [lower, 179] or [0, upper]
+            self.upper_high = np.array((179,) + tuple(upper[1:]), np.uint8)
+            self.lower_low = np.array((0,) + tuple(lower[1:]), np.uint8)
+        self.kernel = None
+        if kernel:
+            self.kernel = cv2.getStructuringElement(
+                cv2.MORPH_ELLIPSE, (kernel, kernel))
+        self.min_area = min_area
+
+        self.hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self.mask = np.empty((height, width), dtype=np.uint8)
+        self.wrapped = np.empty((height, width), dtype=np.uint8)
+        self.opened = np.empty((height, width), dtype=np.uint8)
+        self.labels = np.empty((height, width), dtype=np.int32)
+        self.detections = np.zeros(max_blobs, dtype=DETECTION_DTYPE)
+
+    def threshold(self, frame):
+        """Mask of the pixels of the colour
+
+        Returns
+        -------
+        np.array
+            255 where the colour is, after the opening; reused by the next call
+        """
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self.hsv)
+        if self.wraps:
+            cv2.inRange(self.hsv, self.lower, self.upper_high, dst=self.mask)
+            cv2.inRange(self.hsv, self.lower_low, self.upper, dst=self.wrapped)
+            cv2.bitwise_or(self.mask, self.wrapped, dst=self.mask)
+        else:
+            cv2.inRange(self.hsv, self.lower, self.upper, dst=self.mask)
+        if self.kernel is None:
+            return self.mask
+        cv2.morphologyEx(
+            self.mask, cv2.MORPH_OPEN, self.kernel, dst=self.opened)
+        return self.opened
+
+    def detect(self, frame):
+        """Blobs of the colour in a frame
+
+        Parameters
+        ----------
+        frame : np.array
+            BGR image of the detector's shape
+
+        Returns
+        -------
+        np.array
+            DETECTION_DTYPE records, largest first; reused by the next call
+        """
+
+        mask = self.threshold(frame)
+        # one pass gives the area, bounding box and centroid of every blob
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(
+            mask, labels=self.labels, connectivity=8, ltype=cv2.CV_32S)
+
+        # label 0 is the background
+        areas = stats[1:count, cv2.CC_STAT_AREA]
+        keep = np.flatnonzero(areas >= self.min_area)
+        keep = keep[np.argsort(areas[keep])[::-1][:len(self.detections)]] + 1
+
+        n = len(keep)
+        out = self.detections
+        out['x'][:n] = centroids[keep, 0]
+        out['y'][:n] = centroids[keep, 1]
+        out['area'][:n] = stats[keep, cv2.CC_STAT_AREA]
+        out['left'][:n] = stats[keep, cv2.CC_STAT_LEFT]
+        out['top'][:n] = stats[keep, cv2.CC_STAT_TOP]
+        out['width'][:n] = stats[keep, cv2.CC_STAT_WIDTH]
+        out['height'][:n] = stats[keep, cv2.CC_STAT_HEIGHT]
+        return out[:n]
+
+
+def benchmark(path, colour='red'):
+    """Time detection over every frame of a frame log"""
+
+    from replay import ReplayCamera
+
+    camera = ReplayCamera(path, realtime=False)
+    frame = camera.capture()
+    detector = BlobDetector(frame.shape, *COLOURS[colour])
+
+    times = np.zeros(len(camera))
+    blobs = 0
+    for i in range(len(camera)):
+        start = time.perf_counter()
+        blobs += len(detector.detect(frame))
+        times[i] = time.perf_counter() - start
+        if i + 1 < len(camera):
+            frame = camera.capture()
+
+    p50, p90, p99 = np.percentile(times, (50, 90, 99)) * 1000.0
+    print("{} frames of {}x{}: {:.2f} ms/frame (p50 {:.2f} p90 {:.2f} "
+          "p99 {:.2f} ms), {:.1f} {} blobs/frame".format(
+              len(times), frame.shape[1], frame.shape[0],
+              times.mean() * 1000.0, p50, p90, p99, blobs / len(times), colour))
+    camera.close()
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) >= 2:
+        benchmark(*sys.argv[1:3])
@@ -0,0 +1,204 @@
+"""White balance and exposure calibration, cached per camera
+
+Command Line Test
+-----------------
+python exposure.py
+-> point the camera at a grey card filling the middle of the image; solves
+   for the AWB gains, shutter speed and ISO and caches them
+
+Usage
+-----
+camera = Camera()             # loads the cached settings of this camera
+camera.calibrate_exposure()   # recalibrate under the current lighting
+
+The cache is a JSON file mapping camera_serial() to the settings, so every
+robot keeps its own calibration in the same file. Without an entry, Camera
+falls back to DEFAULT, the hand tuned gains with automatic exposure.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+CACHE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'exposure_cache.json')
+
+# awb_gains: (red, blue); shutter_speed: microseconds; 0 is automatic
+DEFAULT = {'awb_gains': (1.45, 1.9), 'shutter_speed': 0, 'iso': 0}
+
+ISOS = (100, 200, 320, 400, 500, 640, 800)
+GAIN_LIMITS = (0.1, 8.0)
+SHUTTER_LIMITS = (100, 33000)  # longer than a frame at 30 fps drops the rate
+
+
+def camera_serial(camera):
+    """Key of a camera in the cache: the serial of the pi and the sensor
+
+    Parameters
+    ----------
+    camera : PiCamera
+    """
+
+    serial = 'unknown'
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('Serial'):
+                    serial = line.split(':')[1].strip()
+    except OSError:
+        pass
+    return "{}-{}".format(serial, camera.revision)
+
+
+def load(serial, path=CACHE):
+    """Cached settings of a camera, or None"""
+
+    try:
+        with open(path) as f:
+            return json.load(f).get(serial)
+    except (OSError, ValueError):
+        return None
+
+
+def save(serial, settings, path=CACHE):
+    """Cache the settings of a camera, keeping the other cameras' entries"""
+
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[serial] = settings
+    # write then rename, so a crash never leaves a half written cache
+    with open(path + '.tmp', 'w') as f:
+        json.dump(cache, f, indent=4, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def apply(camera, settings):
+    """Fix the white balance and, if set, the exposure of a camera
+
+    Parameters
+    ----------
+    camera : PiCamera
+    settings : dict
+        see DEFAULT
+    """
+
+    camera.awb_mode = 'off'
+    camera.awb_gains = tuple(settings['awb_gains'])
+    camera.iso = settings['iso']
+    camera.shutter_speed = settings['shutter_speed']
+    if settings['shutter_speed']:
+        camera.exposure_mode = 'off'
+    else:
+        camera.exposure_mode = 'auto'
+
+
+def roi_means(frame, roi):
+    """Mean (B, G, R) of a region given as (x, y, w, h) fractions"""
+
+    height, width = frame.shape[:2]
+    x, y, w, h = roi
+    region = frame[int(y * height):int((y + h) * height),
+                   int(x * width):int((x + w) * width)]
+    return region.reshape(-1, 3).mean(axis=0)
+
+
+def correct_gains(gains, means):
+    """AWB gains that make a grey region's red and blue match its green
+
+    Parameters
+    ----------
+    gains : (float, float)
+        current (red, blue) gains
+    means : (float, float, float)
+        mean (B, G, R) of the grey region at those gains
+    """
+
+    blue, green, red = np.maximum(means, 1.0)
+    low, high = GAIN_LIMITS
+    return (float(min(max(gains[0] * green / red, low), high)),
+            float(min(max(gains[1] * green / blue, low), high)))
+
+
+def correct_shutter(shutter, level, target):
+    """Shutter speed that brings a region's green level to target"""
+
+    low, high = SHUTTER_LIMITS
+    return int(min(max(shutter * target / max(level, 1.0), low), high))
+
+
+def calibrate(camera, roi=(0.4, 0.4, 0.2, 0.2), target=118, tolerance=0.02,
+              iterations=10, settle=2.0):
+    """Solve for AWB gains, shutter speed and ISO against a grey card
+
+    The automatic modes give the starting point, then the gains and shutter
+    are corrected from captured frames until the card is neutral and at the
+    target level.
+
+    Parameters
+    ----------
+    camera : Camera
+        capturing BGR frames
+    roi : (float, float, float, float)
+        (x, y, w, h) of the grey card as fractions of the frame
+    target : int
+        green level of the card; 118 is an 18% grey card at mid scale
+    tolerance : float
+        largest relative error of the red/green, blue/green and level ratios
+    iterations : int
+        most corrections, at least 1
+    settle : float
+        seconds given to the automatic modes to converge
+
+    Returns
+    -------
+    dict
+        the settings, see DEFAULT, with the last error
+    """
+
+    if camera.profile.fmt != 'bgr':
+        raise ValueError("Exposure calibration needs a bgr profile")
+    if iterations < 1:
+        raise ValueError("Exposure calibration needs at least 1 iteration")
+    picam = camera.camera
+
+    picam.iso = 0
+    picam.shutter_speed = 0
+    picam.exposure_mode = 'auto'
+    picam.awb_mode = 'auto'
+    time.sleep(settle)
+    gains = tuple(float(g) for g in picam.awb_gains)
+    shutter = correct_shutter(picam.exposure_speed, 1, 1)
+    iso = min(ISOS, key=lambda i: abs(i - float(picam.analog_gain) * 100))
+
+    error = None
+    for _ in range(iterations):
+        settings = {'awb_gains': gains, 'shutter_speed': shutter, 'iso': iso}
+        apply(picam, settings)
+        # a few frames for the new settings to reach the output
+        time.sleep(0.3)
+        camera.capture()
+        means = roi_means(camera.capture(), roi)
+        blue, green, red = np.maximum(means, 1.0)
+        error = max(abs(red / green - 1), abs(blue / green - 1),
+                    abs(green / target - 1))
+        if error < tolerance:
+            break
+        gains = correct_gains(gains, means)
+        shutter = correct_shutter(shutter, green, target)
+
+    settings['error'] = round(float(error), 4)
+    return settings
+
+
+if __name__ == '__main__':
+    from camera import Camera
+
+    camera = Camera()
+    print("Calibrating {}".format(camera.serial))
+    print(camera.calibrate_exposure())
+    camera.close()
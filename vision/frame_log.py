@@ -0,0 +1,178 @@
+"""Frame log: many frames in one memory-mapped file
+
+Layout
+------
+header  64 bytes, see HEADER
+frames  frame_count frames of height x width x channels dtype, back to back
+index   frame_count records of (timestamp float64, frame_id int64)
+
+The header is written with frame_count 0 and index_offset 0 when the log is
+opened, and rewritten by close(). A log that was never closed has no index.
+
+Usage
+-----
+log = FrameLogWriter("run.flog", (480, 640, 3))
+log.append(img, frame_id, time.perf_counter())
+log.close()
+
+log = FrameLogReader("run.flog")
+img = log.frames[0]           # np.memmap view, nothing is read until used
+log.index['timestamp'][0]
+
+Camera.start_recording(path, fmt='raw') writes one, ReplayCamera (replay.py)
+plays it back.
+"""
+
+import struct
+
+import numpy as np
+
+MAGIC = b'R5FRAMES'
+VERSION = 1
+# magic, version, height, width, channels, dtype, frame_count, index_offset
+HEADER = struct.Struct('<8sHIII8sQQ')
+HEADER_SIZE = 64
+INDEX_DTYPE = np.dtype([('timestamp', '<f8'), ('frame_id', '<i8')])
+
+
+class FrameLogWriter:
+    """Appends frames of one shape to a frame log
+
+    The file is grown `chunk` frames at a time and mapped with np.memmap, so
+    appending a frame is a single copy into the page cache.
+
+    Parameters
+    ----------
+    path : str
+        file to create (overwritten)
+    shape : tuple
+        (height, width, channels) of every frame, or (height, width) for
+        single channel frames
+    dtype : np.dtype
+        pixel type
+    chunk : int
+        frames added to the file each time it fills up
+    """
+
+    def __init__(self, path, shape, dtype=np.uint8, chunk=64):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk = chunk
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.count = 0
+        self.capacity = 0
+        self.frames = None
+        self.index = []
+
+        self.file = open(path, 'w+b')
+        self.write_header()
+
+    def write_header(self, index_offset=0):
+        """Write the header for the frames appended so far"""
+
+        height, width = self.shape[:2]
+        channels = self.shape[2] if len(self.shape) == 3 else 1
+        header = HEADER.pack(
+            MAGIC, VERSION, height, width, channels,
+            self.dtype.str.encode(), self.count, index_offset)
+        self.file.seek(0)
+        self.file.write(header.ljust(HEADER_SIZE, b'\0'))
+
+    def grow(self):
+        """Extend the file by `chunk` frames and remap it"""
+
+        if self.frames is not None:
+            self.frames.flush()
+            del self.frames
+        self.capacity += self.chunk
+        self.file.truncate(HEADER_SIZE + self.capacity * self.frame_bytes)
+        self.frames = np.memmap(
+            self.file, dtype=self.dtype, mode='r+', offset=HEADER_SIZE,
+            shape=(self.capacity,) + self.shape)
+
+    def append(self, frame, frame_id, timestamp):
+        """Append a frame
+
+        Parameters
+        ----------
+        frame : np.array
+            image of the log's shape
+        frame_id : int
+            camera sequence number, kept in the index so drops show up
+        timestamp : float
+            capture time in seconds (time.perf_counter())
+        """
+
+        if frame.shape != self.shape:
+            raise ValueError("Frame shape {} doesn't match the log's {}".format(
+                frame.shape, self.shape))
+        if self.count == self.capacity:
+            self.grow()
+        self.frames[self.count] = frame
+        self.index.append((timestamp, frame_id))
+        self.count += 1
+
+    def close(self):
+        """Trim the file, write the index and the final header"""
+
+        if self.file.closed:
+            return
+        if self.frames is not None:
+            self.frames.flush()
+            del self.frames
+            self.frames = None
+        index_offset = HEADER_SIZE + self.count * self.frame_bytes
+        self.file.truncate(index_offset)
+        self.file.seek(index_offset)
+        self.file.write(np.array(self.index, dtype=INDEX_DTYPE).tobytes())
+        self.write_header(index_offset)
+        self.file.close()
+
+
+class FrameLogReader:
+    """Maps a closed frame log read-only
+
+    Attributes
+    ----------
+    frames : np.memmap
+        (frame_count,) + shape view of the file; indexing it
+        returns views, no pixels are copied
+    index : np.array
+        (timestamp, frame_id) of every frame
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError("{} is not a frame log".format(path))
+        (magic, version, height, width, channels, dtype, count,
+         index_offset) = HEADER.unpack(header[:HEADER.size])
+        if magic != MAGIC:
+            raise ValueError("{} is not a frame log".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported frame log version {}".format(version))
+        if index_offset == 0:
+            raise ValueError("{} was not closed".format(path))
+
+        self.path = path
+        self.shape = (height, width, channels) if channels > 1 else (height, width)
+        self.dtype = np.dtype(dtype.rstrip(b'\0').decode())
+        self.count = count
+        if count:
+            self.frames = np.memmap(
+                path, dtype=self.dtype, mode='r', offset=HEADER_SIZE,
+                shape=(count,) + self.shape)
+        else:
+            self.frames = np.empty((0,) + self.shape, dtype=self.dtype)
+        self.index = np.fromfile(
+            path, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """Drop the mapping; it is unmapped once no frame views are left"""
+
+        self.frames = None
@@ -0,0 +1,211 @@
+"""Image to floor projection
+
+Command Line Test
+-----------------
+python ground.py calibrate markers.json
+-> solves the homography from the markers and saves it to ground.json
+python ground.py 320 400
+-> floor position (cm) of pixel (320, 400) and the moves that reach it
+
+markers.json is a list of at least 4 floor markers measured by hand:
+[{"pixel": [u, v], "floor": [x, y]}, ...]
+with pixels in a frame of the calibration profile and floor positions in cm
+in the robot frame: x forward and y to the left of the center of the base.
+
+Usage
+-----
+ground = GroundPlane(load())
+floor = ground.to_floor(np.column_stack((blobs['x'], blobs['y'])),
+                        camera.profile)  # (n, 2) cm
+for direction, d in drive_legs(floor[0]):
+    getattr(motor_controller, "drive_" + direction + "_t")(d)
+
+Distances are in cm, the unit of getTargetTicks(d) in motor_controller.
+"""
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+GROUND = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'ground.json')
+
+FULL = (0.0, 0.0, 1.0, 1.0)
+
+# motor_controller directions for each sign of (x, y)
+AXES = {1: 'forward', -1: 'backward'}, {1: 'left', -1: 'right'}
+
+
+def calibrate(pixels, floor, resolution, zoom=FULL, undistorted=False):
+    """Solve for the image to floor homography
+
+    Parameters
+    ----------
+    pixels : array like
+        (n, 2) marker positions in the image, n >= 4
+    floor : array like
+        (n, 2) marker positions on the floor in cm
+    resolution : (int, int)
+        (width, height) of the image
+    zoom : (float, float, float, float)
+        sensor region of the image, see camera.Profile
+    undistorted : bool
+        whether pixels were undistorted (undistort.py) first
+
+    Returns
+    -------
+    dict
+        homography, calibration profile and rms error on the floor in cm
+    """
+
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 1, 2)
+    floor = np.asarray(floor, dtype=np.float64).reshape(-1, 1, 2)
+    if len(pixels) < 4:
+        raise ValueError("At least 4 markers are needed")
+    homography, _ = cv2.findHomography(pixels, floor)
+    error = cv2.perspectiveTransform(pixels, homography) - floor
+    return {
+        'homography': homography.tolist(),
+        'resolution': list(resolution),
+        'zoom': list(zoom),
+        'undistorted': undistorted,
+        'rms': float(np.sqrt((error ** 2).sum(axis=2).mean())),
+    }
+
+
+def save(ground, path=GROUND):
+    """Write a calibration to a JSON file"""
+
+    with open(path, 'w') as f:
+        json.dump(ground, f, indent=4)
+
+
+def load(path=GROUND):
+    """Read a calibration written by save()"""
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def pixel_to_sensor(resolution, zoom):
+    """3x3 transform from pixels of a profile to fractions of the sensor"""
+
+    x, y, w, h = zoom
+    return np.array([
+        [w / resolution[0], 0.0, x],
+        [0.0, h / resolution[1], y],
+        [0.0, 0.0, 1.0]])
+
+
+class GroundPlane:
+    """Projects image points of any capture profile onto the floor
+
+    Parameters
+    ----------
+    ground : dict
+        from calibrate() or load()
+    undistorter : undistort.Undistorter
+        needed when the calibration used undistorted pixels
+    """
+
+    def __init__(self, ground, undistorter=None):
+        self.homography = np.array(ground['homography'], dtype=np.float64)
+        self.to_calibration = np.linalg.inv(pixel_to_sensor(
+            ground['resolution'], ground['zoom']))
+        self.undistorted = ground['undistorted']
+        self.undistorter = undistorter
+        if self.undistorted and undistorter is None:
+            raise ValueError("This calibration needs an Undistorter")
+        self.homographies = {}  # (resolution, zoom) -> homography
+
+    def homography_for(self, resolution, zoom=FULL):
+        """Homography from pixels of a resolution and zoom to the floor"""
+
+        key = (tuple(resolution), tuple(zoom))
+        if key not in self.homographies:
+            self.homographies[key] = self.homography @ self.to_calibration @ \
+                pixel_to_sensor(resolution, zoom)
+        return self.homographies[key]
+
+    def to_floor(self, points, profile):
+        """Floor positions of image points
+
+        Parameters
+        ----------
+        points : array like
+            (n, 2) pixel coordinates, e.g. detection centroids
+        profile : camera.Profile
+            profile of the frames they come from
+
+        Returns
+        -------
+        np.array
+            (n, 2) positions in cm, x forward and y left of the base
+        """
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return points.reshape(0, 2)
+        if self.undistorted:
+            points = self.undistorter.undistort_points(
+                points, profile.resolution, profile.zoom).reshape(-1, 1, 2)
+        homography = self.homography_for(profile.resolution, profile.zoom)
+        return cv2.perspectiveTransform(points, homography).reshape(-1, 2)
+
+
+def drive_legs(point, tolerance=0.5):
+    """Encoder moves that reach a floor position
+
+    A diagonal covers the shorter of the two axes, then a straight move
+    covers what is left of the longer one.
+
+    Parameters
+    ----------
+    point : (float, float)
+        (x, y) in cm
+    tolerance : float
+        legs shorter than this (cm) are skipped
+
+    Returns
+    -------
+    list of (str, float)
+        motor_controller direction names ('forward', 'forward_left', ...)
+        and distances in cm, for the drive_<direction>_t commands
+    """
+
+    x, y = float(point[0]), float(point[1])
+    sx, sy = (1 if x >= 0 else -1), (1 if y >= 0 else -1)
+    diagonal = min(abs(x), abs(y))
+    length = diagonal * 2 ** 0.5  # distance travelled along the diagonal
+    legs = []
+    if length >= tolerance:
+        legs.append((AXES[0][sx] + '_' + AXES[1][sy], length))
+    if abs(x) - diagonal >= tolerance:
+        legs.append((AXES[0][sx], abs(x) - diagonal))
+    elif abs(y) - diagonal >= tolerance:
+        legs.append((AXES[1][sy], abs(y) - diagonal))
+    return legs
+
+
+if __name__ == '__main__':
+    import sys
+    from camera import PROFILES
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'calibrate':
+        with open(sys.argv[2]) as f:
+            markers = json.load(f)
+        profile = PROFILES['full']
+        result = calibrate(
+            [m['pixel'] for m in markers], [m['floor'] for m in markers],
+            profile.resolution, profile.zoom)
+        save(result)
+        print("rms {:.2f} cm over {} markers".format(
+            result['rms'], len(markers)))
+    elif len(sys.argv) >= 3:
+        ground = GroundPlane(load())
+        floor = ground.to_floor(
+            [(float(sys.argv[1]), float(sys.argv[2]))], PROFILES['full'])[0]
+        print("x {:.1f} cm, y {:.1f} cm: {}".format(
+            floor[0], floor[1], drive_legs(floor)))
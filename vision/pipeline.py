@@ -0,0 +1,298 @@
+"""Multi-core capture -> detect -> act pipeline
+
+Command Line Test
+-----------------
+python pipeline.py frames.flog red 3
+-> replays frames.flog through 3 detection processes at the recorded speed
+   and reports the throughput and latency of every stage
+python pipeline.py frames.flog red 3 max
+-> replays as fast as possible
+
+Usage
+-----
+pipeline = Pipeline(Camera(), COLOURS['red'], workers=3)
+pipeline.start()
+while True:
+    result = pipeline.get()  # next result in frame order
+    if result is None:       # the source ran out of frames
+        break
+    seq, blobs = result
+    # act on blobs
+pipeline.stop()
+print(pipeline.summary())
+
+Stages
+------
+capture  a thread takes frames from the source (Camera or ReplayCamera) and
+         copies them into a ring of shared memory slots
+detect   worker processes run BlobDetector on a slot and send back only the
+         detections, so frames are never pickled
+act      get() returns the results in frame order
+
+Queues are bounded and drop the stalest entry when full, so when detection
+or the consumer falls behind, frames are skipped and the latency stays flat.
+Stage timestamps are time.perf_counter(), which is system wide on Linux and
+so comparable across processes.
+"""
+
+import heapq
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from camera import FrameMetrics
+from detection import BlobDetector
+
+
+def detect_worker(shm_name, shape, slots, lower, upper, kwargs, tasks,
+                  results):
+    """Body of the detection processes"""
+
+    shm = SharedMemory(name=shm_name)
+    frames = np.ndarray((slots,) + shape, dtype=np.uint8, buffer=shm.buf)
+    detector = BlobDetector(shape, lower, upper, **kwargs)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, captured = task
+        start = time.perf_counter()
+        blobs = detector.detect(frames[slot]).copy()
+        results.put((seq, slot, captured, start, time.perf_counter(), blobs))
+    del frames
+    shm.close()
+
+
+class Pipeline:
+    """Detection spread over worker processes
+
+    Parameters
+    ----------
+    source : Camera or ReplayCamera
+        anything with capture(); a Camera is switched to streaming
+    colour : (lower, upper)
+        HSV bounds, see detection.COLOURS
+    workers : int
+        number of detection processes
+    depth : int
+        results kept for the consumer before the oldest is dropped
+    **kwargs
+        other BlobDetector parameters
+    """
+
+    def __init__(self, source, colour, workers=3, depth=2, **kwargs):
+        self.source = source
+        self.colour = colour
+        self.workers = workers
+        self.depth = depth
+        self.kwargs = kwargs
+        # queued + being detected + being filled
+        self.slots = 2 * workers + 1
+
+        self.tasks = mp.Queue(maxsize=workers)
+        self.results = mp.Queue()
+        self.free = queue.Queue()
+        self.running = threading.Event()
+        self.cond = threading.Condition()
+        self.inflight = set()   # seqs handed to the workers
+        self.ready = []         # heap of finished results
+        self.captured = False   # the capture thread has finished
+        self.seq = 0
+
+        self.capture_metrics = FrameMetrics()
+        self.detect_metrics = FrameMetrics()
+        self.result_metrics = FrameMetrics()
+        self.dropped_frames = 0
+        self.dropped_results = 0
+
+    def start(self):
+        """Allocate the shared slots and start every stage"""
+
+        if hasattr(self.source, 'start_stream'):
+            self.source.start_stream()
+        first = self.source.capture()
+        self.shape = first.shape
+        self.shm = SharedMemory(
+            create=True, size=self.slots * first.nbytes)
+        self.frames = np.ndarray(
+            (self.slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        for slot in range(self.slots):
+            self.free.put(slot)
+
+        lower, upper = self.colour
+        self.processes = [
+            mp.Process(
+                target=detect_worker, daemon=True,
+                args=(self.shm.name, self.shape, self.slots, lower, upper,
+                      self.kwargs, self.tasks, self.results))
+            for _ in range(self.workers)]
+        for process in self.processes:
+            process.start()
+
+        self.running.set()
+        self.capture_thread = threading.Thread(
+            target=self.capture_loop, args=(first,), daemon=True)
+        self.collect_thread = threading.Thread(
+            target=self.collect_loop, daemon=True)
+        self.capture_thread.start()
+        self.collect_thread.start()
+
+    def capture_loop(self, frame):
+        """Capture stage: copy frames into free slots and queue them"""
+
+        while self.running.is_set():
+            now = time.perf_counter()
+            slot = self.free.get()
+            np.copyto(self.frames[slot], frame)
+            self.seq += 1
+            task = (self.seq, slot, now)
+            with self.cond:
+                self.inflight.add(self.seq)
+            try:
+                self.tasks.put_nowait(task)
+            except queue.Full:
+                # the workers are behind; replace the stalest frame
+                try:
+                    stale_seq, stale_slot, _ = self.tasks.get_nowait()
+                    with self.cond:
+                        self.inflight.discard(stale_seq)
+                        self.dropped_frames += 1
+                        self.cond.notify_all()
+                    self.free.put(stale_slot)
+                except queue.Empty:
+                    pass
+                self.tasks.put(task)
+
+            start = time.perf_counter()
+            try:
+                frame = self.source.capture()
+            except EOFError:
+                break
+            end = time.perf_counter()
+            self.capture_metrics.record(end - start, end)
+
+        with self.cond:
+            self.captured = True
+            self.cond.notify_all()
+
+    def collect_loop(self):
+        """Collect detection results, free their slots and order them"""
+
+        while True:
+            result = self.results.get()
+            if result is None:
+                break
+            seq, slot, captured, start, end, blobs = result
+            self.free.put(slot)
+            self.detect_metrics.record(end - start, end)
+            with self.cond:
+                self.inflight.discard(seq)
+                heapq.heappush(self.ready, (seq, captured, blobs))
+                if len(self.ready) > self.depth:
+                    # the consumer is behind; drop the stalest result
+                    heapq.heappop(self.ready)
+                    self.dropped_results += 1
+                self.cond.notify_all()
+
+    def next_ready(self):
+        """Whether the oldest finished result can be returned in order"""
+
+        if not self.ready:
+            return False
+        return not self.inflight or self.ready[0][0] < min(self.inflight)
+
+    def get(self, timeout=None):
+        """Act stage: next detection result in frame order
+
+        Parameters
+        ----------
+        timeout : float
+            longest wait in seconds
+
+        Returns
+        -------
+        (int, np.array)
+            pipeline sequence number and the DETECTION_DTYPE blobs of the
+            frame; None on timeout or once the source ran out of frames
+        """
+
+        with self.cond:
+            self.cond.wait_for(
+                lambda: self.next_ready() or (
+                    self.captured and not self.inflight and not self.ready),
+                timeout)
+            if not self.next_ready():
+                return None
+            seq, captured, blobs = heapq.heappop(self.ready)
+        now = time.perf_counter()
+        self.result_metrics.record(now - captured, now)
+        return seq, blobs
+
+    def stop(self):
+        """Stop every stage and free the shared slots"""
+
+        self.running.clear()
+        self.capture_thread.join()
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.results.put(None)
+        self.collect_thread.join()
+        del self.frames
+        self.shm.close()
+        self.shm.unlink()
+        if hasattr(self.source, 'stop_stream'):
+            self.source.stop_stream()
+
+    def summary(self):
+        """Per stage throughput (fps) and latency (ms)
+
+        Returns
+        -------
+        dict
+            capture: capture() time; detect: time in the detector;
+            end_to_end: capture to get(); plus the dropped frames and results
+        """
+
+        return {
+            'capture': self.capture_metrics.summary(),
+            'detect': self.detect_metrics.summary(),
+            'end_to_end': self.result_metrics.summary(),
+            'dropped_frames': self.dropped_frames,
+            'dropped_results': self.dropped_results,
+        }
+
+
+def pipeline_test(path, colour='red', workers=3, realtime=True):
+
+    from detection import COLOURS
+    from replay import ReplayCamera
+
+    pipeline = Pipeline(
+        ReplayCamera(path, realtime), COLOURS[colour], int(workers))
+    pipeline.start()
+    last = 0
+    while True:
+        result = pipeline.get()
+        if result is None:
+            break
+        assert result[0] > last, "results out of order"
+        last = result[0]
+    pipeline.stop()
+
+    print("capture    {}".format(pipeline.capture_metrics))
+    print("detect     {}".format(pipeline.detect_metrics))
+    print("end to end {}".format(pipeline.result_metrics))
+    print("{} frames dropped before detection, {} results dropped".format(
+        pipeline.dropped_frames, pipeline.dropped_results))
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) >= 2:
+        pipeline_test(*sys.argv[1:4], realtime=sys.argv[4:5] != ['max'])
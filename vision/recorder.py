@@ -0,0 +1,174 @@
+"""Background frame recorder
+
+Frames are copied into a bounded pool of reusable buffers and written by
+worker threads, so the capture loop only pays for one copy per frame.
+cv2.imwrite releases the GIL while encoding, so threads are enough to use
+the other cores.
+
+Usage
+-----
+recorder = Recorder("frames", fmt='jpg', quality=90)
+recorder.submit(img, frame_id)  # returns right away
+recorder.close()                # waits for the pending frames
+
+recorder = Recorder("run.flog", fmt='raw')  # one frame log, see frame_log.py
+
+Backpressure
+------------
+When every buffer holds a frame that hasn't been written yet:
+drop_oldest  the oldest pending frame is dropped and its buffer reused
+block        submit() waits for a buffer to be written
+
+A frame that fails to write is counted in failed (the last exception is kept
+in error) and its buffer goes back to the pool, so one bad frame never stalls
+submit() or stops the workers.
+"""
+
+import collections
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_log import FrameLogWriter
+
+# imwrite parameters by format; quality is 0-100
+PARAMS = {
+    'jpg': lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality],
+    'webp': lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+    'png': lambda quality: [cv2.IMWRITE_PNG_COMPRESSION, (100 - quality) // 10],
+}
+POLICIES = ('drop_oldest', 'block')
+
+
+class Recorder:
+    """Writes frames in the background
+
+    Parameters
+    ----------
+    path : str
+        directory for image formats, frame log file for 'raw'
+    fmt : str
+        'jpg', 'png', 'webp' or 'raw'
+    quality : int
+        encoder quality (0-100) of image formats
+    pool : int
+        number of frame buffers
+    workers : int
+        number of writer threads; always 1 for 'raw' to keep frames in order
+    policy : str
+        'drop_oldest' or 'block' when the pool is full
+    """
+
+    def __init__(self, path='.', fmt='jpg', quality=95, pool=8, workers=2,
+                 policy='drop_oldest'):
+        if fmt != 'raw' and fmt not in PARAMS:
+            raise ValueError("Unknown format {}".format(fmt))
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy {}".format(policy))
+
+        self.path = path
+        self.fmt = fmt
+        self.params = PARAMS[fmt](quality) if fmt in PARAMS else None
+        self.policy = policy
+        self.log = None
+        if fmt == 'raw':
+            workers = 1
+        elif not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.free = collections.deque(None for _ in range(pool))
+        self.pending = collections.deque()
+        self.cond = threading.Condition()
+        self.running = True
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.error = None
+
+        self.threads = [
+            threading.Thread(target=self.work, daemon=True)
+            for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, frame, frame_id, timestamp=None):
+        """Queue a copy of a frame for writing
+
+        Parameters
+        ----------
+        frame : np.array
+            image; it can be reused as soon as submit() returns
+        frame_id : int
+            used for the file name, or kept in the frame log index
+        timestamp : float
+            capture time (time.perf_counter()), defaults to now
+        """
+
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        with self.cond:
+            if not self.free and self.policy == 'drop_oldest' and self.pending:
+                _, _, buf = self.pending.popleft()
+                self.free.append(buf)
+                self.dropped += 1
+            self.cond.wait_for(lambda: self.free)
+            buf = self.free.popleft()
+
+        # copy outside the lock; buffers are only reallocated if the shape changes
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = np.empty_like(frame)
+        np.copyto(buf, frame)
+
+        with self.cond:
+            self.pending.append((frame_id, timestamp, buf))
+            self.cond.notify_all()
+
+    def work(self):
+        """Body of the writer threads"""
+
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending or not self.running)
+                if not self.pending:
+                    return
+                frame_id, timestamp, buf = self.pending.popleft()
+
+            written = False
+            try:
+                self.write(buf, frame_id, timestamp)
+                written = True
+            except Exception as e:
+                self.error = e
+            finally:
+                with self.cond:
+                    self.free.append(buf)
+                    if written:
+                        self.written += 1
+                    else:
+                        self.failed += 1
+                    self.cond.notify_all()
+
+    def write(self, frame, frame_id, timestamp):
+        """Write one frame (runs on a worker thread)"""
+
+        if self.fmt == 'raw':
+            if self.log is None:
+                self.log = FrameLogWriter(self.path, frame.shape, frame.dtype)
+            self.log.append(frame, frame_id, timestamp)
+        else:
+            name = os.path.join(self.path, "{}.{}".format(frame_id, self.fmt))
+            cv2.imwrite(name, frame, self.params)
+
+    def close(self):
+        """Write the pending frames and stop the workers"""
+
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+        if self.log is not None:
+            self.log.close()
@@ -0,0 +1,142 @@
+"""Replay a frame log as if it were the camera
+
+Command Line Test
+-----------------
+python replay.py frames.flog
+-> plays frames.flog at the recorded speed and reports the frame rate
+python replay.py frames.flog max
+-> as fast as possible
+
+Usage
+-----
+camera = ReplayCamera("frames.flog", realtime=False)
+while True:
+    try:
+        img = camera.capture()  # read-only np.memmap view, no copy
+    except EOFError:
+        break
+    # do things with img
+
+camera.close()
+
+Works anywhere numpy and OpenCV do; picamera is not needed.
+"""
+
+import time
+
+import cv2
+
+from camera import FrameMetrics
+from frame_log import FrameLogReader
+
+
+class ReplayCamera:
+    """Camera stand-in that serves the frames of a frame log
+
+    Parameters
+    ----------
+    path : str
+        frame log written by Camera.start_recording(path, fmt='raw')
+    realtime : bool
+        wait between frames as long as between the recorded ones;
+        otherwise serve them as fast as they are asked for
+    loop : bool
+        start over at the end of the log instead of raising EOFError
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.log = FrameLogReader(path)
+        if len(self.log) == 0:
+            raise ValueError("{} has no frames".format(path))
+        self.realtime = realtime
+        self.loop = loop
+        self.timestamps = self.log.index['timestamp']
+        self.frame_ids = self.log.index['frame_id']
+
+        self.position = 0      # next frame of the log
+        self.start_time = None # perf_counter() matching the first timestamp
+        self.frame = None
+        self.frame_id = 0
+        self.timestamp = 0.0
+        self.dropped = 0
+        self.metrics = FrameMetrics()
+
+    def __len__(self):
+        return len(self.log)
+
+    def capture(self):
+        """Next frame of the log
+
+        Returns
+        -------
+        np.array
+            read-only view into the frame log
+
+        Raises
+        ------
+        EOFError
+            at the end of the log, unless looping
+        """
+
+        start = time.perf_counter()
+        if self.position == len(self.log):
+            if not self.loop:
+                raise EOFError("End of frame log")
+            self.position = 0
+            self.start_time = None
+
+        i = self.position
+        if self.realtime:
+            if self.start_time is None:
+                self.start_time = start - self.timestamps[0]
+            delay = self.start_time + self.timestamps[i] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        frame_id = int(self.frame_ids[i])
+        if self.frame is not None and frame_id > self.frame_id:
+            self.dropped += frame_id - self.frame_id - 1
+        self.frame = self.log.frames[i]
+        self.frame_id = frame_id
+        self.timestamp = float(self.timestamps[i])
+        self.position += 1
+        self.metrics.record(time.perf_counter() - start)
+
+        return self.frame
+
+    @property
+    def fps(self):
+        """Smoothed frames per second returned by capture()"""
+
+        return self.metrics.fps_smoothed
+
+    def save(self):
+        """Save current frame"""
+
+        print("Saved {}.jpg".format(self.frame_id))
+        cv2.imwrite("{}.jpg".format(self.frame_id), self.frame)
+
+    def close(self):
+        """Close the frame log"""
+
+        self.frame = None
+        self.log.close()
+
+
+def replay_test(path, realtime=True):
+
+    camera = ReplayCamera(path, realtime)
+
+    for _ in range(len(camera)):
+        # touch every frame so its pages are actually read
+        camera.capture()[::16, ::16].sum()
+
+    print("{} frames, {} dropped when recorded: {}".format(
+        len(camera), camera.dropped, camera.metrics))
+    camera.close()
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) >= 2:
+        replay_test(sys.argv[1], len(sys.argv) < 3 or sys.argv[2] != 'max')
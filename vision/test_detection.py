@@ -0,0 +1,54 @@
+"""Checks BlobDetector on a synthetic frame
+
+Command Line Test
+-----------------
+python test_detection.py
+-> draws blobs of known position and size and prints what is detected
+
+Runs anywhere: no camera is needed.
+"""
+
+import cv2
+import numpy as np
+
+from detection import BlobDetector, COLOURS
+
+# BGR of pure hues, hue in OpenCV units (0-179)
+def bgr(hue):
+    hsv = np.array([[[hue, 255, 255]]], dtype=np.uint8)
+    return tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+
+
+frame = np.zeros((240, 320, 3), dtype=np.uint8)
+cv2.circle(frame, (100, 80), 20, bgr(178), -1)          # red, hue above 170
+cv2.rectangle(frame, (200, 150), (249, 179), bgr(4), -1)  # red, hue below 10
+cv2.rectangle(frame, (20, 200), (29, 209), bgr(0), -1)   # red, 100 px
+cv2.rectangle(frame, (300, 10), (301, 11), bgr(0), -1)   # red speck
+cv2.circle(frame, (250, 60), 15, bgr(110), -1)           # blue
+
+red = BlobDetector(frame.shape, *COLOURS['red'])
+blobs = red.detect(frame)
+print("red blobs: " + str(len(blobs)) + " (expected 3, the speck is opened away)")
+for blob in blobs:
+    print("  at ({:.1f}, {:.1f}) area {} box {}x{}".format(
+        blob['x'], blob['y'], blob['area'], blob['width'], blob['height']))
+print("expected largest first: the 50x30 box at (224.5, 164.5), the r=20 "
+      "circle at (100, 80) and the 10x10 box at (24.5, 204.5), each a few "
+      "px smaller than drawn where the opening rounds the corners")
+
+# min_area drops the small box; max_blobs keeps the largest
+print("red blobs of 200 px or more: " + str(len(BlobDetector(
+    frame.shape, *COLOURS['red'], min_area=200).detect(frame))) +
+    " (expected 2)")
+print("largest red blob only: area " + str(BlobDetector(
+    frame.shape, *COLOURS['red'], max_blobs=1).detect(frame)['area']) +
+    " (expected about [1500])")
+
+blue = BlobDetector(frame.shape, *COLOURS['blue'])
+blobs = blue.detect(frame)
+print("blue blobs: " + str(len(blobs)) + " at ({:.1f}, {:.1f})".format(
+    blobs[0]['x'], blobs[0]['y']) + " (expected 1 at (250.0, 60.0))")
+
+# the records are reused: a blank frame returns none
+print("red blobs in a blank frame: " + str(len(red.detect(
+    np.zeros_like(frame)))) + " (expected 0)")
@@ -0,0 +1,58 @@
+"""Checks that the drive_legs moves reach the floor position they are for
+
+Command Line Test
+-----------------
+python test_ground.py
+-> adds up the legs of a grid of floor positions and prints the worst miss
+
+Runs anywhere: no camera or ground.json is needed.
+"""
+
+import numpy as np
+
+from ground import drive_legs
+
+# floor (x, y) covered by 1 cm of each motor_controller direction
+DIAGONAL = 2 ** -0.5
+MOVES = {
+    'forward': (1, 0), 'backward': (-1, 0), 'left': (0, 1), 'right': (0, -1),
+    'forward_left': (DIAGONAL, DIAGONAL),
+    'forward_right': (DIAGONAL, -DIAGONAL),
+    'backward_left': (-DIAGONAL, DIAGONAL),
+    'backward_right': (-DIAGONAL, -DIAGONAL),
+}
+
+
+def reached(legs):
+    end = np.zeros(2)
+    for direction, d in legs:
+        end += d * np.array(MOVES[direction])
+    return end
+
+
+for point in [(30, 0), (0, -12), (20, 20), (30, 10), (-5, 25), (-40, -8),
+              (0.3, 0.2), (10, 0.4)]:
+    legs = drive_legs(point)
+    print("{}: {} -> {}".format(point, [(direction, round(d, 2))
+                                        for direction, d in legs],
+                                np.round(reached(legs), 2).tolist()))
+
+# one skipped leg misses by less than the tolerance; both legs are only
+# skipped close to the base, where the miss is the whole (short) position
+tolerance = 0.5
+grid = np.arange(-30, 30.0625, 0.125)  # exact in binary
+far, near, counts = 0.0, 0.0, set()
+for x in grid:
+    for y in grid:
+        legs = drive_legs((x, y), tolerance)
+        miss = np.abs(reached(legs) - (x, y)).max()
+        if legs:
+            far = max(far, miss)
+        else:
+            near = max(near, np.hypot(x, y))
+        counts.add(len(legs))
+print("worst miss over a 60x60 cm grid: {:.3f} cm (expected under the "
+      "{} cm tolerance), legs per position {} (expected 0 to 2)".format(
+          far, tolerance, sorted(counts)))
+print("farthest position with no legs: {:.3f} cm (expected under {:.3f})"
+      .format(near, tolerance * np.hypot(1 + DIAGONAL, DIAGONAL)))
@@ -0,0 +1,83 @@
+"""Checks Pipeline ordering, frame dropping and end of stream
+
+Command Line Test
+-----------------
+python test_pipeline.py
+-> runs a synthetic source through two slow detection processes and prints
+   the order, drops and shutdown of the results
+
+The source captures far faster than the workers detect (a 31 px opening on
+640x480 frames), so the tasks queue is always full and stale frames are
+dropped. Every frame has a red square at a position given by its index, so
+each result can be matched to the frame it came from. Runs anywhere: no
+camera or frame log is needed.
+"""
+
+import time
+
+import numpy as np
+
+from detection import COLOURS
+from pipeline import Pipeline
+
+FRAMES = 200
+
+
+def square_left(index):
+    """Left edge of the square in frame index"""
+
+    return 20 + 4 * (index % 140)
+
+
+class SyntheticSource:
+    """In-memory frames that end with EOFError, like ReplayCamera
+
+    capture() reuses one buffer, like Camera.
+    """
+
+    def __init__(self, count, shape=(480, 640, 3)):
+        self.count = count
+        self.index = 0
+        self.frame = np.zeros(shape, dtype=np.uint8)
+
+    def capture(self):
+        if self.index == self.count:
+            raise EOFError
+        left = square_left(self.index)
+        self.frame[:] = 0
+        self.frame[100:140, left:left + 40] = (0, 0, 255)
+        self.index += 1
+        return self.frame
+
+
+if __name__ == '__main__':
+    pipeline = Pipeline(
+        SyntheticSource(FRAMES), COLOURS['red'], workers=2, kernel=31)
+    pipeline.start()
+    seqs = []
+    mismatched = 0
+    while True:
+        result = pipeline.get(timeout=10.0)
+        if result is None:
+            break
+        seq, blobs = result
+        seqs.append(seq)
+        # seq 1 is the first frame captured
+        if len(blobs) != 1 or blobs[0]['left'] != square_left(seq - 1):
+            mismatched += 1
+    start = time.perf_counter()
+    after = pipeline.get(timeout=1.0)
+    waited = time.perf_counter() - start
+    pipeline.stop()
+
+    print("{} results, seqs strictly increasing: {} (expected True)".format(
+        len(seqs), all(a < b for a, b in zip(seqs, seqs[1:]))))
+    print("results not matching their frame: {} (expected 0)".format(
+        mismatched))
+    print("dropped frames: {} (expected > 0), dropped results: {}".format(
+        pipeline.dropped_frames, pipeline.dropped_results))
+    print("results + drops: {} (expected {}, every frame accounted for)"
+          .format(len(seqs) + pipeline.dropped_frames +
+                  pipeline.dropped_results, FRAMES))
+    print("get() after the end: {} in {:.3f} s (expected None at once)"
+          .format(after, waited))
@@ -0,0 +1,52 @@
+"""Checks scaled_matrix against projecting with the calibration matrix
+
+Command Line Test
+-----------------
+python test_undistort.py
+-> prints the scaled matrices and how far their projections are from the
+   calibration matrix's, in pixels
+
+A point projected with the scaled matrix must land where the calibration
+matrix puts it, moved to the zoom region and scaled to the resolution.
+Runs anywhere: no camera or intrinsics.json is needed.
+"""
+
+import numpy as np
+
+from undistort import FULL, scaled_matrix
+
+CALIBRATED = (640, 480)
+MATRIX = np.array([[500.0, 0.0, 322.0],
+                   [0.0, 498.0, 236.0],
+                   [0.0, 0.0, 1.0]])
+
+
+def project(matrix, points):
+    uv = points @ matrix.T
+    return uv[:, :2] / uv[:, 2:]
+
+
+rng = np.random.default_rng(0)
+points = np.column_stack((rng.uniform(-20, 20, (50, 2)),
+                          rng.uniform(20, 80, 50)))
+calibrated = project(MATRIX, points)
+
+for resolution, zoom in [(CALIBRATED, FULL), ((320, 240), FULL),
+                         ((640, 480), (0.25, 0.25, 0.5, 0.5)),
+                         ((320, 120), (0.0, 0.5, 1.0, 0.5)),
+                         ((160, 160), (0.5, 0.0, 0.25, 1 / 3))]:
+    x, y, w, h = zoom
+    expected = np.column_stack((
+        (calibrated[:, 0] - x * CALIBRATED[0]) * resolution[0] /
+        (w * CALIBRATED[0]),
+        (calibrated[:, 1] - y * CALIBRATED[1]) * resolution[1] /
+        (h * CALIBRATED[1])))
+    scaled = scaled_matrix(MATRIX, CALIBRATED, resolution, zoom)
+    error = np.abs(project(scaled, points) - expected).max()
+    print("{} zoom {}: fx {:.1f} fy {:.1f} cx {:.1f} cy {:.1f}, "
+          "off by {:.1e} px (expected 0)".format(
+              resolution, tuple(round(v, 3) for v in zoom), scaled[0, 0],
+              scaled[1, 1], scaled[0, 2], scaled[1, 2], error))
+
+print("calibration matrix unchanged: " +
+      str(MATRIX[0, 2] == 322.0 and MATRIX[1, 2] == 236.0))
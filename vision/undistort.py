@@ -0,0 +1,252 @@
+"""Lens undistortion with precomputed remap tables
+
+Command Line Test
+-----------------
+python undistort.py calibrate 1.jpg 2.jpg ...
+-> finds the checkerboard in every image, solves for the intrinsics and
+   saves them to intrinsics.json
+python undistort.py benchmark frames.flog
+-> compares cv2.undistort, remap with the cached tables and undistorting
+   only points, in ms/frame
+
+Usage
+-----
+undistorter = Undistorter(load())
+img = undistorter.undistort(camera.capture())   # whole frame
+pts = undistorter.undistort_points(
+    np.column_stack((blobs['x'], blobs['y'])), (640, 480))
+
+The intrinsics are solved once at the calibration resolution and scaled to
+the resolution and zoom of each capture profile. The remap tables of a
+(resolution, zoom) are built on first use and cached; they are fixed point
+(CV_16SC2), which remap handles fastest.
+"""
+
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+INTRINSICS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'intrinsics.json')
+
+FULL = (0.0, 0.0, 1.0, 1.0)
+
+
+def calibrate(images, pattern=(9, 6), square=2.5):
+    """Solve for the camera intrinsics from checkerboard images
+
+    Parameters
+    ----------
+    images : list of np.array
+        BGR or grayscale images of the same resolution
+    pattern : (int, int)
+        inner corners per row and column of the checkerboard
+    square : float
+        side of a square in cm
+
+    Returns
+    -------
+    dict
+        resolution (width, height), matrix (3x3), distortion coefficients,
+        rms reprojection error in pixels and the number of images used
+    """
+
+    board = np.zeros((pattern[0] * pattern[1], 3), np.float32)
+    board[:, :2] = np.mgrid[0:pattern[0], 0:pattern[1]].T.reshape(-1, 2)
+    board *= square
+    criteria = (
+        cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+    object_points = []
+    image_points = []
+    for image in images:
+        gray = image if image.ndim == 2 else cv2.cvtColor(
+            image, cv2.COLOR_BGR2GRAY)
+        found, corners = cv2.findChessboardCorners(gray, pattern)
+        if not found:
+            continue
+        corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+        object_points.append(board)
+        image_points.append(corners)
+    if not image_points:
+        raise ValueError("No checkerboard found")
+
+    resolution = (gray.shape[1], gray.shape[0])
+    rms, matrix, distortion, _, _ = cv2.calibrateCamera(
+        object_points, image_points, resolution, None, None)
+    return {
+        'resolution': resolution,
+        'matrix': matrix.tolist(),
+        'distortion': distortion.ravel().tolist(),
+        'rms': rms,
+        'images': len(image_points),
+    }
+
+
+def save(intrinsics, path=INTRINSICS):
+    """Write intrinsics to a JSON file"""
+
+    with open(path, 'w') as f:
+        json.dump(intrinsics, f, indent=4)
+
+
+def load(path=INTRINSICS):
+    """Read intrinsics written by save()"""
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def scaled_matrix(matrix, calibrated, resolution, zoom=FULL):
+    """Camera matrix for another resolution and zoom
+
+    Parameters
+    ----------
+    matrix : np.array
+        3x3 matrix at the calibration resolution
+    calibrated : (int, int)
+        calibration resolution
+    resolution : (int, int)
+        (width, height) of the frames
+    zoom : (float, float, float, float)
+        (x, y, w, h) sensor region of the frames, see camera.Profile
+    """
+
+    x, y, w, h = zoom
+    sx = resolution[0] / (w * calibrated[0])
+    sy = resolution[1] / (h * calibrated[1])
+    scaled = np.array(matrix, dtype=np.float64)
+    scaled[0, 0] *= sx
+    scaled[0, 2] = (scaled[0, 2] - x * calibrated[0]) * sx
+    scaled[1, 1] *= sy
+    scaled[1, 2] = (scaled[1, 2] - y * calibrated[1]) * sy
+    return scaled
+
+
+class Undistorter:
+    """Undistorts frames and points of any capture profile
+
+    Parameters
+    ----------
+    intrinsics : dict
+        from calibrate() or load()
+    """
+
+    def __init__(self, intrinsics):
+        self.calibrated = tuple(intrinsics['resolution'])
+        self.matrix = np.array(intrinsics['matrix'], dtype=np.float64)
+        self.distortion = np.array(intrinsics['distortion'], dtype=np.float64)
+        self.matrices = {}  # (resolution, zoom) -> camera matrix
+        self.maps = {}      # (resolution, zoom) -> (map1, map2, dst)
+
+    def matrix_for(self, resolution, zoom=FULL):
+        """Camera matrix of frames of a resolution and zoom"""
+
+        key = (tuple(resolution), tuple(zoom))
+        if key not in self.matrices:
+            self.matrices[key] = scaled_matrix(
+                self.matrix, self.calibrated, resolution, zoom)
+        return self.matrices[key]
+
+    def maps_for(self, resolution, zoom=FULL):
+        """Remap tables of a resolution and zoom, built on first use"""
+
+        key = (tuple(resolution), tuple(zoom))
+        if key not in self.maps:
+            matrix = self.matrix_for(resolution, zoom)
+            map1, map2 = cv2.initUndistortRectifyMap(
+                matrix, self.distortion, None, matrix, key[0], cv2.CV_16SC2)
+            self.maps[key] = (map1, map2, None)
+        return self.maps[key]
+
+    def undistort(self, frame, zoom=FULL):
+        """Undistort a whole frame
+
+        Parameters
+        ----------
+        frame : np.array
+            image of any channel count
+        zoom : (float, float, float, float)
+            sensor region of the frame
+
+        Returns
+        -------
+        np.array
+            undistorted image; reused by the next frame of the same
+            resolution and zoom
+        """
+
+        resolution = (frame.shape[1], frame.shape[0])
+        map1, map2, dst = self.maps_for(resolution, zoom)
+        if dst is None or dst.shape != frame.shape:
+            dst = np.empty_like(frame)
+            self.maps[(resolution, tuple(zoom))] = (map1, map2, dst)
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=dst)
+
+    def undistort_points(self, points, resolution, zoom=FULL):
+        """Undistort pixel coordinates without touching the frame
+
+        Parameters
+        ----------
+        points : array like
+            (n, 2) pixel coordinates, e.g. detection centroids
+        resolution : (int, int)
+            (width, height) of the frames they come from
+        zoom : (float, float, float, float)
+            sensor region of those frames
+
+        Returns
+        -------
+        np.array
+            (n, 2) coordinates in the undistorted frame
+        """
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return points.reshape(0, 2)
+        matrix = self.matrix_for(resolution, zoom)
+        return cv2.undistortPoints(
+            points, matrix, self.distortion, P=matrix).reshape(-1, 2)
+
+
+def benchmark(path, intrinsics=INTRINSICS):
+
+    from replay import ReplayCamera
+
+    camera = ReplayCamera(path, realtime=False)
+    undistorter = Undistorter(load(intrinsics))
+    frames = [camera.capture() for _ in range(len(camera))]
+    height, width = frames[0].shape[:2]
+    matrix = undistorter.matrix_for((width, height))
+    points = np.random.rand(8, 2) * (width, height)
+
+    tests = [
+        ("cv2.undistort", lambda frame: cv2.undistort(
+            frame, matrix, undistorter.distortion)),
+        ("remap", undistorter.undistort),
+        ("8 points", lambda frame: undistorter.undistort_points(
+            points, (width, height))),
+    ]
+    undistorter.undistort(frames[0])  # build the tables outside the timing
+    for name, test in tests:
+        start = time.perf_counter()
+        for frame in frames:
+            test(frame)
+        elapsed = time.perf_counter() - start
+        print("{:>14}: {:.3f} ms/frame".format(
+            name, elapsed * 1000.0 / len(frames)))
+    camera.close()
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) >= 3 and sys.argv[1] == 'calibrate':
+        result = calibrate([cv2.imread(name) for name in sys.argv[2:]])
+        save(result)
+        print("rms {:.3f} px over {} images".format(
+            result['rms'], result['images']))
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'benchmark':
+        benchmark(sys.argv[2])